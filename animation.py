@@ -0,0 +1,167 @@
+#animation.py purpose: shows the current flowing in the wires of a simulated circuit. Every wire which carries a current
+#has a pulse (one of its lines lit yellow) moving along it, in the direction the current flows and at a speed which
+#grows with the size of the current, so the wires carrying the most current are the fastest.
+#One timer drives every wire. Each frame moves every pulse, but a line is only recoloured when the pulse moves onto
+#another line, so a frame where nothing changes does not touch the canvas. While the canvas is hidden (e.g. the window
+#is minimised) no frames are drawn, and the timer only checks now and then whether the canvas is shown again.
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+FRAME_INTERVAL = 33 #milliseconds between frames, about 30 frames a second
+HIDDEN_INTERVAL = 500 #milliseconds between checks whether a hidden canvas is shown again
+MAX_STEP = 0.1 #seconds. A longer gap between frames (e.g. after being hidden) moves the pulses by this much at most
+MIN_SPEED = 60.0 #pixels per second of the pulse in the wire with the smallest current
+MAX_SPEED = 400.0 #pixels per second of the pulse in the wire with the largest current
+MIN_CURRENT = 1e-9 #amps. Wires with less current than this are not animated
+FLOW_COLOUR = "#FDDA0D"
+WIRE_COLOUR = "black"
+
+
+#returns the current (A) a component drives into one of its nodes. Its branch current flows from terminal a to
+#terminal b through it, so the current leaves the component at terminal b and enters it at terminal a
+def injected_current(result, ID, node):
+    node_a, node_b = result.netlist.terminals[ID]
+    current = result.branch_currents.get(ID, 0.0)
+    return (current if node == node_b else 0.0) - (current if node == node_a else 0.0)
+
+
+#returns the current (A) in every wire of a wires.WireMap as wire number: current flowing from its source to its target.
+#The wires which meet at a node of the solved circuit carry the currents the components there drive into it, so the
+#currents are solved node by node with Kirchhoff's current law. Wires in a loop could share their current in any way,
+#so the smallest currents which obey the law are used, as if every wire had the same small resistance.
+#A wire between two components connected across each other is part of both their nodes, and is animated with its
+#current at the node of the source's terminal a. Voltmeter wires, and wires of components which are not part of the
+#solved circuit, carry no current
+def wire_currents(result, wires):
+    terminals = result.netlist.terminals
+    currents = {}
+    shared = {} #wire number: nodes which both of its components have a terminal at
+    at_node = {} #node: wires joining two components which both have a terminal at it
+    for wire in wires:
+        currents[wire.number] = 0.0
+        if wire.voltmeter or wire.source not in terminals or wire.target not in terminals:
+            continue
+        shared[wire.number] = set(terminals[wire.source]) & set(terminals[wire.target])
+        for node in shared[wire.number]:
+            at_node.setdefault(node, []).append(wire)
+    for node, node_wires in at_node.items():
+        components = sorted({ID for wire in node_wires for ID in (wire.source, wire.target)})
+        row = {ID: number for number, ID in enumerate(components)}
+        #every component's current into the node leaves it along its wires: +1 where it is the source, -1 the target
+        incidence = np.zeros((len(components), len(node_wires)))
+        for column, wire in enumerate(node_wires):
+            incidence[row[wire.source], column] += 1
+            incidence[row[wire.target], column] -= 1
+        injected = np.array([injected_current(result, ID, node) for ID in components])
+        solution = np.linalg.lstsq(incidence, injected, rcond=None)[0]
+        for wire, current in zip(node_wires, solution):
+            if len(shared[wire.number]) == 1 or node == terminals[wire.source][0]:
+                currents[wire.number] = float(current)
+    return currents
+
+
+#FlowAnimation class purpose: frame clock which animates the current in every wire of a wires.WireMap on a ModelCanvas
+class FlowAnimation:
+    def __init__(self, canvas, wires):
+        self.canvas = canvas
+        self.wires = wires
+        self.speeds = {} #wire number: speed of its pulse in pixels per second, negative from the target to the source
+        self.positions = {} #wire number: distance of its pulse from the source end
+        self.lengths = {} #wire number: distance from the source end to the end of each of its lines
+        self.lit = {} #wire number: line which is lit
+        self.job = None
+        self.last_frame = None
+
+    @property
+    def running(self):
+        return self.job is not None
+
+    #starts animating the currents of a solver.SolveResult, or changes the currents of a running animation
+    def start(self, result):
+        self.set_currents(result)
+        if self.job is None:
+            self.last_frame = time.monotonic()
+            self.job = self.canvas.after(FRAME_INTERVAL, self.frame)
+
+    #sets the speed of every pulse from the currents of a solver.SolveResult. Pulses keep their place, so a live change
+    #of a value changes the speed without the animation jumping
+    def set_currents(self, result):
+        currents = wire_currents(result, self.wires)
+        largest = max((abs(current) for current in currents.values()), default=0.0)
+        self.speeds = {}
+        for number, current in currents.items():
+            if abs(current) < MIN_CURRENT:
+                self.redraw(number)
+                self.positions.pop(number, None)
+                continue
+            speed = MIN_SPEED + (MAX_SPEED - MIN_SPEED) * abs(current) / largest
+            self.speeds[number] = speed if current > 0 else -speed
+            self.positions.setdefault(number, 0.0)
+
+    #stops the animation and draws every wire in its normal colour
+    def stop(self):
+        if self.job is not None:
+            self.canvas.after_cancel(self.job)
+            self.job = None
+        for line in self.lit.values():
+            self.canvas.itemconfig(line, fill=WIRE_COLOUR)
+        self.lit.clear()
+        self.speeds.clear()
+        self.positions.clear()
+        self.lengths.clear()
+
+    #forgets how a wire is drawn, e.g. after it has been routed again or recoloured, so it is drawn again at the next frame
+    def redraw(self, number):
+        self.lengths.pop(number, None)
+        line = self.lit.pop(number, None)
+        if line is not None:
+            self.canvas.itemconfig(line, fill=WIRE_COLOUR)
+
+    #forgets a wire which has been deleted
+    def remove(self, number):
+        self.lengths.pop(number, None)
+        self.lit.pop(number, None)
+        self.speeds.pop(number, None)
+        self.positions.pop(number, None)
+
+    #returns the distance from the source end of a wire to the end of each of its lines, from the canvas model
+    def line_lengths(self, wire):
+        lengths = []
+        total = 0.0
+        for line in wire.lines:
+            widget = self.canvas.model[line]
+            total += abs(widget["x2"] - widget["x1"]) + abs(widget["y2"] - widget["y1"])
+            lengths.append(total)
+        return lengths
+
+    #moves every pulse and lights the line it is on, only recolouring lines when a pulse moves onto another line
+    def frame(self):
+        if not self.canvas.winfo_viewable():
+            self.job = self.canvas.after(HIDDEN_INTERVAL, self.frame)
+            self.last_frame = None
+            return
+        now = time.monotonic()
+        step = min(now - self.last_frame, MAX_STEP) if self.last_frame is not None else 0.0
+        self.last_frame = now
+        for number, speed in self.speeds.items():
+            wire = self.wires.get(number)
+            if wire is None or not wire.lines:
+                continue
+            lengths = self.lengths.get(number)
+            if lengths is None:
+                lengths = self.lengths[number] = self.line_lengths(wire)
+            total = lengths[-1]
+            if total <= 0:
+                continue
+            position = (self.positions[number] + speed * step) % total
+            self.positions[number] = position
+            line = wire.lines[min(bisect_right(lengths, position), len(lengths) - 1)]
+            previous = self.lit.get(number)
+            if line != previous:
+                if previous is not None:
+                    self.canvas.itemconfig(previous, fill=WIRE_COLOUR)
+                self.canvas.itemconfig(line, fill=FLOW_COLOUR)
+                self.lit[number] = line
+        self.job = self.canvas.after(FRAME_INTERVAL, self.frame)
@@ -0,0 +1,376 @@
+#benchmark.py purpose: measures how the headless parts of the simulator scale with the size of a circuit, so slowdowns
+#can be caught before they reach students building large circuits in labs.
+#Circuits of several families (series chains, parallel banks, resistor ladders, square meshes and random planar graphs)
+#are generated in the graph dictionary format made by WireGeneration, from 5 to 100k components. For each circuit it
+#times building the netlist, every topology query Simulate makes, solving, reading the meters, and saving and loading the
+#circuit as JSON and as .csim. The best time of several repeats is kept.
+#Results are written as JSON, and can be compared with an earlier results file to find regressions.
+#
+#usage: python benchmark.py [-o results.json] [--families F ...] [--sizes N ...] [--repeat N] [--compare OLD.json]
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import scipy
+
+import circuitfile
+from solver import Netlist, MNASolver
+from topology import Topology
+
+FAMILIES = ("series", "parallel", "ladder", "mesh", "planar")
+SIZES = (5, 10, 100, 1000, 10000, 100000)
+REPEAT = 3
+BENCHMARK_VERSION = 1
+TOLERANCE = 1.5 #a stage this many times slower than the compared results is reported as a regression
+NOISE_FLOOR = 0.001 #seconds. Stages quicker than this are too noisy to compare
+IMAGE_PATH = "component_img/"
+#parallel_branches lists every branch of every nested parallel group, so a ladder's output grows with the square of its
+#size. The stage is left out (recorded as None) for circuits where it would list more component IDs than this
+PARALLEL_LIMIT = 5000000
+
+
+#every generator returns a list of branches (ID, kind, value, node a, node b) with about size components.
+#ID 1 is always the battery and ID 2 an ammeter in series with it, so every circuit has a meter to read
+
+#battery, ammeter and resistors in one loop
+def series_circuit(size, rng):
+    count = max(size, 3)
+    branches = [(ID, "resistor", float(rng.choice((10, 20, 47))), ID - 1, ID) for ID in range(3, count + 1)]
+    return [(1, "battery", 12.0, count, 0), (2, "ammeter", None, 0, 2)] + branches
+
+
+#resistors all connected across the battery
+def parallel_circuit(size, rng):
+    branches = [(ID, "resistor", float(rng.choice((100, 220, 470))), 1, 2) for ID in range(3, max(size, 3) + 1)]
+    return [(1, "battery", 12.0, 0, 2), (2, "ammeter", None, 0, 1)] + branches
+
+
+#resistor ladder: a rail of series resistors with a rung resistor from every junction back to the battery
+def ladder_circuit(size, rng):
+    rungs = max((size - 2) // 2, 1)
+    branches = [(1, "battery", 12.0, 1, 0), (2, "ammeter", None, 1, 2)]
+    ID = 3
+    for rung in range(rungs):
+        #rail nodes are numbered from 2, the battery's other terminal is node 0
+        branches.append((ID, "resistor", float(rng.choice((10, 20))), rung + 2, rung + 3))
+        branches.append((ID + 1, "resistor", float(rng.choice((20, 40))), rung + 3, 0))
+        ID += 2
+    return branches
+
+
+#square grid of resistors with the battery connected across opposite corners
+def mesh_circuit(size, rng):
+    width = max(int(round((max(size - 2, 4) / 2) ** 0.5)) + 1, 2)
+    node = lambda x, y: y * width + x + 1
+    branches = [(1, "battery", 12.0, 0, node(width - 1, width - 1)), (2, "ammeter", None, 0, node(0, 0))]
+    ID = 3
+    for y in range(width):
+        for x in range(width):
+            for dx, dy in ((1, 0), (0, 1)):
+                if x + dx < width and y + dy < width:
+                    branches.append((ID, "resistor", float(rng.choice((10, 22, 47))), node(x, y), node(x + dx, y + dy)))
+                    ID += 1
+    return branches
+
+
+#random planar graph: a Delaunay triangulation of random points with some edges removed, keeping every node on at
+#least two resistors so there are no dead ends
+def planar_circuit(size, rng):
+    from scipy.spatial import Delaunay
+    points = max(int((size - 2) / 1.9), 4)
+    generator = np.random.default_rng(rng.randrange(2 ** 32))
+    triangles = Delaunay(generator.random((points, 2))).simplices
+    edges = sorted({(int(min(a, b)), int(max(a, b))) for triangle in triangles
+                    for a, b in ((triangle[0], triangle[1]), (triangle[1], triangle[2]), (triangle[0], triangle[2]))})
+    degree = {}
+    for a, b in edges:
+        degree[a] = degree.get(a, 0) + 1
+        degree[b] = degree.get(b, 0) + 1
+    rng.shuffle(edges)
+    kept = []
+    for number, (a, b) in enumerate(edges):
+        #about a third of the edges are removed, but the first edges of the shuffle are always kept
+        if number > len(edges) // 3 and rng.random() < 0.45 and degree[a] > 2 and degree[b] > 2:
+            degree[a] -= 1
+            degree[b] -= 1
+            continue
+        kept.append((a, b))
+    #the battery and ammeter are connected across the first kept edge's nodes through node 0, which is their own
+    first_a, first_b = kept[0]
+    branches = [(1, "battery", 12.0, 0, first_b + 1), (2, "ammeter", None, 0, first_a + 1)]
+    for ID, (a, b) in enumerate(kept[1:], start=3):
+        branches.append((ID, "resistor", float(rng.choice((10, 22, 47))), a + 1, b + 1))
+    return branches
+
+
+GENERATORS = {"series": series_circuit, "parallel": parallel_circuit, "ladder": ladder_circuit, "mesh": mesh_circuit,
+              "planar": planar_circuit}
+
+
+#turns branches into the graph dictionary format, returning the graph and the branches as solver.Netlist.from_graph
+#will read them back (components may be turned around, as each wire only says which components are connected).
+#Every node with more than one component gets a hub: one component whose terminal b is at the node and which is wired
+#to every other component there. The others are only wired to the hub, so every component has at most one neighbour
+#on terminal a, which is how the graph dictionary tells its two terminals apart. Components connected across the same
+#two nodes as an earlier one are wired across it with an 'x' placeholder, the same as WireGeneration does
+def to_graph(branches):
+    branches = {ID: [kind, value, node_a, node_b] for ID, kind, value, node_a, node_b in branches}
+    across = {} #ID: component it is wired across
+    wired_across = {} #ID: components wired across it
+    pairs = {}
+    incident = {}
+    for ID in sorted(branches):
+        node_a, node_b = branches[ID][2:]
+        pair = (min(node_a, node_b), max(node_a, node_b))
+        if pair in pairs:
+            across[ID] = pairs[pair]
+            wired_across.setdefault(pairs[pair], []).append(ID)
+            continue
+        pairs[pair] = ID
+        incident.setdefault(node_a, []).append(ID)
+        incident.setdefault(node_b, []).append(ID)
+
+    hub = find_hubs(branches, incident)
+    for node, ID in hub.items():
+        if branches[ID][3] != node:
+            branches[ID][2], branches[ID][3] = branches[ID][3], branches[ID][2]
+    for ID, other in across.items():
+        branches[ID][2:] = branches[other][2:]
+
+    graph = {}
+    for ID in sorted(branches):
+        if ID in across:
+            graph[str(ID)] = [across[ID], "x"]
+            continue
+        node_a, node_b = branches[ID][2:]
+        neighbours = []
+        if node_a in hub:
+            neighbours.append(hub[node_a])
+        if hub.get(node_b) == ID:
+            neighbours.extend(other for other in incident[node_b] if other != ID)
+        elif node_b in hub:
+            neighbours.append(hub[node_b])
+        neighbours.extend(wired_across.get(ID, []))
+        graph[str(ID)] = neighbours
+    return graph, [(ID, kind, value, node_a, node_b) for ID, (kind, value, node_a, node_b) in sorted(branches.items())]
+
+
+#picks a different hub component for every node with more than one component, using a spanning forest and then
+#augmenting paths for the nodes left over. A component whose other terminal is a dead end cannot be a hub
+def find_hubs(branches, incident):
+    def other_end(ID, node):
+        node_a, node_b = branches[ID][2:]
+        return node_b if node_a == node else node_a
+
+    def usable(ID, node):
+        return len(incident[other_end(ID, node)]) > 1
+
+    hub = {} #node: component
+    owner = {} #component: node it is the hub of
+    needed = []
+    seen = set()
+    for start in sorted(incident, key=lambda node: len(incident[node])):
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = deque([start])
+        if len(incident[start]) > 1:
+            needed.append(start)
+        while queue:
+            node = queue.popleft()
+            for ID in incident[node]:
+                other = other_end(ID, node)
+                if other in seen:
+                    continue
+                seen.add(other)
+                queue.append(other)
+                if len(incident[other]) > 1:
+                    if usable(ID, other):
+                        hub[other], owner[ID] = ID, other
+                    else:
+                        needed.append(other)
+
+    for start in needed:
+        #breadth-first search for a chain of nodes which can each take the hub of the next, ending at a free component
+        came_from = {start: None}
+        queue = deque([start])
+        free = None
+        while queue and free is None:
+            node = queue.popleft()
+            for ID in incident[node]:
+                if not usable(ID, node):
+                    continue
+                if ID not in owner:
+                    free = (node, ID)
+                    break
+                if owner[ID] not in came_from:
+                    came_from[owner[ID]] = (node, ID)
+                    queue.append(owner[ID])
+        if free is None:
+            raise ValueError("Node " + str(start) + " cannot be given a hub component.")
+        node, ID = free
+        while node is not None:
+            hub[node], owner[ID] = ID, node
+            if came_from[node] is None:
+                break
+            node, ID = came_from[node]
+    return hub
+
+
+#checks that the netlist read from a graph has the nodes of the branches it was made from
+def check_graph(graph, branches):
+    netlist = Netlist.from_graph(graph, {ID: (kind, value) for ID, kind, value, node_a, node_b in branches})
+    mapping = {}
+    for ID, kind, value, node_a, node_b in branches:
+        for node, read in zip((node_a, node_b), netlist.terminals[ID]):
+            if mapping.setdefault(node, read) != read:
+                raise ValueError("Component " + str(ID) + " is not connected as it was generated.")
+    if len(set(mapping.values())) != len(mapping):
+        raise ValueError("Separate nodes were joined when the graph was read.")
+    return netlist
+
+
+#returns the circuit as a dictionary in the canvasdata.json schema, with the components laid out in a grid
+def circuit_data(graph, branches):
+    widgets = []
+    columns = max(int(len(branches) ** 0.5), 1)
+    for number, (ID, kind, value, node_a, node_b) in enumerate(branches):
+        tags = [str(ID)] + ([str(int(value))] if value is not None else []) + ["ID" + str(ID), kind, IMAGE_PATH + kind + ".png"]
+        widgets.append({"type": "image", "x": 50.0 + 60 * (number % columns), "y": 50.0 + 60 * (number // columns),
+                        "tags": tags})
+    attributes = {"battery_exists": True, "varesistor_exists": False, "switch_exists": False, "thermistor_exists": False,
+                  "totalcomponents": len(branches), "voltmeters": [[len(branches) + 1, 3]]}
+    return {"widgets": widgets, "line_ids": [], "graph": graph, "attributes": attributes}
+
+
+#returns how many component IDs Topology.parallel_branches would list for a decomposition tree, in linear time
+def parallel_size(tree):
+    if not isinstance(tree, tuple):
+        return 0
+    total = 0
+    counts = {} #id() of group: components inside it
+    stack = [(tree, False)]
+    while stack:
+        group, done = stack.pop()
+        if not done:
+            stack.append((group, True))
+            stack.extend((child, False) for child in group[1] if isinstance(child, tuple))
+            continue
+        counts[id(group)] = sum(counts[id(child)] if isinstance(child, tuple) else 1 for child in group[1])
+        if group[0] == "P":
+            total += counts[id(group)]
+    return total
+
+
+#calls function and returns (seconds taken, what it returned)
+def timed(function, *args):
+    start = time.perf_counter()
+    value = function(*args)
+    return time.perf_counter() - start, value
+
+
+#times every stage of one circuit once and returns {stage: seconds}
+def run_stages(graph, components, voltmeters, data):
+    times = {}
+    times["netlist"], netlist = timed(Netlist.from_graph, graph, components)
+    topology = Topology(netlist)
+    times["cycles"], cycles = timed(topology.cycle_basis)
+    times["classify"], circuit_type = timed(topology.classify)
+    times["dead"], dead = timed(topology.dead_components)
+    times["series"], series = timed(topology.series_components)
+    if parallel_size(topology.decompose()) <= PARALLEL_LIMIT:
+        times["parallel"], branches = timed(topology.parallel_branches)
+    else:
+        times["parallel"] = None
+    times["factorise"], solver = timed(MNASolver, netlist)
+    times["solve"], result = timed(solver.solve)
+    times["meters"], readings = timed(lambda: (result.ammeter_readings(), result.voltmeter_readings(voltmeters)))
+    times["json_save"], text = timed(json.dumps, data)
+    times["json_load"], loaded = timed(json.loads, text)
+    times["csim_save"], blob = timed(circuitfile.encode, data)
+    times["csim_load"], loaded = timed(circuitfile.decode, blob)
+    return times, {"circuit_type": circuit_type, "json_bytes": len(text), "csim_bytes": len(blob),
+                   "total_current": result.total_current}
+
+
+#generates one circuit and benchmarks it, returning one entry of the results
+def benchmark(family, size, repeat=REPEAT, seed=0):
+    rng = random.Random(str(seed) + family + str(size))
+    start = time.perf_counter()
+    graph, branches = to_graph(GENERATORS[family](size, rng))
+    netlist = check_graph(graph, branches)
+    generated = time.perf_counter() - start
+    components = {ID: (kind, value) for ID, kind, value, node_a, node_b in branches}
+    data = circuit_data(graph, branches)
+    voltmeters = data["attributes"]["voltmeters"]
+
+    best = {}
+    for _ in range(repeat):
+        times, details = run_stages(graph, components, voltmeters, data)
+        for stage, seconds in times.items():
+            best[stage] = seconds if seconds is None else min(best.get(stage, seconds), seconds)
+    best["total"] = sum(seconds for seconds in best.values() if seconds is not None)
+    topology = Topology(netlist)
+    return {"family": family, "size": size, "components": len(branches), "nodes": netlist.node_count,
+            "cycle_rank": topology.cycle_rank(), "generate": generated, "times": best, "details": details}
+
+
+#compares results with an earlier results file and returns a list of (family, size, stage, old, new) which got slower
+def compare(results, baseline, tolerance=TOLERANCE):
+    old = {(entry["family"], entry["size"]): entry for entry in baseline["results"]}
+    slower = []
+    for entry in results["results"]:
+        previous = old.get((entry["family"], entry["size"]))
+        if previous is None:
+            continue
+        for stage, seconds in entry["times"].items():
+            before = previous["times"].get(stage)
+            if before is not None and seconds is not None and max(before, seconds) > NOISE_FLOOR and seconds > before * tolerance:
+                slower.append((entry["family"], entry["size"], stage, before, seconds))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark topology analysis, solving and saving on generated circuits.")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="file the results are written to")
+    parser.add_argument("--families", nargs="+", choices=FAMILIES, default=list(FAMILIES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="numbers of components")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs of each circuit, the best is kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random values and planar graphs")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = {"version": BENCHMARK_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat,
+               "seed": args.seed, "python": platform.python_version(), "platform": platform.platform(),
+               "numpy": np.__version__, "scipy": scipy.__version__, "results": []}
+    for family in args.families:
+        for size in args.sizes:
+            entry = benchmark(family, size, args.repeat, args.seed)
+            results["results"].append(entry)
+            times = entry["times"]
+            print(family.ljust(9), str(entry["components"]).rjust(7), "components",
+                  "topology", format(sum(times[stage] or 0 for stage in ("cycles", "classify", "dead", "series", "parallel")), ".4f"),
+                  "solve", format(times["factorise"] + times["solve"], ".4f"),
+                  "save", format(times["json_save"] + times["csim_save"], ".4f"),
+                  "total", format(times["total"], ".4f"))
+
+    with circuitfile.atomic_open(args.output, "w") as savefile:
+        json.dump(results, savefile, indent=1)
+
+    if args.compare:
+        with open(args.compare, "r") as loadfile:
+            slower = compare(results, json.load(loadfile), args.tolerance)
+        for family, size, stage, before, after in slower:
+            print("slower:", family, size, stage, format(before, ".4f"), "->", format(after, ".4f"))
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#canonical.py purpose: canonical form of a netlist which does not depend on component IDs or where components are drawn,
+#so the same circuit built again (e.g. a preset loaded twice, or the same circuit with components added in another order)
+#gets the same key in the solve cache.
+#The netlist is treated as a graph with a vertex for every component and every node. Vertices are coloured by their kind
+#and value, and the colours are refined (Weisfeiler-Lehman) until every vertex's colour sums up its whole neighbourhood.
+#Vertices which still share a colour are told apart one at a time by giving one of them a new colour and refining again.
+#The components and nodes are then numbered in colour order, and the key is a hash of the whole circuit written with
+#those numbers. Two circuits with the same key are therefore always the same circuit, so cached results can be mapped
+#straight onto the new IDs. In rare, very symmetric circuits relabelling can change the key, which only causes a miss.
+import hashlib
+import json
+
+import tracing
+
+#components above which ties are broken by ID straight away instead of by refining, as refining once per tie is slow
+REFINE_LIMIT = 300
+#maximum rounds of colour refinement each time. Long chains of components need about one round per component, and are
+#numbered by ID instead if they go over this
+MAX_ROUNDS = 64
+
+
+#CanonicalForm class purpose: the key of a netlist and the numbering which maps it to and from its canonical form
+class CanonicalForm:
+    def __init__(self, key, components, nodes):
+        self.key = key #hex digest identifying the circuit
+        self.components = components #component IDs in canonical order
+        self.nodes = nodes #node numbers in canonical order
+
+
+#returns a component's value in a form which is the same for equal values, e.g. 20 and 20.0
+def value_label(kind, value):
+    if value is None:
+        return ""
+    if kind == "switch":
+        return "on" if value else "off"
+    return repr(float(value))
+
+
+#colours every vertex by the rank of its signature, so colours only depend on the structure and never on IDs
+def rank(signatures):
+    order = {signature: number for number, signature in enumerate(sorted(set(signatures.values())))}
+    return {vertex: order[signature] for vertex, signature in signatures.items()}
+
+
+#refines the colours until no class of vertices splits any further. Returns the colours and whether they stopped splitting
+def refine(colours, adjacent):
+    classes = len(set(colours.values()))
+    for _ in range(MAX_ROUNDS):
+        signatures = {vertex: (colours[vertex], tuple(sorted((terminal, colours[other]) for terminal, other in adjacent[vertex])))
+                      for vertex in colours}
+        colours = rank(signatures)
+        count = len(set(colours.values()))
+        if count == classes:
+            return colours, True
+        classes = count
+    return colours, False
+
+
+#returns the CanonicalForm of a solver.Netlist. Components in marked are told apart from equal components which are not,
+#e.g. the battery which Topology analyses the circuit across
+@tracing.traced("cache.canonical")
+def canonical_form(netlist, marked=()):
+    #vertices are ("c", component ID) and ("n", node). Terminal a is labelled 0 and terminal b is labelled 1
+    adjacent = {}
+    labels = {}
+    for ID, (kind, value) in netlist.components.items():
+        if ID not in netlist.terminals:
+            continue
+        node_a, node_b = netlist.terminals[ID]
+        component = ("c", ID)
+        labels[component] = ("c", kind, value_label(kind, value), ID in marked)
+        adjacent[component] = [(0, ("n", node_a)), (1, ("n", node_b))]
+        for terminal, node in ((0, node_a), (1, node_b)):
+            labels[("n", node)] = ("n", "", "", False)
+            adjacent.setdefault(("n", node), []).append((terminal, component))
+
+    colours = rank(labels)
+    stable = len(netlist.components) <= REFINE_LIMIT
+    while True:
+        if stable:
+            colours, stable = refine(colours, adjacent)
+        classes = {}
+        for vertex, colour in colours.items():
+            classes.setdefault(colour, []).append(vertex)
+        tied = [colour for colour, members in classes.items() if len(members) > 1]
+        if not tied:
+            break
+        if not stable:
+            #every vertex gets its own colour by ID, which is still a correct key but not the same for relabelled copies
+            colours = rank({vertex: (colour, vertex) for vertex, colour in colours.items()})
+            break
+        #one vertex of the first tied class is given a colour of its own, then the colours are refined again.
+        #If the whole class is connected to the same nodes (e.g. equal resistors in parallel) they can be swapped freely,
+        #so they are all given colours of their own at once
+        colour = min(tied)
+        members = sorted(classes[colour])
+        if len(set(tuple(sorted(adjacent[vertex])) for vertex in members)) == 1:
+            chosen = {vertex: number for number, vertex in enumerate(members)}
+        else:
+            chosen = {members[0]: 0}
+        colours = {vertex: (value, chosen.get(vertex, len(members))) for vertex, value in colours.items()}
+        colours = rank(colours)
+
+    ordered = sorted(colours, key=colours.get)
+    components = [vertex[1] for vertex in ordered if vertex[0] == "c"]
+    nodes = [vertex[1] for vertex in ordered if vertex[0] == "n"]
+    number = {node: index for index, node in enumerate(nodes)}
+    description = [list(labels[("c", ID)][1:]) + [number[netlist.terminals[ID][0]], number[netlist.terminals[ID][1]]]
+                   for ID in components]
+    key = hashlib.sha1(json.dumps(description).encode()).hexdigest()
+    return CanonicalForm(key, components, nodes)
+
+
+#returns just the key of a netlist
+def netlist_hash(netlist, marked=()):
+    return canonical_form(netlist, marked).key
@@ -0,0 +1,167 @@
+#canvasmodel.py purpose: tkinter canvas which keeps an in-Python model of every item drawn on it, so a circuit can be saved
+#without asking tkinter for the coordinates, text and tags of every item one at a time.
+#Every method which creates, moves, changes or deletes items is wrapped so the model is updated at the same time as the
+#canvas. Items are stored in the canvasdata.json schema in the same stacking order as canvas.find_all() would return.
+#Items can also be given a group tag (see group()), so everything drawn for one component is moved with one canvas.move.
+from collections import OrderedDict
+from tkinter import Canvas
+
+
+#ModelCanvas class purpose: Canvas with a model of its items, read with widgets()
+class ModelCanvas(Canvas):
+    def __init__(self, master=None, cnf={}, **kw):
+        super().__init__(master, cnf, **kw)
+        self.model = OrderedDict() #item ID: widget dictionary, lowest item first
+        self.groups = {} #item ID: group tag
+
+    #returns every item as a dictionary in the canvasdata.json schema, lowest item first
+    def widgets(self):
+        return iter(self.model.values())
+
+    #returns item ID: position of the item in widgets(), which is how saved circuits refer to their items
+    def positions(self):
+        return {item: number for number, item in enumerate(self.model)}
+
+    #returns the (x, y) coordinates of an image or text from the model, without asking tkinter
+    def position(self, item):
+        widget = self.model[item]
+        return widget["x"], widget["y"]
+
+    #gives items a group tag so they can all be moved with one call. The group tag is kept when an item's tags are
+    #replaced with itemconfigure, and is not part of the model so it is never saved
+    def group(self, tag, items):
+        for item in items:
+            self.groups[item] = tag
+            super().addtag_withtag(tag, item)
+
+    #returns the item IDs which a tag or item ID refers to. Only tags need to be looked up in tkinter
+    def resolve(self, tag_or_id):
+        if isinstance(tag_or_id, int):
+            return [tag_or_id] if tag_or_id in self.model else []
+        return [item for item in self.find_withtag(tag_or_id) if item in self.model]
+
+    def create_image(self, *args, **kw):
+        item = super().create_image(*args, **kw)
+        x, y = coordinates(args)[:2]
+        self.model[item] = {"type": "image", "x": x, "y": y, "tags": tag_list(kw.get("tags", ()))}
+        return item
+
+    def create_text(self, *args, **kw):
+        item = super().create_text(*args, **kw)
+        x, y = coordinates(args)[:2]
+        self.model[item] = {"type": "text", "x": x, "y": y, "text": str(kw.get("text", "")),
+                            "font": str(kw.get("font", "TkDefaultFont"))}
+        return item
+
+    def create_line(self, *args, **kw):
+        item = super().create_line(*args, **kw)
+        x1, y1, x2, y2 = coordinates(args)[:4]
+        self.model[item] = {"type": "line", "x1": x1, "y1": y1, "x2": x2, "y2": y2,
+                            "width": str(float(kw.get("width", 1.0)))}
+        return item
+
+    #moves items to new coordinates, or returns their coordinates if none are given
+    def coords(self, tag_or_id, *args):
+        result = super().coords(tag_or_id, *args)
+        if args:
+            values = coordinates(args)
+            for item in self.resolve(tag_or_id):
+                set_position(self.model[item], values)
+        return result
+
+    def move(self, tag_or_id, x_amount, y_amount):
+        super().move(tag_or_id, x_amount, y_amount)
+        for item in self.resolve(tag_or_id):
+            widget = self.model[item]
+            if widget["type"] == "line":
+                widget["x1"] += x_amount
+                widget["y1"] += y_amount
+                widget["x2"] += x_amount
+                widget["y2"] += y_amount
+            else:
+                widget["x"] += x_amount
+                widget["y"] += y_amount
+
+    def itemconfigure(self, tag_or_id, cnf=None, **kw):
+        result = super().itemconfigure(tag_or_id, cnf, **kw)
+        options = dict(cnf or {}, **kw)
+        if options:
+            for item in self.resolve(tag_or_id):
+                widget = self.model[item]
+                if "tags" in options and widget["type"] == "image":
+                    widget["tags"] = tag_list(options["tags"])
+                if "tags" in options and item in self.groups:
+                    super().addtag_withtag(self.groups[item], item)
+                if "text" in options and widget["type"] == "text":
+                    widget["text"] = str(options["text"])
+                if "font" in options and widget["type"] == "text":
+                    widget["font"] = str(options["font"])
+                if "width" in options and widget["type"] == "line":
+                    widget["width"] = str(float(options["width"]))
+        return result
+
+    itemconfig = itemconfigure
+
+    #lowers items to the bottom of the stacking order, or below another item
+    def tag_lower(self, *args):
+        super().tag_lower(*args)
+        if len(args) == 1:
+            for item in reversed(self.resolve(args[0])):
+                self.model.move_to_end(item, last=False)
+        else:
+            self.restack()
+
+    lower = tag_lower
+
+    #raises items to the top of the stacking order, or above another item
+    def tag_raise(self, *args):
+        super().tag_raise(*args)
+        if len(args) == 1:
+            for item in self.resolve(args[0]):
+                self.model.move_to_end(item)
+        else:
+            self.restack()
+
+    lift = tkraise = tag_raise
+
+    #re-reads the stacking order from tkinter, only needed when items are moved relative to another item
+    def restack(self):
+        for item in self.find_all():
+            if item in self.model:
+                self.model.move_to_end(item)
+
+    def delete(self, *args):
+        for tag_or_id in args:
+            if tag_or_id == "all":
+                self.model.clear()
+                self.groups.clear()
+            else:
+                for item in self.resolve(tag_or_id):
+                    del self.model[item]
+                    self.groups.pop(item, None)
+        super().delete(*args)
+
+
+#returns the coordinates passed to a canvas method as a flat list of floats. They can be passed separately or in pairs
+def coordinates(args):
+    values = []
+    for value in args:
+        if isinstance(value, (list, tuple)):
+            values.extend(coordinates(value))
+        elif not isinstance(value, dict):
+            values.append(float(value))
+    return values
+
+
+#returns tags in the form canvas.gettags() returns them, as a list of strings
+def tag_list(tags):
+    if isinstance(tags, str):
+        return tags.split()
+    return [str(tag) for tag in tags]
+
+
+def set_position(widget, values):
+    if widget["type"] == "line":
+        widget["x1"], widget["y1"], widget["x2"], widget["y2"] = values[:4]
+    else:
+        widget["x"], widget["y"] = values[:2]
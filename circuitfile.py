@@ -0,0 +1,422 @@
+#circuitfile.py purpose: compact binary circuit format (.csim) which is saved alongside the canvasdata.json format.
+#A file is split into two sections so that headless code can read the netlist without decoding the layout:
+#   - netlist: components with their kinds and values, the graph dictionary, voltmeters and the canvas attributes
+#   - layout: every image, text and line drawn on the canvas, in the order they were saved, and the wires (see wires.py)
+#     which those lines belong to. Files saved before wires were added end after the line IDs and load with no wires
+#Numbers are packed with struct and array instead of being written as text, text is stored once in a string table, and
+#each section can be compressed with zlib. Values and coordinates are stored as float64, so converting a canvasdata.json
+#file to .csim and back gives exactly the same numbers. Version 1 files stored coordinates as float32, which rounded
+#coordinates such as 100.1, and still load.
+#
+#File layout (little-endian):
+#   header:   magic b"CSIM", version (uint16), flags (uint16), section count (uint16)
+#   sections: name (4 bytes), offset from the start of the file (uint64), length in bytes (uint64)
+#   followed by the data of each section
+#
+#usage: python circuitfile.py [--no-compress] SOURCE DESTINATION
+import argparse
+import json
+import os
+import stat
+import struct
+import sys
+import tempfile
+import zlib
+from contextlib import contextmanager
+from array import array
+
+from components import KINDS, VALUED_KINDS
+import tracing
+
+MAGIC = b"CSIM"
+VERSION = 2 #version 1 stored the coordinates of the layout as float32
+COMPRESSED = 1 #flag set when every section is compressed with zlib
+EXTENSION = ".csim"
+
+HEADER = struct.Struct("<4sHHH")
+SECTION = struct.Struct("<4sQQ")
+NETLIST = b"NETL"
+LAYOUT = b"LAYT"
+
+#attributes of canvasdata.json which are true/false, stored as bits of one byte in this order
+FLAGS = ("battery_exists", "varesistor_exists", "switch_exists", "thermistor_exists")
+#kinds of canvas item in the layout section
+ITEM_TYPES = ("image", "text", "line")
+#stands in for the 'x' placeholders of the graph dictionary, which mark a component connected across its neighbour
+PLACEHOLDER = -1
+
+
+#raised when a file is not a circuit file or was written by a newer version
+class CircuitFileError(Exception):
+    pass
+
+
+#packs an array of numbers, prefixed by how many there are. Arrays are always stored little-endian
+def pack_array(typecode, values):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return struct.pack("<I", len(packed)) + packed.tobytes()
+
+
+#unpacks an array written by pack_array starting at offset, returning the array and the offset after it
+def unpack_array(typecode, blob, offset):
+    (count,) = struct.unpack_from("<I", blob, offset)
+    offset += 4
+    unpacked = array(typecode)
+    size = unpacked.itemsize * count
+    unpacked.frombytes(blob[offset:offset + size])
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked, offset + size
+
+
+#packs a list of strings as one UTF-8 blob with the length of every string
+def pack_strings(strings):
+    encoded = [string.encode("utf-8") for string in strings]
+    return pack_array("I", [len(string) for string in encoded]) + pack_array("B", b"".join(encoded))
+
+
+def unpack_strings(blob, offset):
+    lengths, offset = unpack_array("I", blob, offset)
+    joined, offset = unpack_array("B", blob, offset)
+    joined = joined.tobytes()
+    strings = []
+    start = 0
+    for length in lengths:
+        strings.append(joined[start:start + length].decode("utf-8"))
+        start += length
+    return strings, offset
+
+
+#reads the ID, kind and value of every component from the image tags saved in canvasdata.json
+def components_from_widgets(widgets):
+    components = []
+    for widget in widgets:
+        if widget["type"] != "image":
+            continue
+        tags = [str(tag) for tag in widget["tags"]]
+        kinds = [tag for tag in tags if tag in KINDS]
+        id_tags = [tag for tag in tags if tag.startswith("ID")]
+        if not kinds or not id_tags:
+            continue
+        kind = kinds[0]
+        if kind in VALUED_KINDS:
+            value = float(tags[1])
+        elif kind == "switch":
+            value = 0.0 if "switch_off" in tags[-1] else 1.0
+        else:
+            value = float("nan") #meters and lightbulbs have no value
+        components.append((int(id_tags[0][2:]), kind, value))
+    return components
+
+
+#encodes the netlist section from a dictionary in the canvasdata.json schema
+def encode_netlist(data):
+    attributes = data["attributes"]
+    flags = 0
+    for bit, name in enumerate(FLAGS):
+        if attributes.get(name):
+            flags |= 1 << bit
+    components = components_from_widgets(data["widgets"])
+
+    #the graph is stored as its keys, how many neighbours each key has and one flat list of every neighbour
+    keys, counts, neighbours = [], [], []
+    for key, values in data["graph"].items():
+        keys.append(int(key))
+        counts.append(len(values))
+        neighbours.extend(PLACEHOLDER if value == "x" else int(value) for value in values)
+    voltmeters = [int(value) for pair in attributes.get("voltmeters", []) for value in pair]
+
+    return b"".join([
+        struct.pack("<BI", flags, int(attributes.get("totalcomponents", len(components)))),
+        pack_array("I", [ID for ID, kind, value in components]),
+        pack_array("B", [KINDS.index(kind) for ID, kind, value in components]),
+        pack_array("d", [value for ID, kind, value in components]),
+        pack_array("i", keys),
+        pack_array("I", counts),
+        pack_array("i", neighbours),
+        pack_array("i", voltmeters),
+    ])
+
+
+#decodes the netlist section into a dictionary with the graph (keys as strings, as in canvasdata.json), the components
+#as {ID: (kind, value)} and the attributes
+def decode_netlist(blob):
+    flags, total = struct.unpack_from("<BI", blob, 0)
+    offset = struct.calcsize("<BI")
+    IDs, offset = unpack_array("I", blob, offset)
+    kinds, offset = unpack_array("B", blob, offset)
+    values, offset = unpack_array("d", blob, offset)
+    keys, offset = unpack_array("i", blob, offset)
+    counts, offset = unpack_array("I", blob, offset)
+    neighbours, offset = unpack_array("i", blob, offset)
+    voltmeters, offset = unpack_array("i", blob, offset)
+
+    components = {}
+    for ID, kind, value in zip(IDs, kinds, values):
+        kind = KINDS[kind]
+        if kind == "switch":
+            value = bool(value)
+        elif value != value: #NaN marks a component without a value
+            value = None
+        components[ID] = (kind, value)
+
+    graph = {}
+    start = 0
+    for key, count in zip(keys, counts):
+        graph[str(key)] = ["x" if value == PLACEHOLDER else value for value in neighbours[start:start + count]]
+        start += count
+
+    attributes = {name: bool(flags & (1 << bit)) for bit, name in enumerate(FLAGS)}
+    attributes["totalcomponents"] = total
+    attributes["voltmeters"] = [[voltmeters[index], voltmeters[index + 1]] for index in range(0, len(voltmeters), 2)]
+    return {"graph": graph, "components": components, "attributes": attributes}
+
+
+#encodes the layout section. Every item has a type, its coordinates and references to strings in the string table
+def encode_layout(data):
+    strings = {}
+
+    def reference(string):
+        return strings.setdefault(str(string), len(strings))
+
+    types, coords, references = [], [], []
+    kept = {} #position in data["widgets"]: position in the layout, as unsupported widgets are left out
+    for position, widget in enumerate(data["widgets"]):
+        if widget["type"] not in ITEM_TYPES:
+            continue
+        kept[position] = len(types)
+        types.append(ITEM_TYPES.index(widget["type"]))
+        if widget["type"] == "image":
+            coords.extend((widget["x"], widget["y"]))
+            references.append(len(widget["tags"]))
+            references.extend(reference(tag) for tag in widget["tags"])
+        elif widget["type"] == "text":
+            coords.extend((widget["x"], widget["y"]))
+            references.extend((reference(widget["text"]), reference(widget["font"])))
+        else:
+            coords.extend((widget["x1"], widget["y1"], widget["x2"], widget["y2"]))
+            references.append(reference(widget["width"]))
+
+    return b"".join([
+        pack_strings(list(strings)),
+        pack_array("B", types),
+        pack_array("d", coords),
+        pack_array("I", references),
+        pack_array("i", [int(ID) for ID in data.get("line_ids", [])]),
+        pack_array("i", encode_wires(data.get("wires", []), kept)),
+    ])
+
+
+#packs wires into one flat list of source, target, 1 for a voltmeter or 0, number of lines and the lines' positions
+def encode_wires(wires, kept):
+    values = []
+    for wire in wires:
+        lines = [kept[position] for position in wire["lines"] if position in kept]
+        values.extend((int(wire["source"]), int(wire["target"]), int(bool(wire.get("voltmeter"))), len(lines)))
+        values.extend(lines)
+    return values
+
+
+def decode_wires(values):
+    wires = []
+    index = 0
+    while index + 4 <= len(values):
+        source, target, voltmeter, count = values[index:index + 4]
+        wires.append({"source": source, "target": target, "voltmeter": bool(voltmeter),
+                      "lines": list(values[index + 4:index + 4 + count])})
+        index += 4 + count
+    return wires
+
+
+#decodes the layout section into the widget list, line IDs and wires of canvasdata.json. version is the version of the
+#file or database row the section was saved in
+def decode_layout(blob, version=VERSION):
+    strings, offset = unpack_strings(blob, 0)
+    types, offset = unpack_array("B", blob, offset)
+    coords, offset = unpack_array("d" if version >= 2 else "f", blob, offset)
+    references, offset = unpack_array("I", blob, offset)
+    line_ids, offset = unpack_array("i", blob, offset)
+    wires = decode_wires(unpack_array("i", blob, offset)[0]) if offset < len(blob) else []
+
+    widgets = []
+    coord = 0
+    ref = 0
+    for item_type in types:
+        item_type = ITEM_TYPES[item_type]
+        if item_type == "image":
+            count = references[ref]
+            tags = [strings[index] for index in references[ref + 1:ref + 1 + count]]
+            widgets.append({"type": "image", "x": coords[coord], "y": coords[coord + 1], "tags": tags})
+            coord += 2
+            ref += 1 + count
+        elif item_type == "text":
+            widgets.append({"type": "text", "x": coords[coord], "y": coords[coord + 1],
+                            "text": strings[references[ref]], "font": strings[references[ref + 1]]})
+            coord += 2
+            ref += 2
+        else:
+            widgets.append({"type": "line", "x1": coords[coord], "y1": coords[coord + 1], "x2": coords[coord + 2],
+                            "y2": coords[coord + 3], "width": strings[references[ref]]})
+            coord += 4
+            ref += 1
+    return widgets, list(line_ids), wires
+
+
+#converts a dictionary in the canvasdata.json schema to the bytes of a .csim file
+@tracing.traced("file.encode")
+def encode(data, compress=True):
+    sections = [(NETLIST, encode_netlist(data)), (LAYOUT, encode_layout(data))]
+    if compress:
+        sections = [(name, zlib.compress(blob)) for name, blob in sections]
+    offset = HEADER.size + SECTION.size * len(sections)
+    parts = [HEADER.pack(MAGIC, VERSION, COMPRESSED if compress else 0, len(sections))]
+    for name, blob in sections:
+        parts.append(SECTION.pack(name, offset, len(blob)))
+        offset += len(blob)
+    parts.extend(blob for name, blob in sections)
+    return b"".join(parts)
+
+
+#reads the header and section table, returning the version, the flags and a dictionary of section name: (offset, length)
+def read_header(header):
+    if len(header) < HEADER.size:
+        raise CircuitFileError("File is too short to be a circuit file.")
+    magic, version, flags, count = HEADER.unpack_from(header, 0)
+    if magic != MAGIC:
+        raise CircuitFileError("Not a circuit file.")
+    if version > VERSION:
+        raise CircuitFileError("Circuit file version " + str(version) + " is newer than this program supports.")
+    sections = {}
+    for number in range(count):
+        name, offset, length = SECTION.unpack_from(header, HEADER.size + SECTION.size * number)
+        sections[name] = (offset, length)
+    return version, flags, sections
+
+
+#reads one section from an open binary file without reading the others
+def read_section(circuitfile, name):
+    circuitfile.seek(0)
+    start = circuitfile.read(HEADER.size)
+    count = HEADER.unpack_from(start, 0)[3] if len(start) == HEADER.size else 0
+    version, flags, sections = read_header(start + circuitfile.read(SECTION.size * count))
+    if name not in sections:
+        raise CircuitFileError("Circuit file has no " + name.decode() + " section.")
+    offset, length = sections[name]
+    circuitfile.seek(offset)
+    blob = circuitfile.read(length)
+    return zlib.decompress(blob) if flags & COMPRESSED else blob
+
+
+#converts the bytes of a .csim file to a dictionary in the canvasdata.json schema
+@tracing.traced("file.decode")
+def decode(blob):
+    version, flags, sections = read_header(blob)
+
+    def section(name):
+        offset, length = sections[name]
+        data = blob[offset:offset + length]
+        return zlib.decompress(data) if flags & COMPRESSED else data
+
+    netlist = decode_netlist(section(NETLIST))
+    widgets, line_ids, wires = decode_layout(section(LAYOUT), version)
+    return {"widgets": widgets, "line_ids": line_ids, "graph": netlist["graph"], "attributes": netlist["attributes"],
+            "wires": wires}
+
+
+#checks that a dictionary has everything the canvasdata.json schema needs before anything is drawn, raising
+#CircuitFileError if not. It does not need tkinter, so it can run on a worker thread
+def validate(data):
+    if not isinstance(data, dict):
+        raise CircuitFileError("Circuit data must be a dictionary.")
+    for key in ("widgets", "line_ids", "graph", "attributes"):
+        if key not in data:
+            raise CircuitFileError("Circuit data has no " + key + ".")
+    for name in FLAGS + ("totalcomponents",):
+        if name not in data["attributes"]:
+            raise CircuitFileError("Circuit data has no " + name + " attribute.")
+    fields = {"image": ("x", "y", "tags"), "text": ("x", "y", "text", "font"), "line": ("x1", "y1", "x2", "y2", "width")}
+    for widget in data["widgets"]:
+        if widget.get("type") not in fields:
+            continue #unsupported widgets are skipped when loading
+        for field in fields[widget["type"]]:
+            if field not in widget:
+                raise CircuitFileError("A " + widget["type"] + " has no " + field + ".")
+        if widget["type"] == "image" and not widget["tags"]:
+            raise CircuitFileError("An image has no tags.")
+    for key, values in data["graph"].items():
+        if not str(key).lstrip("-").isdigit() or not isinstance(values, list):
+            raise CircuitFileError("Circuit graph is not valid.")
+    #wires are optional, as circuits saved by earlier versions do not have them
+    for wire in data.get("wires", []):
+        if not isinstance(wire, dict) or any(field not in wire for field in ("source", "target", "lines")):
+            raise CircuitFileError("A wire has no source, target or lines.")
+        if not all(isinstance(position, int) for position in wire["lines"]):
+            raise CircuitFileError("The lines of a wire are not valid.")
+
+
+#opens a temporary file next to filename for writing, which replaces filename only once it has been written completely,
+#so a crash while saving can never leave a half-written circuit behind
+@contextmanager
+def atomic_open(filename, mode="w"):
+    folder = os.path.dirname(os.path.abspath(filename))
+    handle, temporary = tempfile.mkstemp(prefix=os.path.basename(filename) + ".", suffix=".tmp", dir=folder)
+    try:
+        #the new file keeps the permissions of the file it replaces, temporary files are only readable by their owner
+        os.chmod(temporary, stat.S_IMODE(os.stat(filename).st_mode) if os.path.exists(filename) else 0o644)
+        with os.fdopen(handle, mode) as savefile:
+            yield savefile
+            savefile.flush()
+            os.fsync(savefile.fileno())
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+#saves a dictionary in the canvasdata.json schema as a .csim file
+def save(data, filename, compress=True):
+    with atomic_open(filename, "wb") as circuitfile:
+        circuitfile.write(encode(data, compress))
+
+
+#loads a .csim file as a dictionary in the canvasdata.json schema
+def load(filename):
+    with open(filename, "rb") as circuitfile:
+        return decode(circuitfile.read())
+
+
+#reads only the netlist of a .csim file for headless simulation. The layout section is never read
+def load_netlist(filename):
+    with open(filename, "rb") as circuitfile:
+        return decode_netlist(read_section(circuitfile, NETLIST))
+
+
+#converts canvasdata.json files to .csim and back
+def json_to_csim(json_filename, csim_filename, compress=True):
+    with open(json_filename, "r") as loadfile:
+        save(json.load(loadfile), csim_filename, compress)
+
+
+def csim_to_json(csim_filename, json_filename):
+    with atomic_open(json_filename, "w") as savefile:
+        json.dump(load(csim_filename), savefile)
+
+
+#converts between canvasdata.json and .csim files, choosing the direction from the extension of SOURCE
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="circuitfile", description="Convert circuits between JSON and the binary .csim format.")
+    parser.add_argument("source", help="circuit to convert (.json or .csim)")
+    parser.add_argument("destination", help="file to write")
+    parser.add_argument("--no-compress", action="store_true", help="do not compress the .csim sections")
+    args = parser.parse_args(argv)
+    if args.source.endswith(EXTENSION):
+        csim_to_json(args.source, args.destination)
+    else:
+        json_to_csim(args.source, args.destination, not args.no_compress)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#circuitsim.py purpose: command line and importable API for simulating saved circuits without tkinter or logging in.
+#It reads files in the same format as canvasdata.json (made by JSONCanvas.save_to_json) or binary .csim files, solves
+#them with the headless MNA solver and writes the results as JSON or CSV. Many files are spread across a pool of worker
+#processes.
+#
+#usage: python circuitsim.py [-o results.json] [--format json|csv] [--workers N] [--self-heating] [--per-source]
+#                            FILE_OR_DIRECTORY [...]
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import circuitfile
+from circuitfile import CircuitFileError
+from components import ComponentStore
+from solver import Netlist, MNASolver, CircuitError
+from topology import Topology
+
+#files in circuit folders which are not circuits, e.g. the manifest of the preset catalogue (see presets.py)
+SKIPPED_FILES = ("index.json",)
+#columns written when the results are saved as CSV
+CSV_FIELDS = ["file", "circuit_type", "components", "total_voltage", "total_current", "total_resistance",
+              "ammeters", "voltmeters", "error"]
+
+
+#reads a saved circuit and returns its graph dictionary, a ComponentStore of its components and its voltmeter pairs.
+#Only the component images are read from the widgets, lines and text are only needed to draw the circuit.
+#Only the netlist section of a .csim file is read
+def load_circuit(filename):
+    if filename.endswith(circuitfile.EXTENSION):
+        netlist = circuitfile.load_netlist(filename)
+        store = ComponentStore()
+        for ID, (kind, value) in netlist["components"].items():
+            store.add(kind, value, ID)
+        graph = {int(key): value for key, value in netlist["graph"].items()}
+        return graph, store, netlist["attributes"]["voltmeters"]
+    with open(filename, "r") as loadfile:
+        data = json.load(loadfile)
+    store = ComponentStore()
+    for widget_data in data["widgets"]:
+        if widget_data["type"] == "image":
+            store.add_from_tags(widget_data["tags"])
+    graph = {int(key): value for key, value in data["graph"].items()}
+    voltmeters = data["attributes"].get("voltmeters", [])
+    return graph, store, voltmeters
+
+
+#solves one circuit file and returns its results as a dictionary. Errors are reported in the dictionary instead of being
+#raised so that one bad file does not stop a batch. With self_heating=True thermistors are heated by their own power.
+#With per_source=True the branch currents caused by each battery and current source on its own are added for linear circuits
+def simulate_file(filename, self_heating=False, per_source=False):
+    result = {"file": filename}
+    try:
+        graph, store, voltmeters = load_circuit(filename)
+        netlist = Netlist.from_graph(graph, store.solver_components())
+        solver = MNASolver(netlist, self_heating)
+        solved = solver.solve()
+        result["circuit_type"] = Topology(netlist).classify()
+        result["components"] = len(store)
+        result["total_voltage"] = solved.total_voltage
+        result["total_current"] = solved.total_current
+        result["total_resistance"] = solved.total_resistance
+        result["ammeters"] = {str(ID): current for ID, current in solved.ammeter_readings().items()}
+        result["voltmeters"] = {str(ID): voltage for ID, voltage in solved.voltmeter_readings(voltmeters).items()}
+        result["branch_currents"] = {str(ID): current for ID, current in solved.branch_currents.items()}
+        #Newton-Raphson iterations needed by circuits with lightbulbs, diodes or self-heating thermistors
+        result["iterations"] = solver.convergence.iterations if solver.convergence else 0
+        if per_source and not solver.nonlinear:
+            parts = solver.superposition()
+            result["per_source"] = {str(source): {str(ID): float(currents[row]) for ID, currents in parts.branch_currents.items()}
+                                    for row, source in enumerate(parts.sources)}
+        result["error"] = ""
+    except (OSError, ValueError, KeyError, TypeError, CircuitError, CircuitFileError) as error:
+        result["error"] = type(error).__name__ + ": " + str(error)
+    return result
+
+
+#expands every directory into the .json and .csim files inside it (including sub-directories) and keeps files as they are
+def find_circuits(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, subfolders, filenames in os.walk(path):
+                subfolders.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith((".json", circuitfile.EXTENSION)) and filename not in SKIPPED_FILES:
+                        found.append(os.path.join(folder, filename))
+        else:
+            found.append(path)
+    return found
+
+
+#simulates every file, using a pool of worker processes when there is more than one file.
+#Results are returned in the same order as the files
+def simulate_files(filenames, workers=None, self_heating=False, per_source=False):
+    filenames = list(filenames)
+    if workers == 1 or len(filenames) <= 1:
+        return [simulate_file(filename, self_heating, per_source) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        #files are sent to the workers in chunks to cut down the cost of passing each one between processes
+        chunksize = max(1, len(filenames) // ((workers or os.cpu_count() or 1) * 4))
+        return list(pool.map(partial(simulate_file, self_heating=self_heating, per_source=per_source), filenames, chunksize=chunksize))
+
+
+def write_json(results, outfile):
+    json.dump(results, outfile, indent=2)
+    outfile.write("\n")
+
+
+#writes one row for each file. Meter readings are written as "ID=value" pairs separated by semicolons
+def write_csv(results, outfile):
+    writer = csv.DictWriter(outfile, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for result in results:
+        row = dict(result)
+        for meters in ("ammeters", "voltmeters"):
+            readings = result.get(meters, {})
+            row[meters] = ";".join(ID + "=" + str(value) for ID, value in readings.items())
+        writer.writerow(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="circuitsim", description="Simulate saved CircuitSim circuits without the GUI.")
+    parser.add_argument("paths", nargs="+", help="circuit JSON or .csim files or directories containing them")
+    parser.add_argument("-o", "--output", help="file to write the results to (default: standard output)")
+    parser.add_argument("-f", "--format", choices=("json", "csv"), help="output format (default: from the output file extension, otherwise json)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--self-heating", action="store_true", help="heat thermistors by the power they dissipate")
+    parser.add_argument("--per-source", action="store_true", help="add the currents caused by each source on its own (JSON only)")
+    args = parser.parse_args(argv)
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "csv" if args.output and args.output.endswith(".csv") else "json"
+
+    results = simulate_files(find_circuits(args.paths), args.workers, args.self_heating, args.per_source)
+    writer = write_csv if output_format == "csv" else write_json
+    if args.output:
+        with open(args.output, "w", newline="" if output_format == "csv" else None) as outfile:
+            writer(results, outfile)
+    else:
+        writer(results, sys.stdout)
+    #the exit status is 1 if any circuit could not be simulated
+    return 1 if any(result["error"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
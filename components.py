@@ -0,0 +1,153 @@
+#components.py purpose: in-memory registry of every component in a circuit, so that component data does not have to be
+#re-read from tkinter canvas tags. It does not need tkinter, so it is also used by headless code.
+#Components are stored in a dictionary keyed by their component ID, with an index for every kind of component and one
+#from canvas item IDs back to component IDs, so every lookup is O(1) however many components there are.
+#The thermistor model is also kept here so that the GUI and headless code convert temperature the same way.
+import numpy as np
+
+#every kind of component which can be placed on the canvas. New kinds are added at the end, as .csim files store the
+#position of each component's kind in this tuple
+KINDS = ("resistor", "varesistor", "thermistor", "battery", "switch", "voltmeter", "ammeter", "lightbulb",
+         "capacitor", "inductor", "diode", "current_source")
+#kinds whose second canvas tag holds their value (ohms, volts, farads, henries or amps)
+VALUED_KINDS = ("resistor", "varesistor", "thermistor", "battery", "capacitor", "inductor", "current_source")
+
+#thermistor constants used in the Steinhart-Hart (B parameter) equation
+THERMISTOR_R0 = 50 #resistance at reference temperature, known as nominal resistance
+THERMISTOR_T0 = 75.0 #reference temperature in Celsius, known as nominal temperature
+THERMISTOR_B = 3950.0 #common coefficient value of thermistors
+THERMISTOR_THERMAL_RESISTANCE = 50.0 #rise in temperature (°C) for every watt a thermistor dissipates, used for self-heating
+
+
+#re-arranged version of Steinhart-Hart equation to convert temperature (°C) to resistance (Ω).
+#It works on a single temperature or on a whole numpy array of temperatures at once
+def thermistor_resistance(temperature):
+    kelvin = np.asarray(temperature, dtype=float) + 273.15 #formula for conversion of °C to Kelvins (K)
+    return THERMISTOR_R0 * np.exp(THERMISTOR_B * (1 / (THERMISTOR_T0 + 273.15) - 1 / kelvin))
+
+
+#inverse of thermistor_resistance, converts resistance (Ω) back to the temperature (°C) it was set with
+def thermistor_temperature(resistance):
+    kelvin = 1 / (1 / (THERMISTOR_T0 + 273.15) - np.log(np.asarray(resistance, dtype=float) / THERMISTOR_R0) / THERMISTOR_B)
+    return kelvin - 273.15
+
+
+#reads the component ID, kind and value out of the tags of a component image.
+#Every component has an "ID<number>" tag. Resistors, variable resistors, thermistors, batteries, capacitors, inductors
+#and current sources store their value as the second tag. Returns None if the tags do not belong to a component.
+def parse_tags(tags):
+    id_tags = [tag for tag in tags if str(tag).startswith("ID")]
+    kinds = [tag for tag in tags if tag in KINDS]
+    if not id_tags or not kinds:
+        return None
+    kind = kinds[0]
+    value = float(tags[1]) if kind in VALUED_KINDS else None
+    return int(id_tags[0][2:]), kind, value
+
+
+#Component class purpose: holds everything known about one component
+class Component:
+    def __init__(self, ID, kind, value=None, image=None, items=(), path=""):
+        self.id = ID
+        self.kind = kind
+        self.value = value #ohms, volts, farads, henries or amps. None for meters, lightbulbs and diodes, True/False for switches
+        self.image = image #canvas item ID of the component image
+        self.items = list(items) #every canvas item which belongs to the component, starting with the image then its texts
+        self.path = path #file path of the image used to draw it
+
+    def __repr__(self):
+        return "Component(" + str(self.id) + ", " + self.kind + ", " + str(self.value) + ")"
+
+
+#ComponentStore class purpose: registry of components with O(1) lookups by ID, by kind and by canvas item
+class ComponentStore:
+    def __init__(self):
+        self.components = {} #component ID: Component
+        self.kinds = {kind: {} for kind in KINDS} #kind: {component ID: Component}
+        self.canvas_items = {} #canvas item ID: component ID
+        self.last_id = 0 #highest component ID used so far
+
+    def __len__(self):
+        return len(self.components)
+
+    def __contains__(self, ID):
+        return ID in self.components
+
+    def __iter__(self):
+        return iter(self.components.values())
+
+    #registers a new component and returns it. If no ID is given, the next free ID is used
+    def add(self, kind, value=None, ID=None, image=None, items=(), path=""):
+        if kind not in self.kinds:
+            raise ValueError("Unknown component kind: " + str(kind))
+        if ID is None:
+            ID = self.last_id + 1
+        if ID in self.components:
+            self.remove(ID)
+        component = Component(ID, kind, value, image, items, path)
+        self.components[ID] = component
+        self.kinds[kind][ID] = component
+        for item in component.items:
+            self.canvas_items[item] = ID
+        if image is not None:
+            self.canvas_items[image] = ID
+        self.last_id = max(self.last_id, ID)
+        return component
+
+    #registers a component from the tags of its canvas image, e.g. when a circuit is loaded from JSON
+    def add_from_tags(self, tags, image=None, items=()):
+        parsed = parse_tags(tags)
+        if parsed is None:
+            return None
+        ID, kind, value = parsed
+        if kind == "switch":
+            value = "switch_off" not in tags[-1] #the image path shows whether the switch was saved on or off
+        return self.add(kind, value, ID, image, items or ([image] if image is not None else []), tags[-1])
+
+    #links an extra canvas item (e.g. a text label) to a component
+    def attach_item(self, ID, item):
+        self.components[ID].items.append(item)
+        self.canvas_items[item] = ID
+
+    def remove(self, ID):
+        component = self.components.pop(ID)
+        del self.kinds[component.kind][ID]
+        for item in component.items + [component.image]:
+            self.canvas_items.pop(item, None)
+        return component
+
+    def get(self, ID):
+        return self.components.get(ID)
+
+    #returns the component which owns a canvas item, or None
+    def from_item(self, item):
+        ID = self.canvas_items.get(item)
+        return None if ID is None else self.components[ID]
+
+    #returns a dictionary of component ID: Component for one or more kinds
+    def of_kind(self, *kinds):
+        if len(kinds) == 1:
+            return self.kinds[kinds[0]]
+        found = {}
+        for kind in kinds:
+            found.update(self.kinds[kind])
+        return found
+
+    def exists(self, kind):
+        return bool(self.kinds[kind])
+
+    def set_value(self, ID, value):
+        self.components[ID].value = value
+
+    def clear(self):
+        self.components.clear()
+        for index in self.kinds.values():
+            index.clear()
+        self.canvas_items.clear()
+        self.last_id = 0
+
+    #returns the components as a dictionary of ID: (kind, value) for solver.Netlist. Voltmeters are left out as they are
+    #assumed to have infinitely large resistance. The value of a switch is True when it is on
+    def solver_components(self):
+        return {ID: (component.kind, component.value) for ID, component in self.components.items()
+                if component.kind != "voltmeter"}
@@ -0,0 +1,161 @@
+#database.py purpose: every access to the local SQLite database UserDetails.db, which holds user accounts and each user's
+#library of saved circuits. It also stores the simulations remembered by solvecache.SolveCache.
+#One long-lived connection is kept for every thread which uses the database instead of connecting and closing for every
+#query. The database uses write-ahead logging so that users reading their circuits do not wait for another user saving,
+#and a busy timeout so that users saving at the same time wait for each other instead of failing.
+#Circuits are keyed by (username, circuit name), so users cannot overwrite each other's circuits. The netlist and layout
+#are stored as separate compressed blobs in the sections of the binary circuit format, so the netlist can be read alone.
+import sqlite3
+import threading
+import time
+import zlib
+
+import circuitfile
+
+DATABASE = "UserDetails.db"
+BUSY_TIMEOUT = 10 #seconds a write waits for another user's write to finish
+PAGE_SIZE = 20 #circuits listed on each page of a user's library
+SOLUTIONS_SIZE = 1000 #simulations kept in the SOLUTIONS table, the least recently used are deleted first
+
+
+#Database class purpose: pool of long-lived connections (one per thread) with methods for users and circuits
+class Database:
+    def __init__(self, path=DATABASE):
+        self.path = path
+        self.local = threading.local()
+        self.create_tables()
+
+    #returns this thread's connection, opening it the first time it is needed
+    def connection(self):
+        connect = getattr(self.local, "connection", None)
+        if connect is None:
+            connect = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            connect.execute("PRAGMA journal_mode=WAL;")
+            connect.execute("PRAGMA synchronous=NORMAL;")
+            self.local.connection = connect
+        return connect
+
+    #closes this thread's connection
+    def close(self):
+        connect = getattr(self.local, "connection", None)
+        if connect is not None:
+            connect.close()
+            self.local.connection = None
+
+    def create_tables(self):
+        connect = self.connection()
+        with connect:
+            #table format of USERS is (username, password), as created by earlier versions of the app
+            connect.execute('''CREATE TABLE IF NOT EXISTS USERS(USERNAME TEXT, PASSWORD TEXT);''')
+            connect.execute('''CREATE INDEX IF NOT EXISTS USERS_USERNAME ON USERS(USERNAME);''')
+            #the primary key indexes a user's circuits by name, the second index lists them by when they were saved
+            connect.execute('''CREATE TABLE IF NOT EXISTS CIRCUITS(
+                                   USERNAME TEXT NOT NULL,
+                                   NAME TEXT NOT NULL,
+                                   COMPONENTS INTEGER NOT NULL,
+                                   SAVED REAL NOT NULL,
+                                   NETLIST BLOB NOT NULL,
+                                   LAYOUT BLOB NOT NULL,
+                                   PRIMARY KEY (USERNAME, NAME));''')
+            #circuits saved by earlier versions of the app have no VERSION, their blobs are circuitfile version 1
+            columns = [row[1] for row in connect.execute("PRAGMA table_info(CIRCUITS);")]
+            if "VERSION" not in columns:
+                connect.execute("ALTER TABLE CIRCUITS ADD COLUMN VERSION INTEGER NOT NULL DEFAULT 1;")
+            connect.execute('''CREATE INDEX IF NOT EXISTS CIRCUITS_SAVED ON CIRCUITS(USERNAME, SAVED);''')
+            #simulations by canonical circuit key, shared by every user as they do not depend on who built the circuit
+            connect.execute('''CREATE TABLE IF NOT EXISTS SOLUTIONS(
+                                   KEY TEXT PRIMARY KEY,
+                                   USED REAL NOT NULL,
+                                   ANALYSIS BLOB NOT NULL);''')
+            connect.execute('''CREATE INDEX IF NOT EXISTS SOLUTIONS_USED ON SOLUTIONS(USED);''')
+
+    #checks whether a username has already been registered
+    def user_exists(self, username):
+        cur = self.connection().execute("SELECT 1 FROM USERS WHERE USERNAME = ? LIMIT 1;", (username,))
+        return cur.fetchone() is not None
+
+    #checks whether the username and password match a registered user
+    def check_login(self, username, password):
+        cur = self.connection().execute("SELECT 1 FROM USERS WHERE (USERNAME, PASSWORD) = (?, ?) LIMIT 1;", (username, password))
+        return cur.fetchone() is not None
+
+    def add_user(self, username, password):
+        connect = self.connection()
+        with connect:
+            connect.execute("INSERT INTO USERS VALUES (?, ?);", (username, password))
+
+    #saves a circuit in the canvasdata.json schema under the user's circuit name, replacing a circuit with the same name
+    def save_circuit(self, username, name, data):
+        netlist = zlib.compress(circuitfile.encode_netlist(data))
+        layout = zlib.compress(circuitfile.encode_layout(data))
+        components = len(circuitfile.components_from_widgets(data["widgets"]))
+        connect = self.connection()
+        with connect:
+            connect.execute("INSERT OR REPLACE INTO CIRCUITS (USERNAME, NAME, COMPONENTS, SAVED, NETLIST, LAYOUT, VERSION) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?);",
+                            (username, name, components, time.time(), netlist, layout, circuitfile.VERSION))
+
+    #loads a circuit as a dictionary in the canvasdata.json schema, or None if the user has no circuit with that name
+    def load_circuit(self, username, name):
+        cur = self.connection().execute("SELECT NETLIST, LAYOUT, VERSION FROM CIRCUITS WHERE USERNAME = ? AND NAME = ?;",
+                                        (username, name))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        netlist = circuitfile.decode_netlist(zlib.decompress(row[0]))
+        widgets, line_ids, wires = circuitfile.decode_layout(zlib.decompress(row[1]), row[2])
+        return {"widgets": widgets, "line_ids": line_ids, "graph": netlist["graph"], "attributes": netlist["attributes"],
+                "wires": wires}
+
+    #loads only the netlist of a circuit for headless simulation, see circuitfile.decode_netlist
+    def load_netlist(self, username, name):
+        cur = self.connection().execute("SELECT NETLIST FROM CIRCUITS WHERE USERNAME = ? AND NAME = ?;", (username, name))
+        row = cur.fetchone()
+        return None if row is None else circuitfile.decode_netlist(zlib.decompress(row[0]))
+
+    def delete_circuit(self, username, name):
+        connect = self.connection()
+        with connect:
+            connect.execute("DELETE FROM CIRCUITS WHERE USERNAME = ? AND NAME = ?;", (username, name))
+
+    #returns one page of a user's circuits as a list of (name, number of components, time saved).
+    #Circuits are ordered by name, or newest first if by_saved is True. Only the indexes are read, not the blobs
+    def list_circuits(self, username, page=0, page_size=PAGE_SIZE, by_saved=False):
+        order = "SAVED DESC" if by_saved else "NAME"
+        cur = self.connection().execute("SELECT NAME, COMPONENTS, SAVED FROM CIRCUITS WHERE USERNAME = ? ORDER BY " + order +
+                                        " LIMIT ? OFFSET ?;", (username, page_size, page * page_size))
+        return cur.fetchall()
+
+    def count_circuits(self, username):
+        return self.connection().execute("SELECT COUNT(*) FROM CIRCUITS WHERE USERNAME = ?;", (username,)).fetchone()[0]
+
+    #returns the stored simulation with a canonical key as a compressed blob, or None
+    def load_solution(self, key):
+        connect = self.connection()
+        row = connect.execute("SELECT ANALYSIS FROM SOLUTIONS WHERE KEY = ?;", (key,)).fetchone()
+        if row is None:
+            return None
+        with connect:
+            connect.execute("UPDATE SOLUTIONS SET USED = ? WHERE KEY = ?;", (time.time(), key))
+        return row[0]
+
+    #stores a simulation, deleting the least recently used ones once there are more than SOLUTIONS_SIZE
+    def save_solution(self, key, analysis):
+        connect = self.connection()
+        with connect:
+            connect.execute("INSERT OR REPLACE INTO SOLUTIONS VALUES (?, ?, ?);", (key, time.time(), analysis))
+            connect.execute("DELETE FROM SOLUTIONS WHERE KEY NOT IN (SELECT KEY FROM SOLUTIONS ORDER BY USED DESC LIMIT ?);",
+                            (SOLUTIONS_SIZE,))
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+#returns the database shared by the whole app, creating its tables the first time
+def get_database(path=DATABASE):
+    global _database
+    with _database_lock:
+        if _database is None or _database.path != path:
+            _database = Database(path)
+        return _database
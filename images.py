@@ -0,0 +1,52 @@
+#images.py purpose: process-wide cache of the component images drawn on the canvas, shared by CircuitMaker and JSONCanvas,
+#so every PNG in component_img/ is only decoded once however many circuits and presets are loaded.
+#The cache holds at most CACHE_SIZE images and drops the least recently used one when it is full. Anything which puts an
+#image on the canvas keeps its own reference to it as well, so an image dropped from the cache is never erased from the
+#canvas.
+from collections import OrderedDict
+
+from PIL import ImageTk, Image
+
+CACHE_SIZE = 64 #maximum number of images kept
+
+_images = OrderedDict() #file path (or paths and fraction of a blend): PhotoImage, least recently used first
+hits = 0
+misses = 0
+
+
+#returns the tkinter image of a file, decoding it only the first time it is asked for.
+#Images belong to the tkinter window which is open when they are first loaded
+def load_image(path):
+    return _cached(path, lambda: ImageTk.PhotoImage(Image.open(path)))
+
+
+#returns the tkinter image part way between two images, e.g. a lightbulb which is partly lit. fraction 0 gives the
+#first image and 1 the second. Blends are cached in the same way as images
+def load_blend(path_a, path_b, fraction):
+    fraction = round(float(fraction), 3)
+
+    def blend():
+        image_a = Image.open(path_a).convert("RGBA")
+        image_b = Image.open(path_b).convert("RGBA").resize(image_a.size)
+        return ImageTk.PhotoImage(Image.blend(image_a, image_b, fraction))
+    return _cached((path_a, path_b, fraction), blend)
+
+
+def _cached(key, make):
+    global hits, misses
+    image = _images.get(key)
+    if image is not None:
+        hits += 1
+        _images.move_to_end(key)
+        return image
+    misses += 1
+    image = make()
+    _images[key] = image
+    while len(_images) > CACHE_SIZE:
+        _images.popitem(last=False)
+    return image
+
+
+#empties the cache, e.g. when the tkinter window the images belong to has been closed
+def clear():
+    _images.clear()
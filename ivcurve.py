@@ -0,0 +1,250 @@
+#ivcurve.py purpose: current-voltage (I-V) graphs of the whole circuit and of each of its components.
+#The battery voltage is swept over a grid. A linear circuit is solved once and every current and potential difference is
+#scaled over the whole grid with numpy in one step. A circuit with lightbulbs or diodes is solved with Newton's method at
+#every point, each starting from the point before, which shows their curved I-V graphs.
+#Graphs are swept and drawn with matplotlib's Agg renderer on a background thread and cached by a hash of the circuit
+#and grid, so reopening the window shows the cached picture straight away without solving the circuit again, and the
+#tkinter main loop is never blocked.
+import csv
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from tkinter import *
+from tkinter import filedialog, messagebox
+
+import numpy as np
+from PIL import ImageTk, Image
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import tracing
+from solver import MNASolver, RESISTIVE_KINDS, NONLINEAR_KINDS
+
+#components which are given their own curve. Meters are left out as they have no potential difference across them
+CURVE_KINDS = RESISTIVE_KINDS + NONLINEAR_KINDS
+#maximum number of drawn graphs kept in memory
+CACHE_SIZE = 32
+
+#(IVData, PNG image) of every drawn graph stored by circuit hash, oldest first
+_figure_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+#IVData class purpose: holds the swept supply voltages and the resulting currents and potential differences
+class IVData:
+    def __init__(self, voltages, total_current, curves):
+        self.voltages = voltages #supply voltage at every point
+        self.total_current = total_current #current supplied at every point
+        self.curves = curves #dictionary of component ID: (potential difference array, current array)
+
+
+#sweeps the supply voltage over voltages for a factorised MNASolver and returns an IVData.
+#Every battery is scaled by the same factor so that batteries keep the same ratio to each other
+@tracing.traced("solve.iv")
+def iv_curves(solver, voltages):
+    voltages = np.asarray(voltages, dtype=float)
+    if solver.nonlinear:
+        return iv_nonlinear(solver, voltages)
+    result = solver.solve()
+    nominal = result.total_voltage
+    scale = voltages / nominal if nominal else np.zeros(len(voltages))
+
+    total_current = scale * result.total_current
+    curves = {}
+    for ID, (kind, value) in sorted(solver.netlist.components.items()):
+        if kind in CURVE_KINDS:
+            curves[ID] = (np.abs(scale * result.branch_voltage(ID)), np.abs(scale * result.branch_currents[ID]))
+    return IVData(voltages, total_current, curves)
+
+
+#sweeps the supply voltage of a circuit with nonlinear components, solving it again at every point.
+#The sweep changes the battery voltages, so it uses its own solver instead of the one shared with the Simulate window
+def iv_nonlinear(solver, voltages):
+    solver = MNASolver(solver.netlist, solver.self_heating)
+    sources = solver.sources + solver.current_sources
+    nominal = [source[3] for source in sources]
+    supply = solver.solve().total_voltage
+    scale = voltages / supply if supply else np.zeros(len(voltages))
+    IDs = [ID for ID, (kind, value) in sorted(solver.netlist.components.items()) if kind in CURVE_KINDS]
+    total_current = np.zeros(len(voltages))
+    curves = {ID: (np.zeros(len(voltages)), np.zeros(len(voltages))) for ID in IDs}
+    for point, factor in enumerate(scale):
+        for source, value in zip(sources, nominal):
+            source[3] = value * factor
+        result = solver.solve()
+        total_current[point] = result.total_current
+        for ID in IDs:
+            curves[ID][0][point] = abs(result.branch_voltage(ID))
+            curves[ID][1][point] = abs(result.branch_currents[ID])
+    return IVData(voltages, total_current, curves)
+
+
+#returns a hash which identifies a circuit and its sweep grid, used as the key of the figure cache
+def circuit_hash(netlist, voltages):
+    description = {
+        "components": sorted([ID, kind, value] for ID, (kind, value) in netlist.components.items()),
+        "terminals": sorted([ID, list(pair)] for ID, pair in netlist.terminals.items()),
+        "grid": [float(voltages[0]), float(voltages[-1]), len(voltages)],
+    }
+    return hashlib.sha1(json.dumps(description, default=str).encode()).hexdigest()
+
+
+#draws the I-V graph with the Agg renderer and returns it as PNG bytes. No tkinter is used, so it can run on any thread
+@tracing.traced("render.iv")
+def render_iv(data):
+    figure = Figure(figsize=(6, 4.5), dpi=100)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(1, 1, 1)
+    axes.plot(data.voltages, data.total_current, color="black", linewidth=2, label="Whole circuit (V supply)")
+    for ID, (voltage, current) in data.curves.items():
+        axes.plot(voltage, current, label="Component " + str(ID))
+    axes.set_xlabel("Potential difference (V)")
+    axes.set_ylabel("Current (A)")
+    axes.set_title("Current-voltage graph")
+    axes.grid(True, alpha=0.3)
+    axes.legend(fontsize=8)
+    figure.tight_layout()
+    image = io.BytesIO()
+    figure.savefig(image, format="png")
+    return image.getvalue()
+
+
+#returns the (IVData, PNG) of a circuit and grid from the cache, or None if it has not been drawn yet
+def cached_graph(key):
+    with _cache_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+    return None
+
+
+#returns the (IVData, PNG) of a circuit and grid. The cache is checked first so a graph which was drawn before is
+#neither solved nor drawn again, otherwise the sweep is run, drawn and stored
+def iv_graph(solver, key, voltages):
+    graph = cached_graph(key)
+    if graph is not None:
+        return graph
+    data = iv_curves(solver, voltages)
+    graph = (data, render_iv(data))
+    with _cache_lock:
+        _figure_cache[key] = graph
+        while len(_figure_cache) > CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return graph
+
+
+#writes the sweep as a CSV table with one row per point
+def export_csv(data, filename):
+    with open(filename, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        header = ["supply_voltage", "total_current"]
+        for ID in data.curves:
+            header.extend(["V" + str(ID), "I" + str(ID)])
+        writer.writerow(header)
+        for point in range(len(data.voltages)):
+            row = [data.voltages[point], data.total_current[point]]
+            for voltage, current in data.curves.values():
+                row.extend([voltage[point], current[point]])
+            writer.writerow(row)
+
+
+#IVGraph class purpose: toplevel window which shows the I-V graph of the simulated circuit and exports it.
+#The sweep and drawing run on a worker thread, the window checks for the finished picture or error with after()
+class IVGraph(Toplevel):
+    def __init__(self, solver):
+        super().__init__()
+        self.solver = solver
+        self.title("Current-Voltage Graph")
+        self["bg"] = "#1A2421"
+        self.data = None
+        self.png = None
+        self.worker = None
+        self.pending = None
+
+        #the grid defaults to 0V up to double the supply voltage
+        supply = solver.solve().total_voltage
+        controls = Frame(self, bg="#1A2421")
+        controls.pack(pady=5)
+        Label(controls, text="Max V:", font=('Rockwell', 10, 'bold'), fg='white', bg="#1A2421").pack(side=LEFT)
+        self.max_entry = Entry(controls, width=6, font=('Rockwell', 10, 'bold'))
+        self.max_entry.insert(0, str(2 * supply if supply else 10))
+        self.max_entry.pack(side=LEFT, padx=4)
+        Label(controls, text="Points:", font=('Rockwell', 10, 'bold'), fg='white', bg="#1A2421").pack(side=LEFT)
+        self.points_entry = Entry(controls, width=6, font=('Rockwell', 10, 'bold'))
+        self.points_entry.insert(0, "200")
+        self.points_entry.pack(side=LEFT, padx=4)
+        Button(controls, text="Plot", font=('Rockwell', 10, 'bold'), fg='white', bg='#0f1c14', command=self.plot).pack(side=LEFT, padx=4)
+        Button(controls, text="Export", font=('Rockwell', 10, 'bold'), fg='white', bg='#0f1c14', command=self.export).pack(side=LEFT, padx=4)
+
+        self.graph_label = Label(self, text="Drawing graph...", font=('Rockwell', 12), fg='white', bg="#1A2421", width=60, height=22)
+        self.graph_label.pack(padx=10, pady=10)
+        self.plot()
+
+    #reads the grid from the entries and starts the sweep and drawing on a worker thread
+    def plot(self):
+        try:
+            maximum = float(self.max_entry.get())
+            points = int(self.points_entry.get())
+            if maximum <= 0 or points < 2:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Invalid grid", "Enter a positive maximum voltage and at least 2 points.", parent=self)
+            return
+        voltages = np.linspace(0, maximum, points)
+        key = circuit_hash(self.solver.netlist, voltages)
+
+        #a new request replaces any which has not started drawing yet
+        self.pending = (key, voltages)
+        if self.worker is None or not self.worker.is_alive():
+            self.start_worker()
+
+    def start_worker(self):
+        key, voltages = self.pending
+        self.pending = None
+        self.finished = None
+        self.error = None
+
+        #an error is kept for check_worker to show, as messageboxes can only be opened on the tkinter thread
+        def work():
+            try:
+                self.finished = iv_graph(self.solver, key, voltages)
+            except Exception as error:
+                self.error = error
+
+        self.worker = threading.Thread(target=work, daemon=True)
+        self.worker.start()
+        self.after(30, self.check_worker)
+
+    #runs on the tkinter thread every 30ms until the worker has finished, then shows the picture or the error
+    def check_worker(self):
+        if not self.winfo_exists():
+            return
+        if self.worker.is_alive():
+            self.after(30, self.check_worker)
+            return
+        if self.finished is not None:
+            self.data, self.png = self.finished
+            self.graph_image = ImageTk.PhotoImage(Image.open(io.BytesIO(self.png)))
+            self.graph_label.config(image=self.graph_image, text="", width=0, height=0)
+        elif self.error is not None:
+            if self.data is None:
+                self.graph_label.config(text="The graph could not be drawn.")
+            messagebox.showerror("I-V graph failed", str(self.error), parent=self)
+        if self.pending is not None:
+            self.start_worker()
+
+    #saves the graph as a PNG or the sweep as a CSV table depending on the chosen extension
+    def export(self):
+        if self.data is None:
+            return
+        filename = filedialog.asksaveasfilename(parent=self, defaultextension=".png",
+                                                filetypes=[("PNG image", "*.png"), ("CSV table", "*.csv")])
+        if not filename:
+            return
+        if filename.endswith(".csv"):
+            export_csv(self.data, filename)
+        else:
+            with open(filename, "wb") as imagefile:
+                imagefile.write(self.png)
@@ -1,15 +1,47 @@
 #tkinter framework used for UI
 #PIL for opening images and window backgrounds
 #regular expressions for login validation
-#sqlite for storing username and password in database
-#math for rounding significant figures and using Steinhart–Hart formula
+#sqlite errors from the database of users and saved circuits (see database.py)
+#math for rounding significant figures
 from tkinter import *
-from tkinter import messagebox
+from tkinter import messagebox, simpledialog, filedialog
 from PIL import ImageTk, Image
 import re
 import sqlite3
-from math import log10, floor, exp
+from math import log10, floor
 import json
+import copy
+import io
+import os
+import time
+import circuitfile
+import tracing
+from database import get_database, PAGE_SIZE
+from images import load_image, load_blend
+from canvasmodel import ModelCanvas
+from tasks import Task, read_file
+from presets import PresetCatalogue, thumbnail_bytes
+from solver import CircuitError, MNASolver
+from session import SimulationSession
+from solvecache import SolveCache
+from components import ComponentStore, thermistor_resistance
+from ivcurve import IVGraph
+from nonlinear import bulb_brightness
+from router import Router, segments
+from wires import WireMap
+from animation import FlowAnimation
+from tolerance import tolerance_analysis
+
+#milliseconds between live simulations while a scale is moved, about one every frame at 60Hz
+LIVE_INTERVAL = 16
+#milliseconds between moves of a dragged component, so motion events are drawn at most once a frame
+DRAG_INTERVAL = 16
+#number of steps a lightbulb's brightness is drawn with between off and fully lit
+BRIGHTNESS_LEVELS = 8
+#number of random samples solved by the tolerance analysis of the simulation window
+TOLERANCE_SAMPLES = 10000
+#widgets written between progress reports when a circuit is exported to a file
+PROGRESS_WIDGETS = 100
 
 #rounds to 3 significant figures which is typically rounded to in physics but also used for display convenience due to fewer numbers
 def round_to_3sf(decimal):
@@ -20,11 +52,13 @@ def round_to_3sf(decimal):
 #ComponentValue class purpose: opens toplevel tkinter window and prompts user to enter ohm/voltage value which then gets passed to circuitmaker class for later calculations.
 #inherits TopLevel from tkinter to make child window.
 class ComponentValue(Toplevel):
-    def __init__(self, component_name):
+    def __init__(self, component_name, on_change=None):
         #calling superclass constructor
         super().__init__()
         #initialises the value of the component which will later be returned
         self.value = 0
+        #optional function called with every new resistance while the thermistor scale is moved, used for live simulation
+        self.on_change = on_change
         #creates instance
         self.component_name = component_name
         # Create the input label and entry widget based on the component name
@@ -104,15 +138,14 @@ class ComponentValue(Toplevel):
         converted_resistance = self.convert_temp(temperature_int) #temperature passed into parameter of convert_temp to be converted to resistance
         kelvin = round((temperature_int + 273.15),2) #formula for conversion of °C to Kelvins (K), rounded to 2dp
         self.value_label.config(text=str(kelvin) + " Kelvins\n" + str(converted_resistance)+"Ω")
+        if self.on_change is not None:
+            self.on_change(converted_resistance)
 
         #re-arranged version of Steinhart-Hart equation to convert temperature to resistance
     def convert_temp(self, temperature):
         if self.component_name == "thermistor":
-            r0 = 50  # resistance at reference temperature, known as nominal resistance
-            t0 = 75.0  # reference temperature in Celsius, known as nominal temperature
-            B = 3950.0  # common coefficient value of thermistors
-            converted_temperature = temperature + 273.15 #formula for conversion of °C to Kelvins (K)
-            r = r0 * exp(B * (1 / (t0 + 273.15) - 1 / converted_temperature)) #rearranged Steinhart-Hart equation to calculate resistance
+            #the equation is shared with headless sweeps in the components module
+            r = float(thermistor_resistance(temperature))
             r = round(r, 2) #rounding resistance to 2dp
             return r #returns resistance value to caller which will then be stored in value attribute
 
@@ -163,14 +196,8 @@ class Authentication():
         self.output_label = Label(self.window, bg="#000000", font=('Rockwell', 8, 'bold'), fg="white")
         self.output_label.pack(pady=4)
 
-        #connecting to local database
-        connect = sqlite3.connect('UserDetails.db')
-
-        #SQL query to create the table 'USERS' if it does not exist in the local files. Table format is (username, password)
-        connect.execute('''CREATE TABLE IF NOT EXISTS USERS(USERNAME TEXT, PASSWORD TEXT);''')
-
-        #closing connection with local database
-        connect.close()
+        #long-lived connection to the local database, which creates the 'USERS' and 'CIRCUITS' tables if they do not exist
+        self.database = get_database()
 
     #to be accessed once authentication is successful
     def to_circuitpage(self):
@@ -214,31 +241,22 @@ class Authentication():
             return
 
         else:
-            #if all negative if statements are dodged, local SQL database is connected
-            connect = sqlite3.connect('UserDetails.db')
-
-            #tries to compare details. if error is encountered, entire program is aborted due to database failure, however this is highly unlikely since the database is local
+            #tries to compare details using the shared database connection. if error is encountered, entire program is aborted due to database failure, however this is highly unlikely since the database is local
             try:
-                cur = connect.cursor() #allows traversal of database records
-                # executes SQL query. ? is a parameter notation, while username is an argument which is passed into it.
-                cur.execute("SELECT * FROM USERS WHERE USERNAME = ?;", (username,)) #selects username of the username which the user inputs
-                check = cur.fetchall() #fetches the username which the user entered if it exists, otherwise it fetches nothing
-
-                if check: #if check has the user's entered username, they'll have to enter another username.
+                if self.database.user_exists(username): #if the username is already registered, they'll have to enter another username.
                     self.output_label.config(text="Username already exists.")
-                else:
-                    #inserts the new username and the user's password into the local SQL database's table 'USERS'
-                    cur.execute("INSERT INTO USERS VALUES (?, ?);", (username, password,))
-                    self.username = username
-                    connect.commit() #the changes to the database are now committed and permanent
-                    self.output_label.config(text=("Welcome, " + str(username)))#delays 3 seconds and welcomes user
-                    self.window.destroy() #closes window
-                    self.to_circuitpage()#calls to_circuitpage() method which creates an instance of CircuitMaker class, opening its window
-            except:
-                # if error found, app is closed as well as connection with 3 second delay
+                    return
+                #inserts the new username and the user's password into the local SQL database's table 'USERS' and commits it
+                self.database.add_user(username, password)
+            except sqlite3.Error:
+                # if error found, app is closed as well as connection
                 self.output_label.config(text="Error while inserting data. Aborting connection...")
-                connect.close()
+                self.database.close()
                 exit()
+            self.username = username
+            self.output_label.config(text=("Welcome, " + str(username)))#welcomes user
+            self.window.destroy() #closes window
+            self.to_circuitpage()#calls to_circuitpage() method which creates an instance of CircuitMaker class, opening its window
 
     #login method, accessed if user clicks registration button
     def login(self):
@@ -251,35 +269,32 @@ class Authentication():
             return
 
         else:
-            #local SQL database is connected
-            connect = sqlite3.connect('UserDetails.db')
-            #tries to compare details. if error is encountered, entire program is aborted due to database failure, however this is highly unlikely since the database is local
+            #tries to compare details using the shared database connection. if error is encountered, entire program is aborted due to database failure, however this is highly unlikely since the database is local
             try:
-                cur = connect.cursor() #allows traversal of database records
-                #passes username and password into ? parameters
-                cur.execute("SELECT * FROM USERS WHERE (USERNAME, PASSWORD) = (?, ?);", (username, password)) #selects username and password which are the exact copy if they exist
-                check = cur.fetchall() #fetches details if it exists in the local SQL database
-
-                if not check: #if check is empty and no details were found, error message displayed
-                    self.output_label.config(text="Incorrect username/password or account not found")
-                else: #welcomes user and makes 3 second delay before closing window
-                    self.output_label.config(text=("Welcome, " + str(username)))
-                    self.username = username
-                    self.window.destroy() #closes window
-                    self.to_circuitpage() #calls to_circuitpage() method which creates an instance of CircuitMaker class, opening its window
-            except:
-                # if error found, app is closed as well as connection with 3 second delay
+                found = self.database.check_login(username, password) #checks for a user with exactly this username and password
+            except sqlite3.Error:
+                # if error found, app is closed as well as connection
                 self.output_label.config(text="Error while fetching data. Aborting connection...")
-                connect.close()
+                self.database.close()
                 exit()
+            if not found: #if no details were found, error message displayed
+                self.output_label.config(text="Incorrect username/password or account not found")
+            else: #welcomes user and closes window
+                self.output_label.config(text=("Welcome, " + str(username)))
+                self.username = username
+                self.window.destroy() #closes window
+                self.to_circuitpage() #calls to_circuitpage() method which creates an instance of CircuitMaker class, opening its window
 
 #purpose of JSONCanvas class is to export the entire canvas into JavaScript objectn otation.
+#The canvas passed to it must be a canvasmodel.ModelCanvas, as circuits are saved from its model of the canvas.
 #it supports saving all widgets of the tkinter canvas, and also loading all widgets from the canvas
 class JSONCanvas:
-    def __init__(self, canvas, line_ids, graph, battery_exists, varesistor_exists, switch_exists, thermistor_exists, totalcomponents, voltmeters):
+    def __init__(self, canvas, wires, graph, battery_exists, varesistor_exists, switch_exists, thermistor_exists, totalcomponents, voltmeters, store):
         #making instances of contents passed through parameters
         self.canvas = canvas
-        self.line_ids = line_ids
+        self.store = store #component store which loaded components are registered in
+        self.wires = wires #wires.WireMap which is saved with the circuit and which loaded wires are added to
+        self.line_ids = wires.line_ids()
         self.graph = graph
         self.battery_exists = battery_exists
         self.varesistor_exists = varesistor_exists
@@ -288,64 +303,58 @@ class JSONCanvas:
         self.totalcomponents = totalcomponents
         self.voltmeters = voltmeters
 
-    #method to save the tkinter canvas into user-specfic JSON file
-    def save_to_json(self, filename):
-        #makes dictionary with all tkinter widget attributes
-        data = {"widgets": [], "line_ids": self.line_ids, "graph": self.graph, "attributes": {
+    #method to save a copy of the canvas made by canvas_data() into a JSON file in the canvasdata.json format.
+    #Only the copy is read, so it can run on a worker thread while the canvas is still being edited. The widgets are
+    #written to the file one at a time, reporting progress to the tasks.Task if one is given. The file is written to a
+    #temporary file first which then replaces the old one, so a crash part way through saving leaves the previous file as it was
+    def save_to_json(self, filename, data, task=None):
+        #opens temporary file in write mode. It replaces the current content once everything has been written
+        with circuitfile.atomic_open(filename, "w") as savefile:
+            savefile.write('{"widgets": [')
+            widgets = data["widgets"]
+            for number, widget_data in enumerate(widgets):
+                if number:
+                    savefile.write(", ")
+                json.dump(widget_data, savefile)
+                if task is not None and number % PROGRESS_WIDGETS == 0:
+                    task.progress(number / len(widgets), "Writing " + os.path.basename(filename))
+            #everything else is written in the same order and format as json.dump would write the whole dictionary
+            savefile.write("]")
+            for key, value in data.items():
+                if key != "widgets":
+                    savefile.write(", " + json.dumps(key) + ": ")
+                    json.dump(value, savefile)
+            savefile.write("}")
+
+    #method to save a copy of the canvas made by canvas_data() into the compact binary .csim format. Like save_to_json it
+    #only reads the copy, so it can run on a worker thread
+    def save_to_csim(self, filename, data, compress=True):
+        circuitfile.save(data, filename, compress)
+
+    #returns everything except the widgets of the canvasdata.json schema. Wires refer to their lines by position in the
+    #widgets, so they can be found again when the circuit is loaded
+    def canvas_attributes(self):
+        return {"line_ids": self.line_ids, "graph": self.graph, "attributes": {
             "battery_exists": self.battery_exists,
             "varesistor_exists": self.varesistor_exists,
             "switch_exists": self.switch_exists,
             "thermistor_exists": self.thermistor_exists,
             "totalcomponents": self.totalcomponents,
             "voltmeters" : self.voltmeters
-        }}
-
-        #gets all widgets of the canvas
-        for item in self.canvas.find_all():
-            #determines widget type
-            widget_type = self.canvas.type(item)
-            #if it is a text widget, it will obtain the x, y coords as well as the text itself and the font
-            if widget_type == "text":
-                widget_data = {
-                    "type": "text",
-                    "x": self.canvas.coords(item)[0],
-                    "y": self.canvas.coords(item)[1],
-                    "text": self.canvas.itemcget(item, "text"),
-                    "font": self.canvas.itemcget(item, "font"),
-                }
-            #if it is an image, it will obtain the x coords, y coords and the tags of the image
-            elif widget_type == "image":
-                widget_data = {
-                    "type": "image",
-                    "x": self.canvas.coords(item)[0],
-                    "y": self.canvas.coords(item)[1],
-                    "tags": self.canvas.gettags(item),
-                }
-            #obtains target x,y value pair and source x,y value pair as well as the line width
-            elif widget_type == "line":
-                widget_data = {
-                    "type": "line",
-                    "x1": self.canvas.coords(item)[0],
-                    "y1": self.canvas.coords(item)[1],
-                    "x2": self.canvas.coords(item)[2],
-                    "y2": self.canvas.coords(item)[3],
-                    "width": self.canvas.itemcget(item, "width"),
-                }
-            else:
-                # Unsupported widget type, so we skip it
-                continue
-            #assigns value to widget which will be differently assigned based on widget_type
-            data["widgets"].append(widget_data)
-
-        #opens file in write mode. Overwrites current content if it exists, otherwise it will make a new JSON file
-        with open(filename, "w") as savefile:
-            #dumps all contents from data dictionary
-            json.dump(data, savefile)
-
-    def load_from_json(self, filename):
-        with open(filename, "r") as loadfile:
-            #loads JSON contents
-            data = json.load(loadfile)
+        }, "wires": self.wires.to_list(self.canvas.positions())}
+
+    #returns the whole canvas as a dictionary in the canvasdata.json schema. The widgets come from the canvas model, which
+    #holds the coordinates, text, font, tags and width of every image, text and line, so no tkinter queries are needed
+    @tracing.traced("canvas.read")
+    def canvas_data(self):
+        data = {"widgets": [dict(widget_data) for widget_data in self.canvas.widgets()]}
+        #the graph and lists are copied so that the circuit can be saved on another thread while it is still being edited
+        data.update(copy.deepcopy(self.canvas_attributes()))
+        return data
+
+    #draws a circuit from a dictionary in the canvasdata.json schema
+    @tracing.traced("canvas.load")
+    def load_data(self, data):
         #slices value from data key and assigns it to attributes
         self.line_ids = data["line_ids"]
         self.graph = data["graph"]
@@ -357,46 +366,47 @@ class JSONCanvas:
         self.voltmeters = data['attributes'].get('voltmeters', [])
 
 
-        #stores instance of image to prevent it from being erased from canvas instantly
-        image_cache = {}
+        #images used by the canvas are referenced by the canvas so that they are not erased if the shared cache drops them
+        if not hasattr(self.canvas, "image_cache"):
+            self.canvas.image_cache = {}
+        image_cache = self.canvas.image_cache
+        #the value and ID texts of a component are saved straight after its image, so they are linked to the last component
+        component = None
+        items = [] #canvas item drawn for every widget, which saved wires find their lines in
         for widget_data in data["widgets"]:
+            item = None
             #creates_text exactly how it looked before it was saved wit the same coordinates, text and font
             if widget_data["type"] == "text":
-                item = self.canvas.create_text(
-                    widget_data["x"], widget_data["y"],
-                    text=widget_data["text"],
-                    font=widget_data["font"],
-                )
+                item = self.canvas.create_text(widget_data["x"], widget_data["y"], text=widget_data["text"], font=widget_data["font"])
+                if component is not None:
+                    self.store.attach_item(component.id, item)
             #creates image exactly how it looked before saving, keeping all tags of the image
             elif widget_data["type"] == "image":
-                #this try-except accesses the 4th or 3rd tag of the image, which contains the direct filepath of the image
-                try:
-                    image_path = widget_data["tags"][4]
-                except:
-                    image_path = widget_data["tags"][3]
-                #makes the image creatable and stores image instance if it does not exist in image_cache dictionary, otherwise it is loadde
-                if image_path not in image_cache:
-                    image = ImageTk.PhotoImage(Image.open(image_path))
-                    image_cache[image_path] = image
-                else:
-                    image = image_cache[image_path]
-
-                #same image is created with same coords and tags
-                item = self.canvas.create_image(
-                    widget_data["x"], widget_data["y"],
-                    image=image
-                )
-                self.canvas.itemconfig(item, tags=widget_data["tags"])
-                # Store the image as a property of the canvas widget
-                self.canvas.image_cache = image_cache
+                #the last tag of the image is the direct filepath of the image
+                image_path = widget_data["tags"][-1]
+                #the image is only decoded the first time any canvas uses it, after that it comes from the shared cache
+                image = image_cache.get(image_path)
+                if image is None:
+                    image = image_cache[image_path] = load_image(image_path)
+
+                #same image is created with same coords, and the tags are passed when it is created so it takes one call
+                item = self.canvas.create_image(widget_data["x"], widget_data["y"], image=image, tags=widget_data["tags"])
+                #registers the component so that it can be looked up without re-reading its tags
+                component = self.store.add_from_tags(widget_data["tags"], item)
 
             #same line is creates with same source and target coordinate pairs as well as same width
             elif widget_data["type"] == "line":
-                item = self.canvas.create_line(
-                    widget_data["x1"], widget_data["y1"],
-                    widget_data["x2"], widget_data["y2"],
-                    width=widget_data["width"],
-                )
+                item = self.canvas.create_line(widget_data["x1"], widget_data["y1"], widget_data["x2"], widget_data["y2"], width=widget_data["width"])
+            items.append(item)
+        if "wires" in data:
+            self.wires.load(data["wires"], items)
+        else:
+            #circuits saved before wires were saved do not say which connection each line is part of. Their wires are
+            #made again from the graph and voltmeters and routed when the circuit is drawn, replacing the old lines
+            self.wires.from_graph(self.graph, self.voltmeters)
+            old_lines = [item for item, widget_data in zip(items, data["widgets"]) if widget_data["type"] == "line"]
+            if old_lines:
+                self.canvas.delete(*old_lines)
         #returns long one-dimensional list which will be sent to the caller in the CircuitMaker class to then be sliced and stored
         return [self.line_ids,self.graph, self.battery_exists, self.varesistor_exists, self.switch_exists, self.thermistor_exists, self.totalcomponents, self.voltmeters]
 
@@ -407,7 +417,6 @@ class JSONCanvas:
 #Premade circuits are useable as well. Once the button is pressed, an instance of the Preset class is made which will inherit TopLevel and become a top level window
 #To show simulation results, an instance of the Simulate class will be created and will inherit TopLevel.
 class CircuitMaker:
-    line_ids = [] #stores all line_ids which will be later accessed for animation purposes
     def __init__(self, circuitwindow, username):
         self.window = circuitwindow #stored instance of tkinter window
         #initialization and frontend
@@ -422,7 +431,8 @@ class CircuitMaker:
 
         #setting up window and canvas dimensions and colour
         self.window.geometry(str(800) + "x" + str(600))
-        self.canvas = Canvas(self.window, width=650, height=550, bg="#ffffff")
+        #the canvas keeps a model of every item drawn on it, which circuits are saved from
+        self.canvas = ModelCanvas(self.window, width=650, height=550, bg="#ffffff")
         self.canvas.pack(side=RIGHT, anchor=SE)
 
         #title text Label
@@ -434,8 +444,11 @@ class CircuitMaker:
                       borderwidth=4)
         welcome.place(x=600, y=0)
         self.component_array = [] #setting up data structure to hold internal component IDs in array
+        self.store = ComponentStore() #registry of every component on the canvas, looked up by component ID in O(1)
+        #keeps the analysis of the circuit so only changed values are re-solved. Circuits simulated before, in this run
+        #or an earlier one, are found in the solve cache instead of being solved again
+        self.session = SimulationSession(SolveCache(database=get_database()))
         self.graph = {} #stores graph which represents circuit. The source graph dictionary is in the WireGeneration class, but that will later be stored into this
-        self.component_limit = 5 #max number of components in simulation
         self.id = 0 #a counter which the user can use to connect and identify components easier
 
         #initialization of values
@@ -452,8 +465,23 @@ class CircuitMaker:
         self.switched_on = True
         self.total_components = 0
         self.voltmeters = []
-        self.json_loaded = False
-        #flags to check if these components exist on the canvas
+        #values changed by moving a scale which have not been simulated yet, stored as component ID: value
+        self.live_values = {}
+        self.live_job = None
+        #where the component being dragged should be moved to at the next frame, as (component ID, x, y)
+        self.drag_target = None
+        self.drag_job = None
+        #every connection and the lines drawn for it, so the wires of a component or a line are found in O(1)
+        self.wires = WireMap()
+        #routes every wire around the components and other wires. It keeps a grid of where they all are on the canvas
+        self.router = Router(650, 550)
+        #lightbulb ID: (brightness level, image drawn), which also keeps blended images from being erased
+        self.lightbulb_images = {}
+        self.database = get_database() #shared long-lived connection to the database which holds the user's circuit library
+        self.circuit_name = "canvasdata" #name the circuit was last saved or loaded as
+        self.task = None #save or load running on a worker thread
+        self.presets = PresetCatalogue() #catalogue of the premade circuits in the preset folder
+        #flags to check if these components exist on the canvas. Any number of each component can be added
         self.thermistor_exists = False
         self.varesistor_exists = False
         self.switch_exists = False
@@ -462,10 +490,6 @@ class CircuitMaker:
         #flag to detect if Simulate button has been pressed
         self.simbutton_on = False
 
-        #initially false. These are for line creation purposes to represent wires.
-        self.vertical_parallel = False
-        self.horizontal_parallel = False
-
         #directories of images passed as arguments into open_img method for better efficiency
         self.battery_path = "component_img/battery.png"
         self.resistor_path = "component_img/resistor.png"
@@ -543,7 +567,7 @@ class CircuitMaker:
         self.run_button.place(x=16, y=420)
 
         self.preset_button = Button(self.window, text="Load circuit", font=('Rockwell', 12, 'bold'), fg='white',
-                                    bg='#0f1c14', command=lambda: self.load_presets)
+                                    bg='#0f1c14', command=self.load_canvas)
         self.preset_button.place(x=15, y=470)
 
         self.save_button = Button(self.window, text="Save Circuit", font=('Rockwell', 12, 'bold'), fg='white', bg='#0f1c14', command = self.save_canvas)
@@ -556,27 +580,46 @@ class CircuitMaker:
                                    command=self.show_cheatsheet)
         self.cheatsheet_button.place(x=560)
 
+        #exports the circuit to a canvasdata.json or .csim file, e.g. to simulate it with circuitsim.py
+        self.export_button = Button(self.canvas, text="Export", font=('Rockwell', 11, 'bold'), fg='white', bg='#0f1c14',
+                                    command=self.export_canvas)
+        self.export_button.place(x=490)
+
         self.load_preset_button = Button (self.window, text="Load Preset", font=('Rockwell', 11, 'bold'), fg='white', bg='#0f1c14', command=self.load_presets)
         self.load_preset_button.place(x=18, y=545)
 
-    #method to open image file using PIL library
+        #animates the current flowing in the wires while the circuit is simulated
+        self.animation = FlowAnimation(self.canvas, self.wires)
+
+        #every line of a wire is tagged 'wire'. Pointing at a wire highlights all of its lines, right clicking it deletes it
+        self.canvas.tag_bind("wire", "<Enter>", lambda event: self.highlight_wire(True))
+        self.canvas.tag_bind("wire", "<Leave>", lambda event: self.highlight_wire(False))
+        self.canvas.tag_bind("wire", "<Button-3>", lambda event: self.delete_wire())
+
+    #method to open image file using PIL library. Images come from the cache shared with JSONCanvas, so each file is only decoded once
     def open_img(self,imagefile):
-        canvas_img=ImageTk.PhotoImage(Image.open(imagefile))
+        canvas_img=load_image(imagefile)
         return canvas_img
 
-    #method to toggle switch
-    def toggle(self):
-        #finds internal tkinter ID of switch
-        switch = self.canvas.find_withtag("switch")[0]
-        self.id = self.switchIDinsance
-        self.image_ID = "ID" + str(self.id)
-        self.switched_on = not self.switched_on #performs NOT operation on boolean value
-        if self.switched_on: #if switched_on is True
-            self.switch_button.config(text="ON", bg="#66963b") #configure colour,text and image to represent that it is on
-            self.canvas.itemconfig(switch, image=self.switchon_image, tags=(self.id, self.image_ID, 'switch', self.switchon_path) )
+    #method to toggle a switch. The ON/OFF button toggles the latest switch, double clicking a switch toggles that one
+    def toggle(self, ID=None):
+        #looks up the switch in the component store instead of searching the canvas
+        switch = self.store.get(ID or self.switchIDinsance)
+        image_ID = "ID" + str(switch.id)
+        switch.value = not switch.value #performs NOT operation on boolean value
+        #the circuit only conducts through the switches if every switch is on
+        self.switched_on = all(other.value for other in self.store.of_kind("switch").values())
+        if switch.value: #if the switch is now on
+            switch.path = self.switchon_path
+            self.canvas.itemconfig(switch.image, image=self.switchon_image, tags=(switch.id, image_ID, 'switch', self.switchon_path) )
         else:
-            self.switch_button.config(text="OFF", bg="#a80d22") #configure colour,text and image to represent that it is off
-            self.canvas.itemconfig(switch, image=self.switchoff_image, tags=(self.id, self.image_ID, 'switch', self.switchoff_path))
+            switch.path = self.switchoff_path
+            self.canvas.itemconfig(switch.image, image=self.switchoff_image, tags=(switch.id, image_ID, 'switch', self.switchoff_path))
+        if switch.id == self.switchIDinsance:
+            if switch.value:
+                self.switch_button.config(text="ON", bg="#66963b") #configure colour and text to represent that it is on
+            else:
+                self.switch_button.config(text="OFF", bg="#a80d22") #configure colour and text to represent that it is off
 
     #basic method to open toplevel window to display guide. This is a straightforward label which only uses labels.
     def display_guide(self):
@@ -606,345 +649,394 @@ class CircuitMaker:
 
     #method to add draggable resistor component in the middle of the canvas.
     def add_resistor(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the resistor
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        else:
-            window = ComponentValue("resistor") #stores instance of ComponentValue class, passing the argument, "resistor"
-            window.wait_window() #prevents further execution of method until window closed
-            self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
-            if self.ohms: #if a value has been assigned, the following will be executed.
-                self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-                self.component_limit -= 1 #decrements the component limit
-                self.image_ID = "ID" + str(self.id)
+        window = ComponentValue("resistor") #stores instance of ComponentValue class, passing the argument, "resistor"
+        window.wait_window() #prevents further execution of method until window closed
+        self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
+        if self.ohms: #if a value has been assigned, the following will be executed.
+            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+            self.image_ID = "ID" + str(self.id)
 
-                #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-                self.component = self.canvas.create_image(400, 300, image=self.resistor_image, tags=(self.id, self.ohms, self.image_ID, 'resistor',self.resistor_path))
+            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+            self.component = self.canvas.create_image(400, 300, image=self.resistor_image, tags=(self.id, self.ohms, self.image_ID, 'resistor',self.resistor_path))
 
-                #displays resistor ohm value
-                self.value_display = self.canvas.create_text(388, 317.5, text=str(self.ohms) + "Ω")
+            #displays resistor ohm value
+            self.value_display = self.canvas.create_text(388, 317.5, text=str(self.ohms) + "Ω")
 
-                #displays component ID
-                self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
+            #displays component ID
+            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-                #appends the image and text which was crated so that they can be dragged together relatively
-                self.component_array.append([self.value_display, self.component, self.id_text])
+            #appends the image and text which was crated so that they can be dragged together relatively
+            self.component_array.append([self.value_display, self.component, self.id_text])
+            #registers the component so that it can be looked up by ID without searching the canvas
+            self.store.add("resistor", self.ohms, self.id, self.component, [self.component, self.value_display, self.id_text], self.resistor_path)
 
-                #binds the left mouse button to the method 'drag_component'
-                self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
+            #the component can be dragged with the left mouse button
+            self.make_draggable(self.store.get(self.id))
 
     def add_varesistor(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the variable resistor
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        elif self.varesistor_exists:
-            messagebox.showwarning("Cannot add component","Variable resistor already in simulation.")
-        else:
-            window = ComponentValue("var_resistor")#stores instance of ComponentValue class, passing the argument, "variable resistor"
-            window.wait_window() #prevents further execution of method until window closed
-            self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
-            if self.ohms: #if a value has been assigned, the following will be executed.
-                self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-                self.var_IDinstance = self.id #stores instance of tag in the case of when the user modifies the variable resistor
-                self.varesistor_exists = True #flag to show that a variable resistor has been made
-                self.component_limit -= 1 #decrements the component limit
-                self.image_ID = "ID" + str(self.id)
+        window = ComponentValue("var_resistor")#stores instance of ComponentValue class, passing the argument, "variable resistor"
+        window.wait_window() #prevents further execution of method until window closed
+        self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
+        if self.ohms: #if a value has been assigned, the following will be executed.
+            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+            self.var_IDinstance = self.id #stores instance of tag so the adjust button changes the latest variable resistor
+            self.varesistor_exists = True #flag to show that a variable resistor has been made
+            self.image_ID = "ID" + str(self.id)
 
-                #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-                self.component = self.canvas.create_image(400, 300, image=self.varesistor_image,
-                                                          tags=(self.id, self.ohms, self.image_ID, 'varesistor',self.varesistor_path))
+            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+            self.component = self.canvas.create_image(400, 300, image=self.varesistor_image,
+                                                      tags=(self.id, self.ohms, self.image_ID, 'varesistor',self.varesistor_path))
 
-                #displays variable resistor value
-                self.VR_value_display = self.canvas.create_text(388, 317.5, text=str(self.ohms) + "Ω")
+            #displays variable resistor value
+            self.VR_value_display = self.canvas.create_text(388, 317.5, text=str(self.ohms) + "Ω")
 
-                #displays the custom ID
-                self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
+            #displays the custom ID
+            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-                #appends the image and text which was crated so that they can be dragged together relatively
-                self.component_array.append([self.VR_value_display, self.component, self.id_text])
+            #appends the image and text which was crated so that they can be dragged together relatively
+            self.component_array.append([self.VR_value_display, self.component, self.id_text])
+            self.store.add("varesistor", self.ohms, self.id, self.component, [self.component, self.VR_value_display, self.id_text], self.varesistor_path)
 
-                #binds the left mouse button to the method 'drag_component'
-                self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
+            #the component can be dragged with the left mouse button
+            self.make_draggable(self.store.get(self.id))
+            #double clicking any variable resistor adjusts that one
+            self.canvas.tag_bind(self.component, '<Double-Button-1>', lambda event, ID=self.id: self.modify_varesistor(ID))
 
-                #button which allows user to modify variable resistor
-                self.button_varesistor = Button(self.canvas, text="Adjust Variable Resistor", font=('Rockwell', 10, 'bold'), fg='white', bg='#456142', command=self.modify_varesistor)
-                self.button_varesistor.place(x=310, y=520)
+            #button which allows user to modify the latest variable resistor
+            self.button_varesistor = Button(self.canvas, text="Adjust Variable Resistor", font=('Rockwell', 10, 'bold'), fg='white', bg='#456142', command=self.modify_varesistor)
+            self.button_varesistor.place(x=310, y=520)
 
-    def modify_varesistor(self):
+    def modify_varesistor(self, ID=None):
+        component = self.store.get(ID or self.var_IDinstance) #looks up the variable resistor being adjusted
         window = ComponentValue("var_resistor") #stores instance of ComponentValue class again to reaccess the window, passing the argument, "variable resistor"
         window.wait_window() #prevents further execution of method until window closed
         if window.value: #if a value has been assigned, the following will be executed.
             self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
-            self.image_ID = "ID" + str(self.id)
+            self.store.set_value(component.id, self.ohms)
 
             #adjusts the tags and display based on the new ohm value
-            self.canvas.itemconfig(self.VR_value_display, text=str(self.ohms)+"Ω")
-            self.canvas.itemconfigure(self.component, tags=(self.var_IDinstance, self.ohms, self.image_ID, 'varesistor',self.varesistor_path))
+            self.canvas.itemconfig(component.items[1], text=str(self.ohms)+"Ω")
+            self.canvas.itemconfigure(component.image, tags=(component.id, self.ohms, "ID" + str(component.id), 'varesistor',self.varesistor_path))
+            self.refresh_simulation()
 
     def add_thermistor(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the thermistor
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        elif self.thermistor_exists:
-            messagebox.showwarning("Cannot add component", "Variable resistor already in simulation.")
-        else:
-            window = ComponentValue("thermistor") #stores instance of ComponentValue class, passing the argument, "thermistor"
-            window.wait_window() #prevents further execution of method until window closed
-            self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
-            if self.ohms: #if a value has been assigned, the following will be executed.
-                self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-                self.therm_IDinstance = self.id #stores instance of tag in the case of when the user wants to modify the temperature
-                self.thermistor_exists = True #flag to show that a thermistor has been made
-                self.component_limit -= 1 #decrements the component limit
-                self.image_ID = "ID" + str(self.id)
+        window = ComponentValue("thermistor") #stores instance of ComponentValue class, passing the argument, "thermistor"
+        window.wait_window() #prevents further execution of method until window closed
+        self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
+        if self.ohms: #if a value has been assigned, the following will be executed.
+            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+            self.therm_IDinstance = self.id #stores instance of tag so the adjust button changes the latest thermistor
+            self.thermistor_exists = True #flag to show that a thermistor has been made
+            self.image_ID = "ID" + str(self.id)
 
-                #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-                self.component = self.canvas.create_image(400, 300, image=self.thermistor_image,
-                                                          tags=(self.id, self.ohms, self.image_ID, 'thermistor',self.thermistor_path))
+            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+            self.component = self.canvas.create_image(400, 300, image=self.thermistor_image,
+                                                      tags=(self.id, self.ohms, self.image_ID, 'thermistor',self.thermistor_path))
 
-                #displays thermistor
-                self.T_value_display = self.canvas.create_text(388, 317.5, text=str(self.ohms)+"Ω")
+            #displays thermistor
+            self.T_value_display = self.canvas.create_text(388, 317.5, text=str(self.ohms)+"Ω")
 
-                #displays component ID
-                self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
+            #displays component ID
+            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-                #appends the image and text which was crated so that they can be dragged together relatively
-                self.component_array.append([self.T_value_display, self.component, self.id_text])
+            #appends the image and text which was crated so that they can be dragged together relatively
+            self.component_array.append([self.T_value_display, self.component, self.id_text])
+            self.store.add("thermistor", self.ohms, self.id, self.component, [self.component, self.T_value_display, self.id_text], self.thermistor_path)
 
-                #binds the left mouse button to the method 'drag_component'
-                self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
+            #the component can be dragged with the left mouse button
+            self.make_draggable(self.store.get(self.id))
+            #double clicking any thermistor adjusts that one
+            self.canvas.tag_bind(self.component, '<Double-Button-1>', lambda event, ID=self.id: self.modify_thermistor(ID))
 
-                #button which allows user to modify temperature which will then change resistance
-                self.button_thermsistor = Button(self.canvas, text="Adjust Temperature", font=('Rockwell', 10, 'bold'), fg='white', bg='#142629', command=self.modify_thermistor)
-                self.button_thermsistor.place(x=160, y=520)
+            #button which allows user to modify temperature of the latest thermistor which will then change resistance
+            self.button_thermsistor = Button(self.canvas, text="Adjust Temperature", font=('Rockwell', 10, 'bold'), fg='white', bg='#142629', command=self.modify_thermistor)
+            self.button_thermsistor.place(x=160, y=520)
 
 
-    def modify_thermistor(self):
-        window = ComponentValue("thermistor") #stores instance of ComponentValue class again to reaccess the window, passing the argument, "thermistor"
+    def modify_thermistor(self, ID=None):
+        component = self.store.get(ID or self.therm_IDinstance) #looks up the thermistor being adjusted
+        original = component.value
+        #stores instance of ComponentValue class again to reaccess the window, passing the argument, "thermistor".
+        #Moving the scale changes the thermistor straight away, so a running simulation follows the temperature live
+        window = ComponentValue("thermistor", on_change=lambda ohms: self.live_value(component.id, ohms))
         window.wait_window() #prevents further execution of method until window closed
+        if self.live_job is not None:
+            #values still waiting from the last scale movements are applied first so they cannot override the final value
+            self.window.after_cancel(self.live_job)
+            self.apply_live_values()
+        if not window.value and component.value != original:
+            self.live_value(component.id, original) #the window was closed without setting a value, so it is put back
         if window.value: #if a value has been assigned, the following will be executed.
             self.ohms = window.value #assigns the value attribute from the ComponentValue window to the ohms attribute
-            self.image_ID = "ID" + str(self.id)
+            self.store.set_value(component.id, self.ohms)
 
             # adjusts the tags and display based on the new ohm value
-            self.canvas.itemconfig(self.T_value_display, text=str(self.ohms)+"Ω")
-            self.canvas.itemconfigure(self.component, tags=(self.therm_IDinstance, self.ohms, self.image_ID, 'thermistor',self.thermistor_path))
+            self.canvas.itemconfig(component.items[1], text=str(self.ohms)+"Ω")
+            self.canvas.itemconfigure(component.image, tags=(component.id, self.ohms, "ID" + str(component.id), 'thermistor',self.thermistor_path))
+            self.refresh_simulation()
 
     def add_battery(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the battery
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        elif self.battery_exists:
-            messagebox.showwarning("Cannot add component", "Battery already in simulation. You can enter any positive potential difference instead of requiring multiple cells.")
-        else:
-            window = ComponentValue("battery") #stores instance of ComponentValue class, passing the argument, "battery"
-            window.wait_window() #prevents further execution of method until window closed
-            self.volts = window.value #assigns the value attribute from the ComponentValue window to the volts attribute
-            if self.volts:
-                self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-                self.battery_exists = True #flag to show that a battery has been made
-                self.component_limit -= 1 #decrements component limit
-                self.image_ID = "ID" + str(self.id)
+        window = ComponentValue("battery") #stores instance of ComponentValue class, passing the argument, "battery"
+        window.wait_window() #prevents further execution of method until window closed
+        self.volts = window.value #assigns the value attribute from the ComponentValue window to the volts attribute
+        if self.volts:
+            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+            self.battery_exists = True #flag to show that a battery has been made
+            self.image_ID = "ID" + str(self.id)
 
-                #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-                self.component = self.canvas.create_image(400, 300, image=self.battery_image, tags=(self.id, self.volts, self.image_ID, 'battery', self.battery_path))
+            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+            self.component = self.canvas.create_image(400, 300, image=self.battery_image, tags=(self.id, self.volts, self.image_ID, 'battery', self.battery_path))
 
-                #displays voltage
-                self.value_display = self.canvas.create_text(388, 317.5, text=str(self.volts) + "V")
+            #displays voltage
+            self.value_display = self.canvas.create_text(388, 317.5, text=str(self.volts) + "V")
 
-                #displays component ID
-                self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
+            #displays component ID
+            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-                #appends the image and text which was crated so that they can be dragged together relatively
-                self.component_array.append([self.value_display, self.component, self.id_text])
+            #appends the image and text which was crated so that they can be dragged together relatively
+            self.component_array.append([self.value_display, self.component, self.id_text])
+            self.store.add("battery", self.volts, self.id, self.component, [self.component, self.value_display, self.id_text], self.battery_path)
 
-                #binds the left mouse button to the method 'drag_component'
-                self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
+            #the component can be dragged with the left mouse button
+            self.make_draggable(self.store.get(self.id))
 
     def add_switch(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the switch
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        elif self.switch_exists:
-            messagebox.showwarning("Cannot add component", "Switch already in simulation")
-        else:
-            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-            self.switchIDinsance = self.id
-            self.switch_exists = True #flag to show that a battery has been made
-            self.component_limit -= 1 #decrements component limit
+        self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+        self.switchIDinsance = self.id #the ON/OFF button toggles the latest switch
+        self.switch_exists = True #flag to show that a switch has been made
 
-            self.image_ID = "ID" + str(self.id)
+        self.image_ID = "ID" + str(self.id)
 
-            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-            self.component = self.canvas.create_image(400, 300, image=self.switchon_image, tags=(self.id, self.image_ID, 'switch', self.switchon_path))
+        #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+        self.component = self.canvas.create_image(400, 300, image=self.switchon_image, tags=(self.id, self.image_ID, 'switch', self.switchon_path))
 
-            #displays component ID
-            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
+        #displays component ID
+        self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-            #appends the image and text which was crated so that they can be dragged together relatively
-            self.component_array.append([self.component, self.id_text])
+        #appends the image and text which was crated so that they can be dragged together relatively
+        self.component_array.append([self.component, self.id_text])
+        #switches start switched on, so their value is True
+        self.store.add("switch", True, self.id, self.component, [self.component, self.id_text], self.switchon_path)
 
-            #binds the left mouse button to the method 'drag_component'
-            self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
-            self.switch_label = Label(self.canvas, text="Switch ON/OFF: ", font=('Rockwell', 10, 'bold'), bg="#ffffff")
-            self.switch_label.place(x=460, y=522)
+        #the component can be dragged with the left mouse button
+        self.make_draggable(self.store.get(self.id))
+        #double clicking any switch toggles that one
+        self.canvas.tag_bind(self.component, '<Double-Button-1>', lambda event, ID=self.id: self.toggle(ID))
+        self.switch_label = Label(self.canvas, text="Switch ON/OFF: ", font=('Rockwell', 10, 'bold'), bg="#ffffff")
+        self.switch_label.place(x=460, y=522)
 
-            #creates button which accesses toggle method. When pressed, button should alternate in text and colour, and the button_presesd boolean variable should switch
-            self.switch_button = Button(self.canvas, width=7, height=1, text="ON", font=('Rockwell', 10, 'bold'), bg ="#66963b", command=self.toggle)
-            self.switch_button.place(x=580, y=520)
+        #creates button which accesses toggle method. When pressed, button should alternate in text and colour, and the button_presesd boolean variable should switch
+        self.switch_button = Button(self.canvas, width=7, height=1, text="ON", font=('Rockwell', 10, 'bold'), bg ="#66963b", command=self.toggle)
+        self.switch_button.place(x=580, y=520)
 
     def add_voltmeter(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the voltmeter
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        else:
-            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-            self.image_ID = "ID" + str(self.id)
+        self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+        self.image_ID = "ID" + str(self.id)
 
-            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-            self.component = self.canvas.create_image(400, 300, image=self.voltmeter_image, tags=(self.id, self.image_ID, 'voltmeter',self.voltmeter_path))
+        #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+        self.component = self.canvas.create_image(400, 300, image=self.voltmeter_image, tags=(self.id, self.image_ID, 'voltmeter',self.voltmeter_path))
 
-            #displays component ID
-            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
-
-            #appends the image and text which was crated so that they can be dragged together relatively
-            self.component_array.append([self.component, self.id_text])
+        #displays component ID
+        self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-            #binds the left mouse button to the method 'drag_component'
-            self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
+        #appends the image and text which was crated so that they can be dragged together relatively
+        self.component_array.append([self.component, self.id_text])
+        self.store.add("voltmeter", None, self.id, self.component, [self.component, self.id_text], self.voltmeter_path)
 
-            #decrements component limit
-            self.component_limit -= 1
+        #the component can be dragged with the left mouse button
+        self.make_draggable(self.store.get(self.id))
 
     def add_ammeter(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the ammeter
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        else:
-            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-            self.component_limit -= 1 #decrements component limit
-            self.image_ID = "ID" + str(self.id)
+        self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+        self.image_ID = "ID" + str(self.id)
 
-            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-            self.component = self.canvas.create_image(400, 300, image=self.ammeter_image, tags=(self.id, self.image_ID, 'ammeter',self.ammeter_path))
+        #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+        self.component = self.canvas.create_image(400, 300, image=self.ammeter_image, tags=(self.id, self.image_ID, 'ammeter',self.ammeter_path))
 
-            #displays component ID
-            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
+        #displays component ID
+        self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-            #appends the image and text which was crated so that they can be dragged together relatively
-            self.component_array.append([self.component, self.id_text])
+        #appends the image and text which was crated so that they can be dragged together relatively
+        self.component_array.append([self.component, self.id_text])
+        self.store.add("ammeter", None, self.id, self.component, [self.component, self.id_text], self.ammeter_path)
 
-            #binds the left mouse button to the method 'drag_component'
-            self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
+        #the component can be dragged with the left mouse button
+        self.make_draggable(self.store.get(self.id))
 
 
     def add_lightbulb(self):
-        if self.component_limit==0: #if this is equal to 0, an error message pops up and the the user cannot add the lightbulb
-            messagebox.showinfo("Cannot add component","You already have the maximum of 5 components in your simulation.")
-        else:
-            self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
-            self.component_limit -= 1 #decrements component limit
-            self.image_ID = "ID" + str(self.id)
+        self.id += 1 #increments the custom component ID by 1 which will be used for component identification purposes
+        self.image_ID = "ID" + str(self.id)
 
-            #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
-            self.component = self.canvas.create_image(400, 300, image=self.lightbulboff_image, tags=(self.image_ID, self.id, 'lightbulb', self.lightbulboff_path))
+        #creates the tkinter widget which is draggable. It has tags which can be accessed using find_withtags() and itemcget()
+        self.component = self.canvas.create_image(400, 300, image=self.lightbulboff_image, tags=(self.image_ID, self.id, 'lightbulb', self.lightbulboff_path))
 
-            #displays component ID
-            self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
+        #displays component ID
+        self.id_text = self.canvas.create_text(420, 317.5, text=self.id)
 
-            #appends the image and text which was crated so that they can be dragged together relatively
-            self.component_array.append([self.component, self.id_text])
+        #appends the image and text which was crated so that they can be dragged together relatively
+        self.component_array.append([self.component, self.id_text])
+        self.store.add("lightbulb", None, self.id, self.component, [self.component, self.id_text], self.lightbulboff_path)
 
-            #binds the left mouse button to the method 'drag_component'
-            self.canvas.tag_bind(self.component, '<B1-Motion>', self.drag_component)
+        #the component can be dragged with the left mouse button
+        self.make_draggable(self.store.get(self.id))
 
     def add_line(self):
-        ID_window = WireGeneration(self.canvas) #passes the canvas of CircuitMaker to the instance of the toplevel window of the WireGeneration class
+        ID_window = WireGeneration(self.canvas, self.store) #passes the canvas of CircuitMaker to the instance of the toplevel window of the WireGeneration class
         ID_window.wait_window() #method will only be executed until window is closed
         image_tags = ID_window.IDpair #once closed, the pair of image_tags is retrieved
         self.graph = ID_window.graphdic #the graphical dictionary representation of the circuit is also taken in
         self.voltmeters = ID_window.voltmeters
 
-        connect_to_parallel = ID_window.checkbox_input() #returns a boolean expression which would have been determined based on a checkbox
-
         connecting_voltmeter = ID_window.voltmeterflag #returns a boolean expression which reflects if the connection was with a voltmeter
 
-        def position_line(): #puts all lines at the lowest layer of the canvas behind everything
-            self.canvas.lower(line1)
-            if not connecting_voltmeter:
-                self.canvas.lower(line2)
-                if connect_to_parallel:
-                    self.canvas.lower(line3)
-
         if len(image_tags) == 2: #if 2 tags were received, the following will happen
-            # obtains x and y coordinates of both widgets are obtained
-            x1, y1 = self.canvas.coords(image_tags[0])
-            x2, y2 = self.canvas.coords(image_tags[1])
-
-            if connecting_voltmeter: #if the connection involves a voltmeter, only create one line between the two components.
-                line1 = self.canvas.create_line(x1, y1, x2, y2, width=2)
-                position_line()
-
-            #if the connection is not between a battery and a component, draw 2 lines which are 90 degrees of each other
-            elif not connect_to_parallel:
-                if (x2 < x1 and y2 > y1) or (x1 < x2 and y1 > y2): #switches coordinates based on relative position
-                    x1, x2 = x2, x1
-                    y1, y2 = y2, y1
-                #draw lines
-                line1 = self.canvas.create_line(x1, y1, x2, y1, width=2)
-                line2 = self.canvas.create_line(x2, y1, x2, y2, width=2)
-                self.line_ids.extend([line1, line2]) #adds the two lines into a big list of line ids
-                position_line()
-
-            elif connect_to_parallel: #these are drawn if the user wants 3 lines to be drawn. This is required to prevent lines from going through parallel components
-                # vertical
-                #if the target component is below the source component
-                if abs(x2 - x1) <= 100 and y1 < y2: #abs(x2 - x1) <= 100 means if the source component is within 100 pixels in the x axis
-                    line1 = self.canvas.create_line(x1, y1, x1 + 50, y1, width=2)
-                    line2 = self.canvas.create_line(x1 + 50, y1, x1 + 50, y2, width=2)
-                    line3 = self.canvas.create_line(x1 + 50, y2, x2, y2, width=2)
-                    self.line_ids.extend([line1, line2, line3]) #adds the three lines into a big list of line ids
-
-                    #this is set to true if a line has already been made directly from the battery to a parallel component vertically
-                    self.vertical_parallel = True
-                    position_line()
-
-                #if the target component is above the source component
-                elif (abs(x2 - x1) <= 100 or self.vertical_parallel) and (y1 > y2): #abs(x2 - x1) <= 100 means if the source component is within 100 pixels in the x axis
-                    # draw the lines
-                    line1 = self.canvas.create_line(x1, y1, x1 - 50, y1, width=2)
-                    line2 = self.canvas.create_line(x1 - 50, y1, x1 - 50, y2, width=2)
-                    line3 = self.canvas.create_line(x1 - 50, y2, x2, y2, width=2)
-                    self.line_ids.extend([line1, line2, line3]) #adds the three lines into a big list of line ids
-                    position_line()
-
-                #if the target component is on the right of the source component
-                elif abs(x2 - x1) > 100 and abs(y2 - y1) <= 100 and x1 < x2: #abs(x2 - x1) <= 100 means if the source component is within 100 pixels in the x axis and vice versa
-                    line1 = self.canvas.create_line(x1, y1, x1, y1 - 50, width=2)
-                    line2 = self.canvas.create_line(x1, y1 - 50, x2, y1 - 50, width=2)
-                    line3 = self.canvas.create_line(x2, y1 - 50, x2, y2, width=2)
-                    self.line_ids.extend([line1, line2, line3]) #adds the three lines into a big list of line ids
-
-                    #this is set to true if a line has already been made directly from the battery to a parallel component horizontal to prevent creation of strange lines
-                    self.horizontal_parallel = True
-                    position_line()
-
-                # if the target component is on the left of the source component
-                elif (abs(x2 - x1) > 100 and abs(y2 - y1)) <= 100 or (self.horizontal_parallel and x1 > x2): #abs(x2 - x1) <= 100 means if the source component is within 100 pixels in the x axis and vice versa
-                    line1 = self.canvas.create_line(x1, y1, x1, y1 + 50, width=2)
-                    line2 = self.canvas.create_line(x1, y1 + 50, x2, y1 + 50, width=2)
-                    line3 = self.canvas.create_line(x2, y1 + 50, x2, y2, width=2)
-                    self.line_ids.extend([line1, line2, line3]) #adds the three lines into a big list of line ids
-                    position_line()
-        print("line IDs",self.line_ids)
-
-    #this method is important as we need it to drag the components around the canvas to position them
-    def drag_component(self, event):
-        # To drag the latest added component on the canvas
-        try: #this try except is used as there will be an index error as some components have only 2 indices while others have 3
-            #this takes the last added component as you can see by -1. All other components will be static.
-            self.canvas.coords(self.component_array[-1][0], event.x - 15, event.y + 17.5)
-            self.canvas.coords(self.component_array[-1][1], event.x, event.y)
-            self.canvas.coords(self.component_array[-1][2], event.x + 20, event.y + 17.5)
-        except:
-            self.canvas.coords(self.component_array[-1][0], event.x, event.y)
-            self.canvas.coords(self.component_array[-1][1], event.x + 20, event.y + 17.5)
+            source = self.store.from_item(image_tags[0]).id
+            target = self.store.from_item(image_tags[1]).id
+            self.route_wire(self.wires.add(source, target, connecting_voltmeter))
+        tracing.event("wire.add", wires=len(self.wires), lines=len(self.wires.line_wires))
+
+    #routes a wire between the current positions of its components with the auto-router, so it runs horizontally and
+    #vertically around the other components and wires. Its lines are moved to the new route, and lines are only created
+    #or deleted if the route has more or fewer of them. New lines are put at the lowest layer of the canvas behind everything
+    def route_wire(self, wire):
+        start = self.canvas.position(self.store.get(wire.source).image)
+        end = self.canvas.position(self.store.get(wire.target).image)
+        route = segments(self.router.route(wire.number, wire.source, wire.target, start, end))
+        lines = wire.lines[:len(route)]
+        for line, segment in zip(lines, route):
+            self.canvas.coords(line, *segment)
+        for segment in route[len(lines):]:
+            line = self.canvas.create_line(*segment, width=2, tags="wire")
+            self.canvas.lower(line)
+            lines.append(line)
+        if len(wire.lines) > len(route):
+            self.canvas.delete(*wire.lines[len(route):])
+        self.wires.set_lines(wire, lines)
+        self.animation.redraw(wire.number)
+
+    #highlights every line of the wire under the mouse, found from the line in O(1)
+    def highlight_wire(self, on):
+        wire = self.wires.from_line(self.canvas.find_withtag("current")[0]) if self.canvas.find_withtag("current") else None
+        if wire is not None:
+            for line in wire.lines:
+                self.canvas.itemconfig(line, fill="#2f6fb3" if on else "black")
+            if not on:
+                self.animation.redraw(wire.number) #a running animation lights the wire again at the next frame
+
+    #deletes the wire under the mouse and its connection from the graph, or the voltmeter connection it stands for.
+    #The graph only loses the edge if no other wire joins the same two components
+    def delete_wire(self):
+        current = self.canvas.find_withtag("current")
+        wire = self.wires.from_line(current[0]) if current else None
+        if wire is None or not messagebox.askyesno("Delete wire", "Delete the wire between components " + str(wire.source)
+                                                   + " and " + str(wire.target) + "?"):
+            return
+        self.wires.remove(wire.number)
+        self.router.unroute(wire.number)
+        self.animation.remove(wire.number)
+        self.canvas.delete(*wire.lines)
+        if wire.voltmeter:
+            if [wire.source, wire.target] in self.voltmeters:
+                self.voltmeters.remove([wire.source, wire.target])
+        elif not self.wires.between(wire.source, wire.target):
+            for a, b in ((wire.source, wire.target), (wire.target, wire.source)):
+                if b in self.graph.get(a, []):
+                    self.graph[a].remove(b)
+                    if not self.graph[a]:
+                        del self.graph[a]
+        tracing.event("wire.delete", source=wire.source, target=wire.target, wires=len(self.wires))
+
+    #tags every item of a component with one group tag so that it is dragged with a single canvas.move, and binds the
+    #left mouse button to dragging it by its image. Its box is added to the router so wires are routed around it
+    def make_draggable(self, component):
+        self.canvas.group("group" + str(component.id), set(component.items + [component.image]))
+        self.router.add_box(component.id, *self.canvas.bbox(component.image))
+        self.canvas.tag_bind(component.image, '<B1-Motion>', lambda event, ID=component.id: self.drag_component(event, ID))
+
+    #this method is important as we need it to drag the components around the canvas to position them.
+    #Any component can be dragged. Motion events only remember where the mouse is, and the component is moved at most
+    #once every frame, so a fast drag does not queue up a move for every event
+    def drag_component(self, event, ID):
+        self.drag_target = (ID, event.x, event.y)
+        if self.drag_job is None:
+            self.drag_job = self.window.after(DRAG_INTERVAL, self.apply_drag)
+
+    #moves the dragged component's image to the mouse, with its texts keeping their place next to it. Only the wires
+    #connected to it and the wires it has been moved onto are routed again
+    @tracing.traced("canvas.drag")
+    def apply_drag(self):
+        self.drag_job = None
+        ID, x, y = self.drag_target
+        component = self.store.get(ID)
+        if component is None:
+            return #the component was removed since the mouse moved
+        old_x, old_y = self.canvas.position(component.image)
+        if (x, y) == (old_x, old_y):
+            return
+        self.canvas.move("group" + str(ID), x - old_x, y - old_y)
+        self.router.move_box(ID, x - old_x, y - old_y)
+        for wire in self.wires.of_component(ID):
+            self.route_wire(wire)
+        for number in self.router.nets_covered(ID):
+            self.route_wire(self.wires.get(number))
+
+    #if the results window is open, its readings, the lightbulbs and the speed of the current in the wires are updated
+    #for the new component values without rebuilding it
+    @tracing.traced("simulate.live")
+    def refresh_simulation(self):
+        if hasattr(self, 'sim_window') and self.sim_window.winfo_exists() and hasattr(self.sim_window, 'meter_labels'):
+            self.sim_window.refresh()
+            self.show_brightness()
+            if self.animation.running:
+                self.animation.set_currents(self.sim_window.result)
+
+    #changes a component's value while a scale is being moved. Changes are collected and simulated together at most once
+    #every frame, so a fast drag does not queue up a solve for every movement of the scale
+    def live_value(self, ID, value):
+        self.live_values[ID] = value
+        if self.live_job is None:
+            self.live_job = self.window.after(LIVE_INTERVAL, self.apply_live_values)
+
+    def apply_live_values(self):
+        self.live_job = None
+        for ID, value in self.live_values.items():
+            component = self.store.get(ID)
+            if component is None:
+                continue #the component was removed while the scale was open
+            self.store.set_value(ID, value)
+            self.canvas.itemconfig(component.items[1], text=str(value)+"Ω")
+        self.live_values.clear()
+        self.refresh_simulation()
+
+    #lights every lightbulb as brightly as the power it dissipates in the last simulation
+    def show_brightness(self):
+        result = self.sim_window.result
+        for ID, lightbulb in self.store.of_kind('lightbulb').items():
+            connected = ID in result.netlist.terminals
+            self.set_lightbulb(lightbulb, bulb_brightness(result.power(ID)) if connected else 0.0)
+
+    #draws a lightbulb with a brightness from 0 (off) to 1 (fully lit), only touching the canvas if it changes.
+    #Brightnesses in between are drawn by blending the off and on images in BRIGHTNESS_LEVELS steps
+    def set_lightbulb(self, lightbulb, brightness):
+        level = int(round(float(brightness) * BRIGHTNESS_LEVELS))
+        current = BRIGHTNESS_LEVELS if lightbulb.path == self.lightbulbon_path else 0
+        if self.lightbulb_images.get(lightbulb.id, (current,))[0] == level:
+            return
+        if level == 0:
+            image = self.lightbulboff_image
+        elif level == BRIGHTNESS_LEVELS:
+            image = self.lightbulbon_image
+        else:
+            image = load_blend(self.lightbulboff_path, self.lightbulbon_path, level / BRIGHTNESS_LEVELS)
+        self.lightbulb_images[lightbulb.id] = (level, image)
+        path = self.lightbulbon_path if level else self.lightbulboff_path
+        lightbulb.path = path
+        self.canvas.itemconfig(lightbulb.image, image=image, tags=("ID" + str(lightbulb.id), lightbulb.id, 'lightbulb', path))
 
     #method to clear canvas and reset all values
     def clear_canvas(self):
+        self.animation.stop()
         self.canvas.delete("all")
         self.component_array.clear()
         self.id = 0
@@ -953,36 +1045,17 @@ class CircuitMaker:
         self.thermistor_exists = False
         self.varesistor_exists = False
         self.battery_exists = False
-        self.component_limit = 5
+        self.store.clear()
+        self.wires.clear()
+        self.router.clear()
+        self.lightbulb_images.clear()
         self.image_ID = 0
         WireGeneration.graphdic = {}
 
-    #this method is a recursive function for line animation, only activated when Simulate button is pressed.
-    #It is recursive as it uses an updated index everytime it calls itself.
-    def animate_lines(self, index):
-
-            if not self.simbutton_on:
-                return
-
-            #change color of current line to yellow
-            self.canvas.itemconfig(self.line_ids[index], fill="#FDDA0D")
-
-            #schedule next iteration of the animation with 20ms delay
-            self.canvas.after(20, self.animate_lines, (index + 1) % len(self.line_ids))
-
-            #reset color of current line to black if all lines have been animated with 20ms delay
-            if index == len(self.line_ids) - 1:
-                self.canvas.after(25, self.reset_lines)
-
-    def reset_lines(self):
-            #sets color of all lines to black
-            for line_id in self.line_ids:
-                self.canvas.itemconfig(line_id, fill="black")
-
-
+    @tracing.traced("simulate.run")
     def run_circuit(self):
         self.simbutton_on = not self.simbutton_on #performs NOT operation on Simulate button
-        lightbulbs = self.canvas.find_withtag('lightbulb') #gets all internal tkinter IDs with the 'lightbulb' tag
+        lightbulbs = self.store.of_kind('lightbulb').values() #gets every lightbulb from the component store
 
         # if this is false because there is no battery, an error message will show up
         if not self.battery_exists:
@@ -997,15 +1070,16 @@ class CircuitMaker:
                 messagebox.showerror("No end-to-end connection found.",
                                      "You must make a functional electrical circuit to simulate.")
             else:
-                if self.switched_on and self.simbutton_on: #if the switch is on (on by default) and the simulate button has been pressed
-                    # Start the animation with the first line
-                    if not self.json_loaded:
-                        self.total_components = len(self.component_array)
-                        self.animate_lines(0) #animates the lines. 0 is passed to change the first line in line_ids to yellow
-                    for lightbulb in lightbulbs: #if the switch is on, all lightbulbs will change into switched-on lightbulbs
-                        self.canvas.itemconfig(lightbulb, image=self.lightbulbon_image, tags=(self.image_ID, self.id, 'lightbulb', self.lightbulbon_path))
+                self.total_components = len(self.store)
                 #creates an instance of the Simulate class the canvas, switch status, and total number of components as arguments
-                self.sim_window = Simulate(self.canvas, self.graph, self.switched_on, self.total_components, self.voltmeters)
+                self.sim_window = Simulate(self.canvas, self.graph, self.switched_on, self.total_components, self.voltmeters, self.store, self.session)
+                #lightbulbs are lit as brightly as the power the simulation found for them
+                if self.sim_window.winfo_exists() and hasattr(self.sim_window, 'meter_labels'):
+                    self.show_brightness()
+                    #if the switch is on (on by default), the current is animated in the direction and at the speed the
+                    #simulation found in each wire
+                    if self.switched_on and self.simbutton_on:
+                        self.animation.start(self.sim_window.result)
 
 
 
@@ -1014,29 +1088,129 @@ class CircuitMaker:
             self.run_button.config(text="Simulate!", bg="#420a06")
             self.run_button.place(x=16, y=420)
             self.simbutton_on = False
-            self.reset_lines()
+            self.animation.stop()
             for lightbulb in lightbulbs:
-                self.canvas.itemconfig(lightbulb, image=self.lightbulboff_image)
+                self.set_lightbulb(lightbulb, 0.0)
 
             #to prevent errors, first the app checks if CircuitMaker has the attribute 'sim_window' and check if it exists, then closes it.
             if hasattr(self, 'sim_window') and self.sim_window.winfo_exists():
                 self.sim_window.destroy()
 
     #method to save canvas into JSON
+    #the circuit is saved under a name in the user's own circuit library in the database, so users cannot overwrite each other's circuits.
+    #The canvas is copied from its model straight away, then encoded and written to the database on a worker thread
     def save_canvas(self):
+        name = simpledialog.askstring("Save Circuit", "Circuit name:", initialvalue=self.circuit_name, parent=self.window)
+        if not name:
+            return
         #stores number of components
-        total_components = len(self.component_array)
-        #passes all arguments required to make a circuit and calls the save_to_json method and dumps all JSON data into canvasdata.json
-        canvas_to_json = JSONCanvas(self.canvas,self.line_ids, self.graph, self.battery_exists, self.varesistor_exists, self.switch_exists, self.thermistor_exists,total_components, self.voltmeters).save_to_json(self.username+"_canvasdata.json")
+        total_components = len(self.store)
+        #passes all arguments required to make a circuit and gets a copy of the canvas in the same format as canvasdata.json
+        data = JSONCanvas(self.canvas,self.wires, self.graph, self.battery_exists, self.varesistor_exists, self.switch_exists, self.thermistor_exists,total_components, self.voltmeters, self.store).canvas_data()
+
+        def work(task):
+            task.progress(0.2, "Saving " + name)
+            self.database.save_circuit(self.username, name, data)
+            return name
+
+        def done(saved_name):
+            self.circuit_name = saved_name
+
+        self.start_task("Saving circuit", work, done)
+
+    #exports the circuit to a file chosen by the user, in the canvasdata.json format or as a .csim file if the name ends
+    #in .csim. The canvas is copied from its model straight away, then written to the file on a worker thread
+    def export_canvas(self):
+        filename = filedialog.asksaveasfilename(parent=self.window, title="Export circuit", defaultextension=".json",
+                                                filetypes=[("Circuit files", "*.json"),
+                                                           ("Binary circuit files", "*" + circuitfile.EXTENSION)])
+        if not filename:
+            return
+        json_canvas = JSONCanvas(self.canvas, self.wires, self.graph, self.battery_exists, self.varesistor_exists, self.switch_exists,
+                                 self.thermistor_exists, len(self.store), self.voltmeters, self.store)
+        data = json_canvas.canvas_data()
+
+        def work(task):
+            if filename.endswith(circuitfile.EXTENSION):
+                task.progress(0.2, "Writing " + os.path.basename(filename))
+                json_canvas.save_to_csim(filename, data)
+            else:
+                json_canvas.save_to_json(filename, data, task)
+            return filename
 
-    #method to load canvas from JSON to the tkinter canvas
+        self.start_task("Exporting circuit", work, lambda exported: None)
+
+    #method to open the user's circuit library, where a saved circuit is chosen and loaded onto the tkinter canvas.
+    #Circuits saved by earlier versions to the user's own JSON file are moved into the library the first time, reading
+    #and checking the file on a worker thread. A file which cannot be read is reported and the library is opened anyway
     def load_canvas(self):
-        #these arguments in this case are just placeholders as they are unneded but are there to prevent any unnecessary argument errors. Load method is called.
-        loaded_contents = JSONCanvas(self.canvas,self.line_ids, self.graph, self.battery_exists, self.varesistor_exists, self.switch_exists, self.thermistor_exists, self.total_components, self.voltmeters).load_from_json(self.username+"_canvasdata.json")
+        legacy_file = self.username+"_canvasdata.json"
 
-        #all returned values from called method are stored into these attribues
-        self.line_ids = loaded_contents[0]
+        def work(task):
+            if self.database.count_circuits(self.username) != 0 or not os.path.exists(legacy_file):
+                return None
+            try:
+                contents = read_file(legacy_file, task, 0.0, 0.6)
+                task.progress(0.6, "Checking " + legacy_file)
+                data = json.loads(contents)
+                circuitfile.validate(data)
+            except (OSError, ValueError, circuitfile.CircuitFileError) as error:
+                return "Circuits in " + legacy_file + " could not be moved into your library: " + str(error)
+            task.progress(0.8, "Saving " + legacy_file)
+            self.database.save_circuit(self.username, "canvasdata", data)
+            return None
+
+        def done(error):
+            if error is not None:
+                messagebox.showerror("Circuit library", error)
+            CircuitLibrary(self.database, self.username, self.load_saved_circuit)
+
+        self.start_task("Opening circuit library", work, done)
+
+    #loads a circuit from the user's library. The blobs are read and decoded on a worker thread
+    def load_saved_circuit(self, name):
+        def work(task):
+            task.progress(0.1, "Reading " + name)
+            data = self.database.load_circuit(self.username, name)
+            if data is None:
+                raise circuitfile.CircuitFileError("No saved circuit called " + name + ".")
+            task.progress(0.8, "Checking " + name)
+            circuitfile.validate(data)
+            return data
+
+        def done(data):
+            self.circuit_name = name
+            self.load_circuit_data(data)
+
+        self.start_task("Loading circuit", work, done)
+
+    #loads a circuit file (canvasdata.json format or .csim). Reading, parsing and checking happen on a worker thread
+    def load_file(self, filename):
+        def work(task):
+            contents = read_file(filename, task, 0.0, 0.7)
+            task.progress(0.7, "Checking " + filename)
+            if filename.endswith(circuitfile.EXTENSION):
+                data = circuitfile.decode(contents)
+            else:
+                data = json.loads(contents)
+            circuitfile.validate(data)
+            return data
+
+        self.start_task("Loading circuit", work, self.load_circuit_data)
+
+    #runs work on a worker thread, with any save or load which is still running cancelled first
+    def start_task(self, title, work, on_done):
+        if self.task is not None and not self.task.finished:
+            self.task.cancel()
+        self.task = Task(self.window, title, work, on_done)
+
+    #draws a checked circuit in the canvasdata.json format on the canvas. This is the only part of loading which runs on
+    #the tkinter thread
+    def load_circuit_data(self, data):
+        #these arguments in this case are just placeholders as they are unneded but are there to prevent any unnecessary argument errors. Load method is called.
+        loaded_contents = JSONCanvas(self.canvas,self.wires, self.graph, self.battery_exists, self.varesistor_exists, self.switch_exists, self.thermistor_exists, self.total_components, self.voltmeters, self.store).load_data(data)
 
+        #all returned values from called method are stored into these attribues. The line IDs are kept by the loaded wires
         #the keys for the graphs are returned as strings, so we iterate through all keys and induvidually turn them into integers
         self.graph = loaded_contents[1]
         self.graph = {int(key): value for key, value in self.graph.items()}
@@ -1048,95 +1222,158 @@ class CircuitMaker:
         self.thermistor_exists = loaded_contents[5]
         self.total_components = loaded_contents[6]
         self.voltmeters = loaded_contents[7]
-        self.json_loaded = True
+        #new components carry on numbering from the loaded ones
+        self.id = max(self.id, self.store.last_id)
+        for component in self.store:
+            self.make_draggable(component)
+        #loaded wires are routed again so they follow their components and other wires are routed around them
+        for wire in self.wires:
+            if wire.source not in self.store or wire.target not in self.store:
+                self.wires.remove(wire.number) #the wire joins a component which is not in the file
+                continue
+            for line in wire.lines:
+                self.canvas.addtag_withtag("wire", line)
+            self.route_wire(wire)
+        self.switched_on = all(switch.value for switch in self.store.of_kind("switch").values())
 
 
-    #method for loading premade circuits
+    #method for loading premade circuits. Every preset in the preset folder is listed from the catalogue's manifest, which is
+    #brought up to date on a worker thread
     def load_presets(self):
-        preset_window = Toplevel()
-        preset_window.title("Presets")
-        preset_window["bg"] = "#add8e6"
-
-        preset_label = Label(preset_window, text="Choose a preset", bg="#add8e6", font=('Rockwell', 11, 'bold'))
-        preset_label.pack()
+        preset_window = PresetWindow(self.load_preset)
 
-        #displays different button for different circuit type for variety
-        preset1_button = Button(preset_window, text="Preset 1 - Series", font=('Rockwell', 10, 'bold'), bg="#add8e6",
-                                command=self.loadpreset1)
-        preset1_button.pack()
-        preset2_button = Button(preset_window, text="Preset 2 - Parallel", font=('Rockwell', 10, 'bold'), bg="#add8e6",
-                                command=self.loadpreset2)
-        preset2_button.pack()
-        preset3_button = Button(preset_window, text="Preset 3 - Series-Parallel", font=('Rockwell', 10, 'bold'),
-                                bg="#add8e6", command=self.loadpreset3)
-        preset3_button.pack()
-
-
-    #the three following methods follow the same principle as the load_canvas method, but they do not create any new json files
-    def loadpreset1(self):
-        loaded_contents = JSONCanvas(self.canvas, self.line_ids, self.graph, self.battery_exists,
-                                     self.varesistor_exists, self.switch_exists, self.thermistor_exists,
-                                     self.total_components, self.voltmeters).load_from_json(
-            "preset/preset1.json")
-        #all returned values from called method are stored into these attribues
-        self.line_ids = loaded_contents[0]
+        def work(task):
+            return self.presets.refresh(task.progress)
 
-        #the keys for the graphs are returned as strings, so we iterate through all keys and induvidually turn them into integers
-        self.graph = loaded_contents[1]
-        self.graph = {int(key): value for key, value in self.graph.items()}
-
-        #assigns rest of the variables
-        self.battery_exists = loaded_contents[2]
-        self.varesistor_exists = loaded_contents[3]
-        self.switch_exists = loaded_contents[4]
-        self.thermistor_exists = loaded_contents[5]
-        self.total_components = loaded_contents[6]
-        self.voltmeters = loaded_contents[7]
-        self.json_loaded = True
+        Task(self.window, "Finding presets", work, preset_window.show_entries)
 
-    def loadpreset2(self):
-        self.battery_exists = True
-        loaded_contents = JSONCanvas(self.canvas, self.line_ids, self.graph, self.battery_exists,
-                                     self.varesistor_exists, self.switch_exists, self.thermistor_exists,
-                                     self.total_components, self.voltmeters).load_from_json(
-            "preset/preset2.json")
-        #all returned values from called method are stored into these attribues
-        self.line_ids = loaded_contents[0]
+    #loads a preset from its catalogue entry in the same way as any other circuit file
+    def load_preset(self, entry):
+        self.load_file(self.presets.path(entry))
 
-        #the keys for the graphs are returned as strings, so we iterate through all keys and induvidually turn them into integers
-        self.graph = loaded_contents[1]
-        self.graph = {int(key): value for key, value in self.graph.items()}
+#PresetWindow class purpose: lists every preset in the catalogue with a preview of its thumbnail and its simulation
+#results, which are read from the catalogue's manifest so nothing is loaded or solved until a preset is chosen
+class PresetWindow(Toplevel):
+    def __init__(self, on_load):
+        super().__init__()
+        self.on_load = on_load #called with the catalogue entry of the chosen preset
+        self.entries = []
+        self.title("Presets")
+        self["bg"] = "#add8e6"
 
-        #assigns rest of the variables
-        self.battery_exists = loaded_contents[2]
-        self.varesistor_exists = loaded_contents[3]
-        self.switch_exists = loaded_contents[4]
-        self.thermistor_exists = loaded_contents[5]
-        self.total_components = loaded_contents[6]
-        self.voltmeters = loaded_contents[7]
-        self.json_loaded = True
+        preset_label = Label(self, text="Choose a preset", bg="#add8e6", font=('Rockwell', 11, 'bold'))
+        preset_label.pack()
 
-    def loadpreset3(self):
-        self.battery_exists = True
-        loaded_contents = JSONCanvas(self.canvas, self.line_ids, self.graph, self.battery_exists,
-                                     self.varesistor_exists, self.switch_exists, self.thermistor_exists,
-                                     self.total_components, self.voltmeters).load_from_json(
-            "preset/preset3.json")
-        #all returned values from called method are stored into these attribues
-        self.line_ids = loaded_contents[0]
+        self.listbox = Listbox(self, width=40, height=12, font=('Rockwell', 10, 'bold'), bg="#add8e6")
+        self.listbox.pack(side=LEFT, fill=Y, padx=5, pady=5)
+        self.listbox.bind('<<ListboxSelect>>', lambda event: self.preview())
+        self.listbox.bind('<Double-Button-1>', lambda event: self.load())
+
+        preview_frame = Frame(self, bg="#add8e6")
+        preview_frame.pack(side=LEFT, fill=BOTH, padx=5, pady=5)
+        self.thumbnail_label = Label(preview_frame, bg="#add8e6")
+        self.thumbnail_label.pack()
+        self.result_label = Label(preview_frame, text="", justify=LEFT, bg="#add8e6", font=('Rockwell', 10))
+        self.result_label.pack(pady=5)
+        load_button = Button(preview_frame, text="Load", font=('Rockwell', 10, 'bold'), bg="#add8e6", command=self.load)
+        load_button.pack()
+
+    #fills the list once the catalogue is up to date
+    def show_entries(self, entries):
+        if not self.winfo_exists():
+            return
+        self.entries = entries
+        self.listbox.delete(0, END)
+        for entry in entries:
+            self.listbox.insert(END, entry["title"])
+
+    def selected(self):
+        selection = self.listbox.curselection()
+        return self.entries[selection[0]] if selection else None
+
+    #shows the thumbnail and the stored simulation results of the selected preset
+    def preview(self):
+        entry = self.selected()
+        if entry is None:
+            return
+        self.thumbnail = ImageTk.PhotoImage(Image.open(io.BytesIO(thumbnail_bytes(entry))))
+        self.thumbnail_label.config(image=self.thumbnail)
+        result = entry["result"]
+        lines = ["Components: " + str(entry["components"])]
+        if result["error"]:
+            lines.append(result["error"])
+        else:
+            lines.append("Circuit Type: " + result["circuit_type"])
+            lines.append("Total resistance (R): " + str(round(result["total_resistance"], 2)) + "Ω")
+            lines.append("Potential Difference (V): " + str(result["total_voltage"]) + "V")
+            lines.append("Total current (I): " + str(round(result["total_current"], 2)) + "A")
+            for ID, current in result["ammeters"].items():
+                lines.append("Ammeter " + ID + ": " + str(round(current, 2)) + "A")
+            for ID, voltage in result["voltmeters"].items():
+                lines.append("Voltmeter " + ID + ": " + str(round(voltage, 2)) + "V")
+        self.result_label.config(text="\n".join(lines))
+
+    def load(self):
+        entry = self.selected()
+        if entry is not None:
+            self.on_load(entry)
+
+
+#CircuitLibrary class purpose: lists the circuits a user has saved one page at a time, so a library of any size opens
+#instantly. Only names, component counts and save times are read from the database until a circuit is chosen.
+class CircuitLibrary(Toplevel):
+    def __init__(self, database, username, on_load):
+        super().__init__()
+        self.database = database
+        self.username = username
+        self.on_load = on_load #called with the name of the chosen circuit
+        self.page = 0
+        self.names = []
+        self.title("My Circuits")
+        self["bg"] = "#1A2421"
+        self.resizable(False, False)
 
-        #the keys for the graphs are returned as strings, so we iterate through all keys and induvidually turn them into integers
-        self.graph = loaded_contents[1]
-        self.graph = {int(key): value for key, value in self.graph.items()}
+        self.listbox = Listbox(self, width=50, height=PAGE_SIZE, font=('Rockwell', 10))
+        self.listbox.pack(padx=10, pady=10)
+        self.listbox.bind('<Double-Button-1>', lambda event: self.load())
+
+        buttons = Frame(self, bg="#1A2421")
+        buttons.pack(pady=5)
+        Button(buttons, text="<", font=('Rockwell', 10, 'bold'), fg='white', bg='#0f1c14', command=lambda: self.show_page(self.page - 1)).pack(side=LEFT, padx=4)
+        self.page_label = Label(buttons, text="", font=('Rockwell', 10, 'bold'), fg='white', bg="#1A2421")
+        self.page_label.pack(side=LEFT, padx=4)
+        Button(buttons, text=">", font=('Rockwell', 10, 'bold'), fg='white', bg='#0f1c14', command=lambda: self.show_page(self.page + 1)).pack(side=LEFT, padx=4)
+        Button(buttons, text="Load", font=('Rockwell', 10, 'bold'), fg='white', bg='#0f1c14', command=self.load).pack(side=LEFT, padx=4)
+        Button(buttons, text="Delete", font=('Rockwell', 10, 'bold'), fg='white', bg='#7d2c37', command=self.delete).pack(side=LEFT, padx=4)
+        self.show_page(0)
+
+    #shows one page of the library, newest circuits first
+    def show_page(self, page):
+        pages = max(1, -(-self.database.count_circuits(self.username) // PAGE_SIZE)) #rounds up
+        self.page = min(max(page, 0), pages - 1)
+        circuits = self.database.list_circuits(self.username, self.page, PAGE_SIZE, by_saved=True)
+        self.names = [name for name, components, saved in circuits]
+        self.listbox.delete(0, END)
+        for name, components, saved in circuits:
+            self.listbox.insert(END, name + "  (" + str(components) + " components, " + time.strftime("%d/%m/%Y %H:%M", time.localtime(saved)) + ")")
+        self.page_label.config(text="Page " + str(self.page + 1) + " of " + str(pages))
+
+    def selected(self):
+        selection = self.listbox.curselection()
+        return self.names[selection[0]] if selection else None
+
+    def load(self):
+        name = self.selected()
+        if name is not None:
+            self.destroy()
+            self.on_load(name)
+
+    def delete(self):
+        name = self.selected()
+        if name is not None and messagebox.askyesno("Delete circuit", "Delete " + name + "?", parent=self):
+            self.database.delete_circuit(self.username, name)
+            self.show_page(self.page)
 
-        #assigns rest of the variables
-        self.battery_exists = loaded_contents[2]
-        self.varesistor_exists = loaded_contents[3]
-        self.switch_exists = loaded_contents[4]
-        self.thermistor_exists = loaded_contents[5]
-        self.total_components = loaded_contents[6]
-        self.voltmeters = loaded_contents[7]
-        self.json_loaded = True
 
 #WireGeneration class purpose: This class is required to connect two components together with wires.
 #It is also needed to store the connections of the components in the graph abstract data type.
@@ -1144,12 +1381,13 @@ class CircuitMaker:
 class WireGeneration(Toplevel):
     graphdic = {}
     voltmeters = []
-    def __init__(self, canvas):
+    def __init__(self, canvas, store):
         super().__init__()
         #calls superclass constructor
 
         #intialises instance
         self.canvas = canvas
+        self.store = store #component store used to look up the entered IDs
         self.IDpair = []
 
         #flag to determine if the connection involves a voltmeter so that it can avoid adding the connection to the dictionary
@@ -1206,17 +1444,18 @@ class WireGeneration(Toplevel):
 
     #this method is important for adding the connections to the dictionary or finding out if the connection involves a voltmeter
     def tag_validation(self):
-        #gets all voltmeter components in the canvas
-        get_voltmeters = self.canvas.find_withtag('voltmeter')
         #try-except used to prevent user from entering non-numeric characters
         try:
             image_tag1 = int(self.tagentry1.get())
             image_tag2 = int(self.tagentry2.get())
 
-            tag1_isvalid = self.canvas.find_withtag("ID" + str(image_tag1))[0]
-            tag2_isvalid = self.canvas.find_withtag("ID" + str(image_tag2))[0]
+            #looks up both components in the component store, an AttributeError is raised if an ID does not exist
+            component1 = self.store.get(image_tag1)
+            component2 = self.store.get(image_tag2)
+            tag1_isvalid = component1.image
+            tag2_isvalid = component2.image
 
-        except (ValueError, IndexError):
+        except (ValueError, AttributeError):
             messagebox.showerror("Error", "Invalid tag entered. Re-enter tag.")
             return #returns to caller and prevents further execution of method
 
@@ -1226,10 +1465,10 @@ class WireGeneration(Toplevel):
             self.IDpair = [tag1_isvalid, tag2_isvalid]
 
             #if either of the components are a voltmeter, the pair will also be added to voltmeters list for later calculations
-            if tag1_isvalid in get_voltmeters:
+            if component1.kind == "voltmeter":
                 self.voltmeters.append([image_tag1,image_tag2])
                 self.voltmeterflag = True #sets flag to true
-            elif tag2_isvalid in get_voltmeters:
+            elif component2.kind == "voltmeter":
                 self.IDpair = [tag2_isvalid,tag1_isvalid]
                 self.voltmeters.append([image_tag2,image_tag1])
                 self.voltmeterflag = True #sets flag to true
@@ -1258,7 +1497,7 @@ class WireGeneration(Toplevel):
                 for key in self.graphdic:
                     if len(self.graphdic[key]) < 2:
                         self.graphdic[key].append('x')
-            print(self.graphdic)
+            tracing.event("wire.connect", source=image_tag1, target=image_tag2, components=len(self.graphdic))
         else:
             #display error if error encountered
             messagebox.showerror("Error", "Invalid tag entered. Re-enter tag.")
@@ -1269,15 +1508,17 @@ class WireGeneration(Toplevel):
 #It is compatible with different types of circuits: series, parallel and series-parallel circuits.
 #It inherits from TopLevel similar to the other classes
 class Simulate(Toplevel):
-    def __init__(self, canvas, graph, switched_on, total_components, voltmeters):
+    @tracing.traced("simulate")
+    def __init__(self, canvas, graph, switched_on, total_components, voltmeters, store, session):
         super().__init__() #calling superclass constructor
         self.resizable(False,False)
 
         #stores instances of passed arguments
         self.canvas = canvas
+        self.store = store #component store which every component value is read from
+        self.session = session #simulation session which keeps the analysis between simulations
         self.switched_on = switched_on
         self.total_components = total_components
-        print(self.total_components)
 
         #sets background
         self.wallpaper = ImageTk.PhotoImage(Image.open("wallpaper/mainbackground.jpg"))
@@ -1302,21 +1543,40 @@ class Simulate(Toplevel):
         self.total_voltage = 0
         self.total_resistance = 0
         self.total_current = 0
-        #removes the 'x' placeholders so that the graph can be passed properly through the DFS algorithm
+        #removes the 'x' placeholders from the copy of the graph which is displayed
         for key, values in self.graph_old.items():
             without_x = [value for value in values if value != "x"]
             if without_x:
                 self.graph[key] = without_x
 
-        #the graph dictionary is passed as an argument into get_cycles() method which gets the cycles from the DFS method
-        self.cycles = self.get_cycles(self.graph)
+        #the circuit is turned into a netlist, analysed by the topology module and solved headlessly by the MNA solver.
+        #The session only rebuilds these when the circuit's shape has changed since the last simulation, and a circuit
+        #which has been simulated before is found in the solve cache.
+        #graph_old is passed as the 'x' placeholders show which components are connected directly across each other
+        try:
+            self.result = self.session.update(self.graph_old, self.get_components())
+            self.netlist = self.session.netlist
+            self.analysis = self.session.analysis
+        except CircuitError as error:
+            self.destroy()
+            messagebox.showerror("Circuit cannot be simulated", str(error))
+            return
 
-        print("Simulation Result:")
-        print("Graph:",self.graph)
-        print("Cycles:",self.cycles)
+        #a fundamental cycle basis is used instead of every cycle, so this stays fast for large circuits
+        self.cycles = self.analysis.cycles
 
-        #the circuit_composition() result is called and stored in circuit_type to then be displayed and used to perform calculations quicker using selection statements
+        tracing.event("simulate.circuit", components=self.total_components, graph=self.graph, cycles=self.cycles)
+
+        #the circuit_composition() result is called and stored in circuit_type to then be displayed
         self.circuit_type = self.circuit_composition()
+        self.get_series_components()
+        if not self.winfo_exists():
+            return #window was closed because of too many ammeters in series
+
+        self.total_voltage = self.result.total_voltage
+        self.total_current = round(self.result.total_current, 2)
+        self.total_resistance = round(self.result.total_resistance, 2)
+        self.meter_labels = {} #meter ID: label showing its reading, so readings can be updated in place
 
         title_label = Label(self, text="Circuit Calculations", font=('Rockwell', 18, 'bold'), fg='white', bg='#1A2421', relief = "raised",
                       borderwidth=4)
@@ -1326,7 +1586,7 @@ class Simulate(Toplevel):
         self.display_meters()
 
         #labels which display the key attributes of the circuit made by the user
-        circuit_type_label = Label(self, text="Circuit Type: " + self.circuit_composition(), font=('Rockwell', 15), fg='white', bg='#1C352D', relief = "raised",
+        circuit_type_label = Label(self, text="Circuit Type: " + self.circuit_type, font=('Rockwell', 15), fg='white', bg='#1C352D', relief = "raised",
                       borderwidth=4)
         circuit_type_label.pack(pady=5)
 
@@ -1335,150 +1595,71 @@ class Simulate(Toplevel):
                       borderwidth=4)
         total_components_label.pack(pady=5)
 
-        #the resistance in series is called and stored here. If the circuit is series, this will remain the same, otherwise it will be updated soon
-        resistance_label = Label(self, text="Total resistance (R): " + str(self.series_resistance()) + "Ω", font=('Rockwell', 15), fg='white', bg='#004B49', relief = "raised",
+        #the equivalent resistance seen by the battery
+        self.resistance_label = Label(self, text="Total resistance (R): " + str(self.total_resistance) + "Ω", font=('Rockwell', 15), fg='white', bg='#004B49', relief = "raised",
                       borderwidth=4)
-        resistance_label.pack(pady=5)
+        self.resistance_label.pack(pady=5)
 
-        #displays potential difference from battery which is called and stored here.
-        pd_label = Label(self, text="Potential Difference (V): " + str(self.series_voltage())+"V", font=('Rockwell', 15), fg='white', bg='#3B7A57', relief = "raised",
+        #displays potential difference from battery
+        self.pd_label = Label(self, text="Potential Difference (V): " + str(self.total_voltage)+"V", font=('Rockwell', 15), fg='white', bg='#3B7A57', relief = "raised",
                       borderwidth=4)
-        pd_label.pack(pady=5)
+        self.pd_label.pack(pady=5)
 
         #displays overall current in label
-        current_label = Label(self, text="Total current (I): " + str(self.total_current)+"A", font=('Rockwell', 15), fg='white', bg='#00755E', relief = "raised",
+        self.current_label = Label(self, text="Total current (I): " + str(self.total_current)+"A", font=('Rockwell', 15), fg='white', bg='#00755E', relief = "raised",
                       borderwidth=4)
-        current_label.pack(pady=5)
+        self.current_label.pack(pady=5)
+
+        #opens the current-voltage graph of the circuit and its components
+        iv_button = Button(self, text="I-V Graph", font=('Rockwell', 12, 'bold'), fg='white', bg='#0f1c14',
+                           command=self.iv_graph)
+        iv_button.pack(pady=10)
 
-        #updates resistance if not series
-        if len(self.cycles) > 1:
-            resistance_label.config(text="Total resistance: " + str(self.total_resistance) + "Ω" )
+        #shows how much the meter readings vary when the resistors and batteries are real parts within their tolerance
+        tolerance_button = Button(self, text="Tolerance Analysis", font=('Rockwell', 12, 'bold'), fg='white', bg='#0f1c14',
+                                  command=self.tolerance_analysis)
+        tolerance_button.pack(pady=10)
 
-    #this method returns the battery of the circuit and its voltage
+    #this method returns every battery of the circuit and its voltage
     def get_volts(self):
         battery_volts = []
-        # this method gets all components with the tag 'battery'
-        battery_widgets = self.canvas.find_withtag("battery")
-
-        #extracts the battery ID and its potential difference from battery_widgets
-        for widget in battery_widgets:
-            widget_tags = self.canvas.itemcget(widget, "tags")
-            widget_tags_list = widget_tags.split(" ")
-            #slices component id
-            widget_id = widget_tags_list[0]
-            #slices voltage value
-            voltage = widget_tags_list[1]
-            battery_volts.append([widget_id, voltage])
+        #the batteries are read straight from the component store's battery index
+        for ID, battery in self.store.of_kind("battery").items():
+            battery_volts.append([ID, battery.value])
         return battery_volts
 
-    #this method returns the battery of the circuit and its voltage
+    #this method returns every resistor, variable resistor and thermistor of the circuit and its resistance
     def get_ohms(self):
         resistor_ohms = []
-        #gets all widgets of the canvas and removes the uneeded one using process of elimination with selective statements
-        for widget in self.canvas.find_all():
-            tags = self.canvas.gettags(widget)
-            #extracts the resistor/thermistor/variable resistor ID and its resistance
-            if "resistor" in tags or "varesistor" in tags or "thermistor" in tags:
-                #slices component id
-                widget_id = tags[0]
-                #slices ohm value
-                widget_ohms = float(tags[1])
-                resistor_ohms.append([int(widget_id), int(round(widget_ohms))])
+        for ID, resistor in self.store.of_kind("resistor", "varesistor", "thermistor").items():
+            resistor_ohms.append([ID, int(round(resistor.value))])
         return resistor_ohms
 
-    def series_voltage(self):
-        # if there is a node that is not connected to the full circuit, this would return 0 and stop further execution of the method
-        if self.dead_end_nodes or not self.switched_on:
-            return 0
-        voltages = self.get_volts()  #gets voltage values
-        total_voltage = 0
-        for volt in voltages:
-            total_voltage += float(volt[1]) #gets the overall potential difference of the circuit
-        return total_voltage
-
-    def series_resistance(self):
-        if self.dead_end_nodes or not self.switched_on:
-            return 0
-        resistances = self.get_ohms()  #get resistance values
-        total_resistance = 0
-        for res in resistances:
-            #res[1] slices the reisistance
-            total_resistance += float(res[1]) #adds up total resistance in a
-        return total_resistance
-
-    #this method determines the circuit_type of the simulated circuit
+    #this method returns every component in the circuit as a dictionary of ID: (kind, value) for the solver.
+    #Voltmeters are left out as they are assumed to have infinitely large resistance.
+    @tracing.traced("canvas.components")
+    def get_components(self):
+        return self.store.solver_components()
+
+    #this method determines the circuit_type of the simulated circuit using the series-parallel breakdown of the topology
     def circuit_composition(self):
-        #find number of cycles
-        num_cycles = len(self.cycles)
-
-        #stores all components in series. This is only required to see if at least one series component exists.
-        in_series = self.get_series_components()
-        if num_cycles == 1:
-            #circuit has only one cycle, so it's a series circuit
-            circuit_type = "Series"
-
-        elif (num_cycles > 1) and in_series:
-            #circuit has multiple cycles and there are components in series, so it's a series-parallel circuit
-            circuit_type = "Series-Parallel"
-        else:
-            #circuit has multiple cycles but no component in series, so it's a parallel circuit
-            circuit_type = "Parallel"
-
-            #this checks for dead-end branches
-            for node in self.graph_old.keys():
-                #this checks if the key only has one neighbour and if it is not already appended
-                if len(self.graph_old[node]) == 1 and node not in self.dead_end_nodes:
-                    #as there is only neighbour, we can just index 0.
-                    neighbor = self.graph[node][0]
-                    #checks if the neighbour is part of a cycle
-                    if neighbor in self.cycles:
-                        #nighbor is part of a cycle, so node is not a dead end
-                        continue
-                    #appends to dead_end_nodes
-                    self.dead_end_nodes.append(node)
-
-            if self.dead_end_nodes: #this results in every voltage, current, and resistance value be returned as 0
-                circuit_type = "Disconnected component detected."
-
-        return circuit_type #returns the circuit_type to the caller
-
-    #this is a general method to retrieve the IDs of a component
-    def get_componentID(self, component):
-        widget = self.canvas.find_withtag(component)
-        tags = self.canvas.itemcget(widget, "tags")
-        widget_tags_list = tags.split(" ")
-        #slices the ID values
-        id_values = widget_tags_list[0]
-        return id_values
-
-    #this method gets all components in series and stores them in a 1D list
+        #components which are not in a closed loop with the battery are stored as dead-end nodes
+        self.dead_end_nodes = self.analysis.dead
+        return self.analysis.circuit_type #returns the circuit_type to the caller
+
+    #this method gets all components in series with the battery and stores them in a 1D list
     def get_series_components(self):
-        in_series=[]
-        #using methods to get all IDs
-        resistor_ids = self.get_ohms()
-        ammeter_ids = self.get_componentID("ammeter")
-        switch_id = self.get_componentID("switch")
-        lightbulb_ids = self.get_componentID("lightbulb")
-
-        #this nested function is made to make this more efficient otherwise a lot of code will be repeated
-        def find_series_components(IDlist, series_list): #the list of IDs and the list to store in are the parameters respectfully
-            added_ids = []
-            for ID in IDlist:
-                in_all_cycles = True #initially set to true
-                for cycle in self.cycles:
-                    if ID[0] not in cycle: #the idea here is that if the componenet ID is in every cycle, that means it is in series
-                        in_all_cycles = False #if they are not in every cyclel, they are not in series
-                        break
-                # prevents already added IDs to be readded
-                if in_all_cycles and ID not in added_ids:
-                    series_list.append(ID) #appends the components in series to the passed list
-                    added_ids.append(ID) #appens component ID into added_ids list
-
-        #executing nested function for different components
-        find_series_components(ammeter_ids, self.A_in_series)
-        find_series_components(resistor_ids, self.R_in_series)
-        find_series_components(switch_id, self.S_in_series)
-        find_series_components(lightbulb_ids, self.L_in_series)
+        in_series = []
+        #lists which each type of component in series is sorted into
+        series_lists = {"ammeter": self.A_in_series, "resistor": self.R_in_series, "varesistor": self.R_in_series,
+                        "thermistor": self.R_in_series, "switch": self.S_in_series, "lightbulb": self.L_in_series}
+        for series_list in series_lists.values():
+            series_list.clear()
+
+        for ID in self.analysis.series:
+            kind, value = self.netlist.components[ID]
+            if kind in series_lists:
+                series_lists[kind].append(ID)
 
         if len(self.A_in_series) > 1: #prevents user from using same ammeter in series twice as it produces same results and is unnecessary
             messagebox.showwarning("Terminated", "Only 1 ammeter needed in series as all ammeters in series show same display.")
@@ -1491,248 +1672,92 @@ class Simulate(Toplevel):
         in_series.extend(self.L_in_series)
         return in_series #returns final list to caller
 
-    #this method is important to get every parallel_branches will be needed for parallel/series-parallel calculations
+    #this method returns every parallel branch as a list of component IDs, found from the parallel groups of the topology
     def get_parallel_branches(self):
-        parallel_branches = []
-        if len(self.cycles) > 1:
-            #makes an independent copy of self.cycles
-            parallel_branches = [cycle[:] for cycle in self.cycles]
-
-            #removes largest cycle as it is not useful in calculation
-            largest_branch = parallel_branches.index(max(parallel_branches, key=len))
-            parallel_branches.pop(largest_branch)
-
-            #turns the first index into set to use for comparison
-            common_items = set(parallel_branches[0])
-
-            #set for unique IDs
-            unique_items = set()
-
-            #cycles through the branches in the list of parallel branches.
-            for i in range(1, len(parallel_branches)):
-                #this performs the operation (common_items ∩ parallel_branches[i]) in order to retrieve all common IDs
-                common_items = common_items.intersection(set(parallel_branches[i]))
-
-            #for the range of how many branches the list 'parallel_branches' is remade but without the common_items.
-            #the remaining nodes are then added onto the 'unique_items' set
-            for i in range(len(parallel_branches)):
-                parallel_branches[i] = [ID for ID in parallel_branches[i] if ID not in common_items]
-
-                parallel_branches[i] = [ID for ID in parallel_branches[i] if
-                                        ID not in unique_items and not unique_items.add(ID)]
-
-            #this removes all empty branches from the list as you can see by 'len(branch) > 0'
-            parallel_branches = [branch for branch in parallel_branches if len(branch) > 0]
-
-        return parallel_branches #returns the parallel_branches list to the caller
+        return self.session.topology.parallel_branches()
 
     #this is the one of the key methods of the Simulate class. It displays both ammeters and voltmeters present in the circuit.
-    #It also calculates the total current and total resistance of the circuit in series, parallel and series-parallel cases.
+    #The readings come from the solved circuit, so this works the same for series, parallel and series-parallel circuits.
+    @tracing.traced("render.meters")
     def display_meters(self):
-        #gets the IDs using the get_componentID method
-        ammeter_ids = self.get_componentID("ammeter")
-        voltmeter_ids = self.get_componentID("voltmeter")
-        resistor_ids = self.get_ohms()
-
-        #gets all parallel branches using get_parallel_branches method
-        parallel_branches = self.get_parallel_branches()
-
-        #voltage in series and resistance in series is assigned to V and R by default
-        V = self.series_voltage()
-        R = self.series_resistance()
-
-        if not self.switched_on:
-            #if the switch of the circuit if present is switched off, all values will be presented as 0
-            for ID in ammeter_ids:
-                ammeter_label = Label(self, text="Ammeter " + str(ID[0]) + ": 0A", font=('Rockwell', 12),
-                                      fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
-                ammeter_label.pack(pady=5)
-
-            for ID in voltmeter_ids:
-                voltmeter_label = Label(self, text="Voltmeter " + str(ID) + ": 0V",
-                                      font=('Rockwell', 12),
-                                      fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
-                voltmeter_label.pack(pady=5)
-
-
-        elif self.circuit_type == "Series":
-            self.total_current = round((V / R),2) #uses Ohm's law to calculate the total current of the circuit, then rounds it to 2dp
-            #displays all ammeters along with the total current
-            for ID in ammeter_ids:
-                ammeter_label = Label(self, text="Ammeter " + str(ID[0]) + ": " + str(self.total_current) + "A", font=('Rockwell', 12),
-                                      fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
-                ammeter_label.pack(pady=5)
-
-            for ID in voltmeter_ids:
-                if self.circuit_type == "Series":
-                    #voltage is split across every component in circuits, we would have to divide the total potential difference by number of components
-                    #we do not count the voltmeters and battery when counting number of components for this, so we subtract the total components by (len(voltmeter_ids)+1)
-                    voltmeter_value = round((self.series_voltage() / (self.total_components - (len(voltmeter_ids)+1))), 2)
-
-                    #displays the values with the voltmeter_value
-                    voltmeter_label = Label(self, text="Voltmeter " + str(ID) + ": " + str(voltmeter_value) + "V",
-                                          font=('Rockwell', 12),
-                                          fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
-                    voltmeter_label.pack(pady=5)
-
-        #if the circuit is parallel or series-parallel and has no dead-end-nodes
-        elif len(self.cycles) > 1 and not self.dead_end_nodes:
-            R_in_parallel = [] #initalising list
-
-            #iterates through every resistor ID and parallel branch to see if the resistor is a parallel component
-            for resistor in resistor_ids:
-                for branch in parallel_branches:
-                    if (resistor[0] in branch) and (resistor not in R_in_parallel):
-                        #appends the resistor to a list if it is a parallel component
-                            R_in_parallel.append(resistor)
-
-            #initialising lists
-            I_branches = []
-            R_branches = []
-            #finding total resistance
-            #try except used to report zero-error as an ammeter has negligible resistance and if it is alone in a parallel branch, there will be a zero error.
-            #key equation used here to calculate resistance in parallel: 1/Rₜₒₜₐₗ = 1/R₁ + 1/R₂ + 1/R₃
-            try:
-                #iterates a parallel branch at a time and every resistor in that branch
-                for branch in parallel_branches:
-                    R_branch = 0
-                    for resistor in R_in_parallel:
-                        if resistor[0] in branch:
-                            R_branch += resistor[1] #total resistance in the branch
-                    if R_branch > 0:
-                        self.total_resistance += 1 / R_branch #reciprocal of the resistance of that branch is added to the total_resistance
-                        I_branches.append(round((V / R_branch),2)) #the current of the branch is found using V/R
-                    R_branches.append(R_branch) #The total resistance within the branch is appended to the 1D list R_branches
-
-                #this will be reached once the iteration has cycled through every parallel branch and have added up every resistor in each branch.
-                #the final total resistance of the parallel circuit would be the reciprocal of the total
-                self.total_resistance = 1 / self.total_resistance
-
-                #if the circuit is series-parallel, we can use R_in_series to find resistors in series
-                for resistor in self.R_in_series:
-                    #the resistance of the resistor can be sliced and added onto the total resistance
-                    self.total_resistance += resistor[1]
-
-                #the total resistance is rounded to 2dp
-                self.total_resistance = round(self.total_resistance, 2)
-
-                print("final total resistance:",self.total_resistance)
-            except:
-                self.destroy()
-                messagebox.showerror("Undefined error", "Cannot divide potential difference by 0. You must include any resistor in series with the component: Aₚ = Vₜₒₜₐₗ / Rₚ")
-
-            #total current
-            #from the iteration when finding resistance, we have made the array of I_branches which is the current of every parallel branch
-            #using Kirchoff's current law, we can find the overall current of the circuit with the equation Iₜₒₜₐₗ = I₁ + I₂ + I₃ where Iₙ is the current of a parallel branch
-            self.total_current = sum(I_branches)
-            #zip is used to pair the ID from ammeter_ids with the corresponding current from I_branches
-            for ID, current in zip(ammeter_ids, I_branches):
-                #if in series, it will just display the total current
-                if ID in self.A_in_series:
-                    ammeter_label = Label(self, text="Ammeter " + str(ID[0]) + ": " + str(self.total_current) + "A",
-                                          font=('Rockwell', 12),
-                                          fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
-                    ammeter_label.pack(pady=5)
-                else:
-                    #The 'current' variable from I_branches would be displayed instead
-                    ammeter_label = Label(self, text="Ammeter " + str(ID[0]) + ": " + str(current) + "A",
-                                          font=('Rockwell', 12),
-                                          fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
-                    ammeter_label.pack(pady=5)
-
-            #displaying voltmeters
-            #here we get the total number of components that are in series
-            in_series = self.get_series_components()
-            in_series_count = len(in_series)
-            try:
-                #voltmeter_split is used to divide the overall potential difference by the number of components in series.
-                voltmeter_split = round((self.series_voltage() / (in_series_count)),2)
-            except:
-                #if the circuit is in parallel, in_series_count would be 0, so voltmeter_split would instead just be equal to the potential difference
-                voltmeter_split = self.series_voltage()
-            print("Resistors in parallel:", R_in_parallel)
-            print("Parallel branches:", parallel_branches)
-            print("ID of voltmeter and component pair:",self.voltmeters)
-            print("IDs of components in series:",self.get_series_components())
-
-            #this iterates through each branch induvidually to check if a resistor from R_in_Parallel is in that branch.
-            for branch in parallel_branches:
-                for resistor in R_in_parallel:
-                    if resistor[0] in branch:
-                        #if the resistor is in the branch, it then iterates through every voltmeter that exists in the voltmeters ID (which stored voltmeter-resistor pairs)
-                        for voltmeter in self.voltmeters:
-                            if voltmeter[1] == resistor[0]: #if any of the voltmeters during iteration match the said resistor, the following will happen
-                                branch_num = parallel_branches.index(branch) #the index of the branch in the current iteration stage is stored in branch_num
-
-                                # branch_num is used to slice the resistance value of the branch in R_branches
-                                voltmeter_value = (voltmeter_split / R_branches[branch_num]) * resistor[1]
-
-                                #value displayed in label
-                                voltmeter_label = Label(self, text="Voltmeter " + str(voltmeter[0]) + ": " + str(voltmeter_value) + "V",
-                                                        font=('Rockwell', 12),
-                                                        fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
-                                voltmeter_label.pack(pady=5)
-
-    #this method is important as it is used to determine every calculation.
-    #it is the depth-first search algorithm, implemented to return every cycle of a graph
-    #several filters are also put in place to remove some unwanted cycles
-    def dfs(self, node, graph, visited, stack, cycles):
-        #this has 5 parameters:
-        #node is the current node being visited
-        #graph is the graph which it will be used on,
-        #visited is a dictionary which has nodes as keys and boolean expressions as values to keep track of visited nodes
-        #stack is used to keep track of all paths that have been taken, and will be used to backtrack if there are no more neighbours for a node
-        #cycles stores every cycle found ni the graph
-
-        #initially sets current node as visited
-        visited[node] = True
-
-        #adds current node to stack
-        stack.append(node)
-
-        #visits every neighbour of the node
-        for neighbor in graph[node]:
-            #if it has not been visited yet
-            if not visited[neighbor]:
-                #recursively call the depth-first search algorithm again. This will then mark that node as visited and go through its own neighbours.
-                self.dfs(neighbor, graph, visited, stack, cycles)
-            #if the neighbour is at the first index of the stack, that means there is a cycle, we have gone back to the start where the cycle started.
-            #The length of the stack must be at least 2 otherwise it would not count as a cycle
-            elif neighbor == stack[0] and len(stack) > 2:
-
-                #this creates a new independent cycle
-                cycle = sorted(stack[:-1] + [node])
-                if cycle not in cycles:
-                    #if it does not exist in the cycles list, it will be appended
-                    cycles.append(cycle)
-
-        #This is to allow parallel circuit graphs to count as a cycle despite often only having edge between nodes
-        if len(graph[node]) == 1 and len(stack) > 1:
-            #node is a leaf node, but treat it as if it were part of a cycle
-            cycle = sorted(stack)
-            if cycle not in cycles:
-                cycles.append(cycle)
-
-        #this removes the current node from the stack then it marks the current node as unvisited
-        stack.pop()
-        visited[node] = False
-
-    def get_cycles(self, graph):
-        #this creates a dictionary which initalises all nodes as unvisted (False)
-        visited = {node: False for node in graph}
-
-        #this keeps a list where all cycles will be appended
-        cycles = []
-
-        #this will apply the DFS algorithm on all unvisited nodes and will retrieve all cycles
-        for node in graph:
-            if not visited[node]:
-                self.dfs(node, graph, visited, [], cycles) #takes the empty cycles list as parameter
-        return cycles #returns the cycles list to caller
-
-
-# Generates main window and uses loginpage class
-main = Tk() #this is the tkinter class, used to create a root window
-main.resizable(False, False) #prevents resizing
-page1 = Authentication(main) #creates instance of Authentication class while main is the root window
-main.mainloop() #starts main event loop of root window
+        for ID, current in sorted(self.result.ammeter_readings().items()):
+            ammeter_label = Label(self, text="Ammeter " + str(ID) + ": " + str(round(current, 2)) + "A", font=('Rockwell', 12),
+                                  fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
+            ammeter_label.pack(pady=5)
+            self.meter_labels[ID] = ammeter_label
+
+        for ID, voltage in sorted(self.result.voltmeter_readings(self.voltmeters).items()):
+            voltmeter_label = Label(self, text="Voltmeter " + str(ID) + ": " + str(round(voltage, 2)) + "V",
+                                    font=('Rockwell', 12),
+                                    fg='white', bg='#8A9A5B', relief="raised", borderwidth=4)
+            voltmeter_label.pack(pady=5)
+            self.meter_labels[ID] = voltmeter_label
+
+    #opens the I-V graph of the circuit. Its sweep runs on a worker thread, so it is given a solver of its own made from a
+    #copy of the netlist, which live value changes to the session's solver meanwhile do not affect
+    def iv_graph(self):
+        IVGraph(MNASolver(copy.deepcopy(self.session.netlist)))
+
+    #solves TOLERANCE_SAMPLES randomly varied copies of the circuit (see tolerance.py) on a worker thread and shows the
+    #spread of every meter's reading. A copy of the netlist is used so changing a value meanwhile does not affect the run
+    def tolerance_analysis(self):
+        netlist = copy.deepcopy(self.session.netlist)
+        voltmeters = list(self.voltmeters)
+
+        def work(task):
+            return tolerance_analysis(netlist, voltmeters, TOLERANCE_SAMPLES, progress=task.progress)
+
+        Task(self, "Tolerance analysis", work, ToleranceWindow)
+
+    #re-solves the circuit after a component value has changed and updates the readings in place.
+    #The session re-uses the existing analysis, so this does not rebuild the window
+    @tracing.traced("simulate.refresh")
+    def refresh(self):
+        try:
+            self.result = self.session.update(self.graph_old, self.get_components())
+        except CircuitError as error:
+            messagebox.showerror("Circuit cannot be simulated", str(error))
+            return
+        self.total_voltage = self.result.total_voltage
+        self.total_current = round(self.result.total_current, 2)
+        self.total_resistance = round(self.result.total_resistance, 2)
+        self.resistance_label.config(text="Total resistance (R): " + str(self.total_resistance) + "Ω")
+        self.pd_label.config(text="Potential Difference (V): " + str(self.total_voltage)+"V")
+        self.current_label.config(text="Total current (I): " + str(self.total_current)+"A")
+        for ID, current in self.result.ammeter_readings().items():
+            if ID in self.meter_labels:
+                self.meter_labels[ID].config(text="Ammeter " + str(ID) + ": " + str(round(current, 2)) + "A")
+        for ID, voltage in self.result.voltmeter_readings(self.voltmeters).items():
+            if ID in self.meter_labels:
+                self.meter_labels[ID].config(text="Voltmeter " + str(ID) + ": " + str(round(voltage, 2)) + "V")
+
+
+#ToleranceWindow class purpose: toplevel window listing the mean, standard deviation and 5th to 95th percentile of the
+#readings of every meter from a tolerance.ToleranceResult
+class ToleranceWindow(Toplevel):
+    def __init__(self, result):
+        super().__init__()
+        self.resizable(False, False)
+        self.title("Tolerance Analysis")
+        self["bg"] = "#1A2421"
+        Label(self, text=str(result.samples) + " samples", font=('Rockwell', 15, 'bold'), fg='white', bg='#1A2421').pack(pady=10)
+        statistics = result.statistics()
+        for meters, name, unit in (("ammeters", "Ammeter ", "A"), ("voltmeters", "Voltmeter ", "V")):
+            for ID, summary in sorted(statistics[meters].items()):
+                text = (name + str(ID) + ": " + format(summary.mean, ".3g") + unit + " ± " + format(summary.std, ".3g")
+                        + unit + "  (90% between " + format(summary.percentiles[5], ".3g") + unit + " and "
+                        + format(summary.percentiles[95], ".3g") + unit + ")")
+                Label(self, text=text, font=('Rockwell', 12), fg='white', bg='#8A9A5B', relief="raised",
+                      borderwidth=4).pack(padx=10, pady=5)
+        if not statistics["ammeters"] and not statistics["voltmeters"]:
+            Label(self, text="Add an ammeter or voltmeter to see how its reading varies.", font=('Rockwell', 12), fg='white',
+                  bg='#1A2421').pack(padx=10, pady=5)
+
+
+# Generates main window and uses loginpage class. This only runs when main.py is started directly, so the classes can be
+# imported without opening a window. Circuits can be simulated without the GUI with circuitsim.py
+if __name__ == "__main__":
+    main = Tk() #this is the tkinter class, used to create a root window
+    main.resizable(False, False) #prevents resizing
+    page1 = Authentication(main) #creates instance of Authentication class while main is the root window
+    main.mainloop() #starts main event loop of root window
@@ -0,0 +1,105 @@
+#nonlinear.py purpose: models of the components whose current is not proportional to their potential difference, used by
+#the MNA solver's Newton-Raphson iterations.
+#   - lightbulb: a tungsten filament whose resistance rises about tenfold as it heats up to its rated power
+#   - diode: the Shockley diode equation, conducting from terminal a (anode) to terminal b (cathode)
+#   - thermistor (only when self-heating is switched on): heated by the power it dissipates, so its resistance is that
+#     of its set temperature plus the rise from THERMISTOR_THERMAL_RESISTANCE
+#Every model takes numpy arrays of potential differences and returns the current and its derivative (the conductance
+#of the linearised component) for all of them at once.
+import numpy as np
+
+from components import (thermistor_resistance, thermistor_temperature, THERMISTOR_B, THERMISTOR_THERMAL_RESISTANCE)
+
+#lightbulb filament
+BULB_RATED_VOLTAGE = 6.0 #potential difference (V) at which a lightbulb is fully bright
+BULB_RATED_POWER = 3.0 #power (W) of a lightbulb at its rated voltage
+BULB_COLD_RATIO = 10.0 #resistance of a hot filament compared to a cold one
+BULB_EXPONENT = 0.225 #a hot filament's resistance rises with V^0.45, which is (V^2)^0.225
+
+#diode
+DIODE_SATURATION_CURRENT = 1e-12 #A
+DIODE_IDEALITY = 1.0
+THERMAL_VOLTAGE = 0.025852 #kT/q (V) at room temperature
+DIODE_LIMIT = 40.0 #beyond this many thermal voltages the exponential is continued as a straight line so it cannot overflow
+MIN_CONDUCTANCE = 1e-12 #conductance (S) added across every diode so a reverse biased diode does not leave a floating node
+
+#highest temperature (°C) a self-heating thermistor is allowed to reach, as the model overflows after that
+MAX_TEMPERATURE = 1000.0
+
+#potential difference every component is assumed to have before the first iteration
+INITIAL_VOLTAGES = {"diode": 0.6}
+
+_bulb_hot = BULB_RATED_VOLTAGE ** 2 / BULB_RATED_POWER
+_bulb_cold = _bulb_hot / BULB_COLD_RATIO
+_bulb_knee = BULB_RATED_VOLTAGE / np.sqrt(BULB_COLD_RATIO ** (1 / BULB_EXPONENT) - 1)
+_diode_scale = DIODE_IDEALITY * THERMAL_VOLTAGE
+_diode_critical = _diode_scale * np.log(_diode_scale / (np.sqrt(2) * DIODE_SATURATION_CURRENT))
+
+
+#lightbulb filament resistance R = R_cold * (1 + (V / V_knee)^2)^0.225, which is R_cold at 0V and R_hot at the rated voltage
+def bulb(voltages, values=None):
+    squared = (voltages / _bulb_knee) ** 2
+    resistance = _bulb_cold * (1 + squared) ** BULB_EXPONENT
+    current = voltages / resistance
+    #dI/dV = (1 - V/R dR/dV) / R, where V/R dR/dV = 2 * 0.225 * s / (1 + s)
+    conductance = (1 - 2 * BULB_EXPONENT * squared / (1 + squared)) / resistance
+    return current, conductance
+
+
+def diode(voltages, values=None):
+    limit = DIODE_LIMIT * _diode_scale
+    exponential = np.exp(np.minimum(voltages, limit) / _diode_scale)
+    current = DIODE_SATURATION_CURRENT * (exponential - 1)
+    conductance = DIODE_SATURATION_CURRENT * exponential / _diode_scale
+    above = voltages > limit
+    current = np.where(above, current + conductance * (voltages - limit), current)
+    return current + MIN_CONDUCTANCE * voltages, conductance + MIN_CONDUCTANCE
+
+
+#self-heating thermistor. values are the resistances it was set to, which give the temperature of its surroundings.
+#Its temperature T solves T = T_set + theta * V^2 / R(T), found with a few Newton iterations for every thermistor at once
+def thermistor(voltages, values):
+    ambient = thermistor_temperature(values)
+    temperature = ambient.copy()
+    heating = THERMISTOR_THERMAL_RESISTANCE * voltages ** 2
+    for iteration in range(50):
+        resistance = thermistor_resistance(temperature)
+        #dR/dT of thermistor_resistance
+        slope = resistance * THERMISTOR_B / (temperature + 273.15) ** 2
+        residual = temperature - ambient - heating / resistance
+        derivative = np.maximum(1 + heating * slope / resistance ** 2, 1e-6)
+        change = residual / derivative
+        temperature = np.clip(temperature - change, ambient, MAX_TEMPERATURE)
+        if np.all(np.abs(change) < 1e-9):
+            break
+    resistance = thermistor_resistance(temperature)
+    slope = resistance * THERMISTOR_B / (temperature + 273.15) ** 2
+    #dT/dV from differentiating T = T_set + theta * V^2 / R(T)
+    rise = 2 * THERMISTOR_THERMAL_RESISTANCE * voltages / resistance \
+        / np.maximum(1 + heating * slope / resistance ** 2, 1e-6)
+    current = voltages / resistance
+    conductance = (1 - voltages * slope * rise / resistance) / resistance
+    return current, conductance
+
+
+MODELS = {"lightbulb": bulb, "diode": diode, "thermistor": thermistor}
+
+
+#returns (currents, conductances) of components of one kind for arrays of potential differences and component values
+def evaluate(kind, voltages, values):
+    return MODELS[kind](np.asarray(voltages, dtype=float), values)
+
+
+#shortens changes in potential difference which would make a model's current jump by many orders of magnitude in one
+#iteration. A forward biased diode only moves by the logarithm of the change, as SPICE does
+def limit_change(kind, voltages, changes):
+    if kind != "diode":
+        return changes
+    new = voltages + changes
+    limited = voltages + _diode_scale * np.log1p(np.maximum(changes, 0) / _diode_scale)
+    return np.where((changes > 2 * _diode_scale) & (new > _diode_critical), limited - voltages, changes)
+
+
+#brightness of a lightbulb from 0 (off) to 1 (at or above its rated power) for the power (W) it dissipates
+def bulb_brightness(power):
+    return float(np.clip(abs(power) / BULB_RATED_POWER, 0.0, 1.0))
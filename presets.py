@@ -0,0 +1,178 @@
+#presets.py purpose: catalogue of every premade circuit in the preset/ folder.
+#A manifest (preset/index.json) stores the title, component counts, a thumbnail and the simulation results of every
+#preset, so the preset window can list and preview any number of presets without loading and solving each one.
+#Every entry remembers the size, modification time and SHA-1 hash of its file. When a file is added, changed or removed
+#only that entry is rebuilt, and the manifest is written again. A file whose modification time changed but whose
+#contents did not (e.g. after being copied or checked out) only has its time updated.
+#Presets can be canvasdata.json files or .csim files. A JSON preset may have an optional "title" key.
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+
+from PIL import Image, ImageDraw
+
+import circuitfile
+from circuitsim import simulate_file
+
+PRESET_FOLDER = "preset"
+MANIFEST = "index.json"
+MANIFEST_VERSION = 1 #changing this rebuilds every entry, e.g. when the results stored in an entry change
+CANVAS_SIZE = (650, 550) #size of the canvas presets were drawn on
+THUMBNAIL_SIZE = (130, 110)
+#fields of circuitsim.simulate_file which are stored for previews
+RESULT_FIELDS = ("circuit_type", "total_voltage", "total_current", "total_resistance", "ammeters", "voltmeters", "error")
+
+
+#reads a preset file in either format as a dictionary in the canvasdata.json schema
+def read_preset(filename):
+    if filename.endswith(circuitfile.EXTENSION):
+        return circuitfile.load(filename)
+    with open(filename, "r") as loadfile:
+        return json.load(loadfile)
+
+
+#draws a small picture of a circuit from its widgets, returned as a base64 PNG so it can be stored in the manifest
+def render_thumbnail(data):
+    scale = min(THUMBNAIL_SIZE[0] / CANVAS_SIZE[0], THUMBNAIL_SIZE[1] / CANVAS_SIZE[1])
+    thumbnail = Image.new("RGB", THUMBNAIL_SIZE, "white")
+    draw = ImageDraw.Draw(thumbnail)
+    sprites = {}
+    for widget in data["widgets"]:
+        if widget["type"] == "line":
+            draw.line([widget["x1"] * scale, widget["y1"] * scale, widget["x2"] * scale, widget["y2"] * scale], fill="black")
+    for widget in data["widgets"]:
+        if widget["type"] != "image":
+            continue
+        path = str(widget["tags"][-1])
+        if path not in sprites:
+            try:
+                sprite = Image.open(path).convert("RGBA")
+            except OSError:
+                sprites[path] = None
+                continue
+            sprites[path] = sprite.resize((max(1, round(sprite.width * scale)), max(1, round(sprite.height * scale))))
+        sprite = sprites[path]
+        if sprite is not None:
+            #images are drawn centred on their coordinates, the same as on the canvas
+            corner = (round(widget["x"] * scale - sprite.width / 2), round(widget["y"] * scale - sprite.height / 2))
+            thumbnail.paste(sprite, corner, sprite)
+    image = io.BytesIO()
+    thumbnail.save(image, format="PNG")
+    return base64.b64encode(image.getvalue()).decode("ascii")
+
+
+#turns "preset12" into "Preset 12"
+def title_from_filename(filename):
+    name = os.path.splitext(os.path.basename(filename))[0]
+    name = re.sub(r"(\D)(\d)", r"\1 \2", name).replace("_", " ")
+    return name[:1].upper() + name[1:]
+
+
+#sorts file names with their numbers in order, so preset10 comes after preset9
+def natural_key(filename):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", filename)]
+
+
+def file_hash(filename):
+    with open(filename, "rb") as readfile:
+        return hashlib.sha1(readfile.read()).hexdigest()
+
+
+#builds the manifest entry of one preset file
+def build_entry(filename, stat):
+    data = read_preset(filename)
+    counts = {}
+    for ID, kind, value in circuitfile.components_from_widgets(data["widgets"]):
+        counts[kind] = counts.get(kind, 0) + 1
+    simulated = simulate_file(filename)
+    result = {field: simulated.get(field) for field in RESULT_FIELDS}
+    title = data.get("title") or title_from_filename(filename)
+    if not data.get("title") and result["circuit_type"]:
+        title += " - " + result["circuit_type"]
+    return {
+        "file": os.path.basename(filename),
+        "size": stat.st_size,
+        "modified": stat.st_mtime_ns,
+        "sha1": file_hash(filename),
+        "title": title,
+        "components": sum(counts.values()),
+        "counts": counts,
+        "thumbnail": render_thumbnail(data),
+        "result": result,
+    }
+
+
+#PresetCatalogue class purpose: reads, checks and updates the manifest of a preset folder
+class PresetCatalogue:
+    def __init__(self, folder=PRESET_FOLDER):
+        self.folder = folder
+        self.manifest = os.path.join(folder, MANIFEST)
+        self.entries = [] #manifest entries in the order presets are listed
+
+    def path(self, entry):
+        return os.path.join(self.folder, entry["file"])
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest, "r") as loadfile:
+                manifest = json.load(loadfile)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return {entry["file"]: entry for entry in manifest.get("presets", [])}
+
+    #brings the catalogue up to date with the folder and returns its entries.
+    #progress is an optional function called with (fraction done, message), e.g. tasks.Task.progress
+    def refresh(self, progress=None):
+        known = self.read_manifest()
+        filenames = sorted((filename for filename in os.listdir(self.folder)
+                            if filename != MANIFEST and filename.endswith((".json", circuitfile.EXTENSION))), key=natural_key)
+        entries = []
+        changed = len(known) != len(filenames)
+        for number, filename in enumerate(filenames):
+            path = os.path.join(self.folder, filename)
+            stat = os.stat(path)
+            entry = known.get(filename)
+            #the entry is only rebuilt if the file has changed since it was built
+            if entry is not None and entry["size"] == stat.st_size and entry["modified"] != stat.st_mtime_ns:
+                if entry.get("sha1") == file_hash(path):
+                    entry["modified"] = stat.st_mtime_ns
+                    changed = True
+            if entry is None or entry["size"] != stat.st_size or entry["modified"] != stat.st_mtime_ns:
+                if progress is not None:
+                    progress(number / len(filenames), "Indexing " + filename)
+                try:
+                    entry = build_entry(path, stat)
+                except (OSError, ValueError, KeyError, TypeError, circuitfile.CircuitFileError):
+                    continue #files which cannot be read are left out of the catalogue
+                changed = True
+            entries.append(entry)
+        self.entries = entries
+        if changed:
+            self.write_manifest()
+        return entries
+
+    def write_manifest(self):
+        try:
+            with circuitfile.atomic_open(self.manifest, "w") as savefile:
+                json.dump({"version": MANIFEST_VERSION, "presets": self.entries}, savefile, indent=1)
+        except OSError:
+            pass #a read-only preset folder still works, the entries are just rebuilt next time
+
+
+#returns the PNG bytes of an entry's thumbnail
+def thumbnail_bytes(entry):
+    return base64.b64decode(entry["thumbnail"])
+
+
+#usage: python presets.py [FOLDER]
+#builds or updates the manifest of a preset folder, e.g. before shipping new presets
+if __name__ == "__main__":
+    import sys
+    catalogue = PresetCatalogue(sys.argv[1] if len(sys.argv) > 1 else PRESET_FOLDER)
+    for entry in catalogue.refresh():
+        print(entry["file"], "-", entry["title"], "(" + str(entry["components"]) + " components)")
@@ -0,0 +1,227 @@
+#router.py purpose: orthogonal wire auto-router for the circuit canvas. Wires are routed with A* search on a grid of GRID
+#pixel cells, so they only run horizontally and vertically, go around components and avoid running along other wires.
+#The grid is also the spatial index of the canvas: every cell counts the component boxes which cover it and the wires
+#which run through it horizontally and vertically, and knows which nets use it. Finding what is in the way of a wire,
+#or which wires a moved component now covers, only looks at the cells involved.
+#Every net (one connection between two components) is routed on its own, so when a component moves only its own wires
+#and the wires it has been moved onto are routed again.
+import heapq
+
+GRID = 20 #pixels per grid cell
+BEND_COST = 3 #extra cost of a corner, in cells, so wires do not zig-zag
+CROSS_COST = 4 #extra cost of crossing another wire at right angles
+OVERLAP_COST = 50 #extra cost of running along another wire or turning on it, so wires only overlap if there is no other way
+MARGIN = 0 #extra cells kept free around every component. Wires already pass at least one cell away from them
+
+
+#Router class purpose: grid index of component boxes and routed wires, which routes nets between components
+class Router:
+    def __init__(self, width, height, grid=GRID):
+        self.grid = grid
+        self.columns = int(width // grid) + 1
+        self.rows = int(height // grid) + 1
+        size = self.columns * self.rows
+        self.blocked = [0] * size #number of component boxes covering every cell
+        self.horizontal = [0] * size #number of wires running through every cell horizontally
+        self.vertical = [0] * size #and vertically
+        self.cell_nets = {} #cell: set of keys of the nets which run through it
+        self.boxes = {} #component ID: ((x1, y1, x2, y2) in pixels, (column1, row1, column2, row2) of the cells covered)
+        self.nets = {} #net key: (source ID, target ID, [(cell, is horizontal)] used, points)
+
+    #returns the cell nearest to a point on the canvas. Points outside the grid use the nearest cell on its edge
+    def cell(self, x, y):
+        column = min(max(int(round(x / self.grid)), 0), self.columns - 1)
+        row = min(max(int(round(y / self.grid)), 0), self.rows - 1)
+        return row * self.columns + column
+
+    #adds the bounding box of a component, which wires of other components are routed around
+    def add_box(self, ID, x1, y1, x2, y2):
+        if ID in self.boxes:
+            self.remove_box(ID)
+        cells = (max(int(x1 // self.grid) - MARGIN, 0), max(int(y1 // self.grid) - MARGIN, 0),
+                 min(int(-(-x2 // self.grid)) + MARGIN, self.columns - 1), min(int(-(-y2 // self.grid)) + MARGIN, self.rows - 1))
+        self.boxes[ID] = ((x1, y1, x2, y2), cells)
+        for cell in self.box_cells(cells):
+            self.blocked[cell] += 1
+
+    def remove_box(self, ID):
+        box = self.boxes.pop(ID, None)
+        if box is not None:
+            for cell in self.box_cells(box[1]):
+                self.blocked[cell] -= 1
+
+    #moves a component's box by (dx, dy) pixels
+    def move_box(self, ID, dx, dy):
+        x1, y1, x2, y2 = self.boxes[ID][0]
+        self.add_box(ID, x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+    def box_cells(self, cells):
+        column1, row1, column2, row2 = cells
+        for row in range(row1, row2 + 1):
+            start = row * self.columns
+            yield from range(start + column1, start + column2 + 1)
+
+    #returns the keys of the nets of other components which run through a component's box, as they have to be routed
+    #again when the component is moved onto them
+    def nets_covered(self, ID):
+        covered = set()
+        for cell in self.box_cells(self.boxes[ID][1]):
+            covered.update(self.cell_nets.get(cell, ()))
+        return {key for key in covered if ID not in self.nets[key][:2]}
+
+    #routes a net from the point start to the point end (the centres of the source and target components) and returns
+    #the corners of the wire as a list of points, starting at start and ending at end. A net which was routed before is
+    #routed again from scratch
+    def route(self, key, source, target, start, end):
+        self.unroute(key)
+        start_cell = self.cell(*start)
+        end_cell = self.cell(*end)
+        cells = self.search(start_cell, end_cell, source, target)
+        if cells is None:
+            #the target is walled in by components, so the wire is drawn through them
+            cells = self.straight_cells(start_cell, end_cell)
+        used = set()
+        for cell, following in zip(cells, cells[1:]):
+            horizontal = abs(following - cell) == 1
+            used.add((cell, horizontal))
+            used.add((following, horizontal))
+        for cell, horizontal in used:
+            (self.horizontal if horizontal else self.vertical)[cell] += 1
+            self.cell_nets.setdefault(cell, set()).add(key)
+        points = self.points(cells, start, end)
+        self.nets[key] = (source, target, used, points)
+        return points
+
+    #removes a net's wire from the grid
+    def unroute(self, key):
+        net = self.nets.pop(key, None)
+        if net is None:
+            return
+        for cell, horizontal in net[2]:
+            (self.horizontal if horizontal else self.vertical)[cell] -= 1
+            nets = self.cell_nets.get(cell)
+            if nets is not None:
+                nets.discard(key)
+                if not nets:
+                    del self.cell_nets[cell]
+
+    #A* search over (cell, direction) states, so corners can be charged for. Cells covered by components other than the
+    #source and target are walls, and cells used by other wires cost extra. Returns the cells of the cheapest path, or
+    #None if there is none
+    def search(self, start_cell, end_cell, source, target):
+        columns, rows = self.columns, self.rows
+        blocked, horizontal, vertical = self.blocked, self.horizontal, self.vertical
+        end_column, end_row = end_cell % columns, end_cell // columns
+        #cells of the source and target boxes, where their own box does not block the wire and other wires do not count
+        own = set()
+        for ID in (source, target):
+            if ID in self.boxes:
+                own.update(self.box_cells(self.boxes[ID][1]))
+        own.add(start_cell)
+        own.add(end_cell)
+
+        #states are cell * 3 + direction, with direction 0 for horizontal, 1 for vertical and 2 before the first step
+        start_state = start_cell * 3 + 2
+        unreached = columns * rows * OVERLAP_COST
+        best = [unreached] * (columns * rows * 3)
+        best[start_state] = 0
+        previous = {}
+        #ties between equal estimates go to the state furthest along, so open space is crossed without exploring it all
+        queue = [(0, 0, 0, start_state)]
+        while queue:
+            estimate, progress, cost, state = heapq.heappop(queue)
+            if cost > best[state]:
+                continue
+            cell, direction = divmod(state, 3)
+            if cell == end_cell:
+                path = [cell]
+                while state in previous:
+                    state = previous[state]
+                    path.append(state // 3)
+                path.reverse()
+                return path
+            column, row = cell % columns, cell // columns
+            for step, new_direction, inside in ((1, 0, column + 1 < columns), (-1, 0, column > 0),
+                                                (columns, 1, row + 1 < rows), (-columns, 1, row > 0)):
+                if not inside:
+                    continue
+                following = cell + step
+                free = following in own
+                if blocked[following] and not free:
+                    continue
+                new_cost = cost + 1
+                if direction != 2 and direction != new_direction:
+                    new_cost += BEND_COST
+                    if cell not in own and (horizontal[cell] or vertical[cell]):
+                        new_cost += OVERLAP_COST
+                if not free:
+                    along, across = (horizontal, vertical) if new_direction == 0 else (vertical, horizontal)
+                    if along[following]:
+                        new_cost += OVERLAP_COST
+                    elif across[following]:
+                        new_cost += CROSS_COST
+                new_state = following * 3 + new_direction
+                if new_cost < best[new_state]:
+                    best[new_state] = new_cost
+                    previous[new_state] = state
+                    across_columns = abs(following % columns - end_column)
+                    across_rows = abs(following // columns - end_row)
+                    #a path which is not in line with the end needs at least one more corner
+                    heuristic = across_columns + across_rows
+                    if (across_rows if new_direction == 0 else across_columns):
+                        heuristic += BEND_COST
+                    heapq.heappush(queue, (new_cost + heuristic, heuristic, new_cost, new_state))
+        return None
+
+    #cells of a horizontal then vertical path between two cells, ignoring everything in the way
+    def straight_cells(self, start_cell, end_cell):
+        columns = self.columns
+        row = start_cell // columns
+        step = 1 if end_cell % columns >= start_cell % columns else -1
+        cells = [row * columns + column for column in range(start_cell % columns, end_cell % columns + step, step)]
+        step = columns if end_cell // columns >= row else -columns
+        cells.extend(range(cells[-1] + step, end_cell + step, step))
+        return cells
+
+    #turns the cells of a path into the corners of the wire. The first and last lines are moved off the grid to start
+    #and end exactly at the centres of the components, keeping every line horizontal or vertical
+    def points(self, cells, start, end):
+        columns, grid = self.columns, self.grid
+        corners = [cells[0]]
+        for before, cell, after in zip(cells, cells[1:], cells[2:]):
+            if cell - before != after - cell:
+                corners.append(cell)
+        if cells[-1] != cells[0]:
+            corners.append(cells[-1])
+        points = [[cell % columns * grid, cell // columns * grid] for cell in corners]
+        if len(points) < 3:
+            #a straight path gets a corner in the middle, so it can join two points which are not in line
+            (x1, y1), (x2, y2) = start, end
+            if len(points) == 2 and points[0][1] == points[1][1]:
+                middle = (x1 + x2) / 2
+                return [(x1, y1), (middle, y1), (middle, y2), (x2, y2)]
+            middle = (y1 + y2) / 2
+            return [(x1, y1), (x1, middle), (x2, middle), (x2, y2)]
+        #the second and second to last corners follow the ends along the line which joins them
+        for end_index, next_index, point in ((0, 1, start), (-1, -2, end)):
+            if points[end_index][1] == points[next_index][1]:
+                points[next_index][1] = point[1]
+            else:
+                points[next_index][0] = point[0]
+            points[end_index] = list(point)
+        return [tuple(point) for point in points]
+
+    #removes everything from the grid
+    def clear(self):
+        size = self.columns * self.rows
+        self.blocked = [0] * size
+        self.horizontal = [0] * size
+        self.vertical = [0] * size
+        self.cell_nets.clear()
+        self.boxes.clear()
+        self.nets.clear()
+
+
+#returns the lines (x1, y1, x2, y2) joining the corners of a wire, leaving out any of zero length
+def segments(points):
+    return [(x1, y1, x2, y2) for (x1, y1), (x2, y2) in zip(points, points[1:]) if (x1, y1) != (x2, y2)]
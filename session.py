@@ -0,0 +1,123 @@
+#session.py purpose: keeps a circuit's netlist, topology and factorised MNA matrix between simulations so that changing
+#the value of one component does not rebuild everything.
+#   - a topology change (components added or removed, wires changed, a switch toggled) rebuilds and refactorises
+#   - a battery voltage or current source change only changes the right-hand side, so the existing factorisation is re-used
+#   - a resistance change is a rank-one update of the matrix, which the solver applies to its existing factorisation
+#     (see MNASolver.set_resistance), so the session's solver always solves with the current values
+#   - a circuit which was simulated before is looked up in the solve cache, if the session has one, and is only
+#     factorised if its values are changed afterwards
+#   - a circuit with lightbulbs or diodes is solved with Newton's method starting from its last operating point, so
+#     small changes converge in a few iterations
+#It does not need tkinter, so it can be used by headless code as well as by the Simulate window.
+from canonical import canonical_form
+from solver import Netlist, MNASolver, RESISTIVE_KINDS, SOURCE_KINDS
+from solvecache import Analysis
+from topology import Topology
+import tracing
+
+
+#returns everything about a circuit which changes the shape of the MNA matrix: the wires, the kind of every component
+#and whether every switch is on. Values of resistors and batteries are left out
+def structure_of(graph, components):
+    wires = tuple(sorted((int(key), tuple(str(value) for value in values)) for key, values in graph.items()))
+    parts = tuple(sorted((ID, kind, bool(value) if kind == "switch" else None) for ID, (kind, value) in components.items()))
+    return wires, parts
+
+
+#SimulationSession class purpose: holds the analysis of the last simulated circuit and re-solves it incrementally
+class SimulationSession:
+    def __init__(self, cache=None):
+        self.cache = cache #optional solvecache.SolveCache, which can be shared by several sessions
+        self.structure = None
+        self.netlist = None
+        self.topology = None
+        self.form = None #canonical form of the netlist, only worked out when there is a cache
+        self.analysis = None #solvecache.Analysis of the circuit, with the result of the last solve
+        self._solver = None
+        self.result = None
+        #counters showing how each simulation was done
+        self.rebuilds = 0
+        self.updates = 0
+        self._reset_sources()
+
+    def _reset_sources(self):
+        self.sources = {} #source ID: [ID, node a, node b, voltage or current] entry of the solver
+        if self._solver is not None:
+            self.sources = {source[0]: source for source in self._solver.sources + self._solver.current_sources}
+
+    #the MNASolver of the circuit. A circuit found in the cache is only factorised when the solver is first needed
+    @property
+    def solver(self):
+        if self._solver is None and self.netlist is not None:
+            self._solver = MNASolver(self.netlist)
+            self._reset_sources()
+        return self._solver
+
+    #simulates a circuit from the graph dictionary made by WireGeneration and the components as {ID: (kind, value)}.
+    #Only the parts which changed since the last call are recalculated. Returns a solver.SolveResult,
+    #and the topology of the circuit is in self.analysis
+    @tracing.traced("session.update")
+    def update(self, graph, components):
+        structure = structure_of(graph, components)
+        if structure != self.structure:
+            self.rebuild(graph, components)
+            self.structure = structure
+            if self.analysis is not None:
+                self.result = self.analysis.result #found in the cache
+                return self.result
+            self.analysis = Analysis.from_topology(self.topology, self.solve())
+            if self.cache is not None:
+                self.cache.put(self.form, self.analysis)
+            return self.result
+        changed = False
+        for ID, (kind, value) in components.items():
+            if self.netlist.components[ID][1] != value:
+                self.set_value(ID, value)
+                changed = True
+        if changed or self.result is None:
+            return self.solve()
+        return self.result
+
+    #builds the netlist and topology from scratch, then looks the circuit up in the cache or factorises it
+    @tracing.traced("session.rebuild")
+    def rebuild(self, graph, components):
+        self.structure = None #left unset if building fails so the next update tries again
+        self.netlist = Netlist.from_graph(graph, dict(components))
+        self.topology = Topology(self.netlist)
+        self._solver = None
+        self.analysis = None
+        self.result = None
+        if self.cache is not None:
+            #the battery the topology is analysed across is marked, as another battery would give another analysis
+            self.form = canonical_form(self.netlist, (self.topology.source,))
+            self.analysis = self.cache.get(self.form, self.netlist)
+        if self.analysis is None:
+            self._solver = MNASolver(self.netlist)
+        self._reset_sources()
+        self.rebuilds += 1
+        tracing.count("session.rebuilds")
+
+    #changes the value of one resistor, variable resistor, thermistor or battery without rebuilding the circuit.
+    #Other kinds change the shape of the matrix, so they are refactorised
+    def set_value(self, ID, value):
+        self.solver #factorises a circuit which was found in the cache before its values change
+        kind = self.netlist.components[ID][0]
+        self.netlist.components[ID] = (kind, value)
+        if kind in RESISTIVE_KINDS:
+            self._solver.set_resistance(ID, value)
+        elif kind in SOURCE_KINDS:
+            self.sources[ID][3] = float(value) #only the right-hand side changes
+        else:
+            self._solver = MNASolver(self.netlist)
+            self._reset_sources()
+            self.rebuilds += 1
+        self.updates += 1
+        tracing.count("session.updates")
+
+    #solves the circuit with the current values and returns a solver.SolveResult
+    @tracing.traced("solve.session")
+    def solve(self):
+        self.result = self.solver.solve()
+        if self.analysis is not None:
+            self.analysis.result = self.result
+        return self.result
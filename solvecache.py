@@ -0,0 +1,126 @@
+#solvecache.py purpose: remembers the simulation of every recently simulated circuit so simulating the same circuit again
+#(the same preset loaded twice, or run_circuit toggled off and on) does not solve and analyse it again.
+#Circuits are looked up by their canonical key (see canonical.py), which does not change when components are given other
+#IDs or moved around the canvas. Results are stored with the canonical numbering of components and nodes, and mapped onto
+#the IDs of the circuit which is being simulated when they are found.
+#The cache keeps the CACHE_SIZE most recently used circuits in memory. If a database.Database is given, circuits are
+#also kept in its SOLUTIONS table so they are remembered after the app is closed.
+#hits and misses count how well the cache works, to choose its size.
+import json
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+import tracing
+from solver import SolveResult
+
+CACHE_SIZE = 128 #circuits kept in memory
+CACHE_VERSION = 1 #changing this ignores every stored entry, e.g. when what an entry holds changes
+
+
+#Analysis class purpose: everything Simulate shows about a circuit, from the solver and the topology
+class Analysis:
+    def __init__(self, result, circuit_type, dead, series, cycles):
+        self.result = result #solver.SolveResult
+        self.circuit_type = circuit_type #string from Topology.classify()
+        self.dead = dead #component IDs from Topology.dead_components()
+        self.series = series #component IDs from Topology.series_components()
+        self.cycles = cycles #lists of component IDs from Topology.cycle_basis()
+
+    #analyses a circuit which has just been solved
+    @classmethod
+    def from_topology(cls, topology, result):
+        return cls(result, topology.classify(), topology.dead_components(), topology.series_components(),
+                   topology.cycle_basis())
+
+    #returns the analysis as an entry of the cache, numbered by a canonical.CanonicalForm of its netlist
+    def to_entry(self, form):
+        component = {ID: number for number, ID in enumerate(form.components)}
+        return {
+            "voltages": [float(self.result.node_voltages[node]) for node in form.nodes],
+            "currents": [self.result.branch_currents.get(ID, 0.0) for ID in form.components],
+            "circuit_type": self.circuit_type,
+            "dead": [component[ID] for ID in self.dead],
+            "series": [component[ID] for ID in self.series],
+            "cycles": [[component[ID] for ID in cycle] for cycle in self.cycles],
+        }
+
+    #builds the analysis of a netlist from a cache entry, using the canonical form of that netlist
+    @classmethod
+    def from_entry(cls, entry, form, netlist):
+        node_voltages = np.zeros(netlist.node_count)
+        for node, voltage in zip(form.nodes, entry["voltages"]):
+            node_voltages[node] = voltage
+        branch_currents = {ID: 0.0 for ID in netlist.components}
+        branch_currents.update(zip(form.components, entry["currents"]))
+        result = SolveResult(netlist, node_voltages, branch_currents)
+        return cls(result, entry["circuit_type"], [form.components[number] for number in entry["dead"]],
+                   [form.components[number] for number in entry["series"]],
+                   [sorted(form.components[number] for number in cycle) for cycle in entry["cycles"]])
+
+
+#SolveCache class purpose: least recently used cache of analyses by canonical key, optionally backed by the database
+class SolveCache:
+    def __init__(self, size=CACHE_SIZE, database=None):
+        self.size = size
+        self.database = database
+        self.entries = OrderedDict() #canonical key: entry, least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0 #hits which were read from the database
+
+    #returns the cached Analysis of a netlist with the given canonical form, or None
+    @tracing.traced("cache.lookup")
+    def get(self, form, netlist):
+        with self.lock:
+            entry = self.entries.get(form.key)
+            if entry is not None:
+                self.entries.move_to_end(form.key)
+        if entry is None and self.database is not None:
+            blob = self.database.load_solution(self.stored_key(form.key))
+            if blob is not None:
+                entry = json.loads(zlib.decompress(blob))
+                self.remember(form.key, entry)
+                self.loads += 1
+        if entry is None:
+            self.misses += 1
+            tracing.count("cache.misses")
+            return None
+        self.hits += 1
+        tracing.count("cache.hits")
+        return Analysis.from_entry(entry, form, netlist)
+
+    #stores the Analysis of a netlist with the given canonical form
+    @tracing.traced("cache.store")
+    def put(self, form, analysis):
+        entry = analysis.to_entry(form)
+        self.remember(form.key, entry)
+        if self.database is not None:
+            self.database.save_solution(self.stored_key(form.key), zlib.compress(json.dumps(entry).encode()))
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def stored_key(self, key):
+        return str(CACHE_VERSION) + ":" + key
+
+    #fraction of lookups which were found, to judge whether the cache is big enough
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "loads": self.loads, "entries": len(self.entries),
+                "size": self.size, "hit_rate": self.hit_rate()}
+
+    #empties the memory cache. Entries in the database are kept
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,717 @@
+#solver.py purpose: headless Modified Nodal Analysis (MNA) solver for the circuits made in CircuitMaker.
+#It does not need tkinter, so it can be used without a display. The graph dictionary made by WireGeneration is turned into
+#an electrical netlist (every component is a two-terminal branch between two nodes), then every node voltage and
+#branch current is found by solving one sparse linear system with a single LU factorisation.
+#Changing a resistance is a rank-one update of the matrix. Changed resistances are applied together with the Woodbury
+#formula using the existing factorisation, which is only factorised again when more than MAX_UPDATES build up.
+#Circuits with lightbulbs or diodes are nonlinear, so they are solved with damped Newton-Raphson iterations (see newton()).
+#numpy is used for the arrays and scipy for the sparse matrix and its factorisation.
+from collections import deque
+import numpy as np
+from scipy.sparse import csc_matrix
+from scipy.sparse.linalg import splu
+
+import nonlinear
+import tracing
+
+#components which only have resistance
+RESISTIVE_KINDS = ("resistor", "varesistor", "thermistor")
+#components which are ideal conductors. They are stamped as 0V sources so that their current is part of the solution
+WIRE_KINDS = ("ammeter", "switch")
+#components whose current is not proportional to their potential difference, modelled in the nonlinear module
+NONLINEAR_KINDS = ("lightbulb", "diode")
+#components which drive the circuit. A battery's value is the voltage of terminal a above terminal b, and a current
+#source's value is the current it drives out of terminal a into the circuit
+SOURCE_KINDS = ("battery", "current_source")
+#components which store energy. In a steady (DC) state a capacitor carries no current and an inductor has no potential
+#difference, so they are treated as an open circuit and a wire. The transient module models how they charge
+STORAGE_KINDS = ("capacitor", "inductor")
+
+#Newton-Raphson settings
+MAX_ITERATIONS = 100
+VOLTAGE_TOLERANCE = 1e-9 #iterations stop once no unknown changes by more than this (V or A)...
+RELATIVE_TOLERANCE = 1e-9 #...plus this fraction of the largest unknown
+REUSE_RATIO = 0.25 #the factorisation is kept while every iteration shrinks the change by at least this factor
+
+#number of changed resistances applied as low-rank updates before the matrix is factorised again
+MAX_UPDATES = 8
+
+#value used in the side map when a component is connected across its neighbour ('x' placeholder), meaning both terminals are joined
+BOTH = 2
+
+
+#raised when a circuit cannot be solved, for example when a battery is shorted by a wire
+class CircuitError(Exception):
+    pass
+
+
+#removes the 'x' placeholders from the graph dictionary and turns all keys and neighbours into integers.
+#It also returns the components which only have one neighbour and an 'x' placeholder, which WireGeneration uses to show
+#that the component is connected directly across its neighbour (both terminals wired to it, as in a parallel branch)
+@tracing.traced("graph.clean")
+def clean_graph(graph):
+    #dictionaries keep the order the connections were made in while giving O(1) duplicate checks
+    cleaned = {}
+    doubled = set()
+    for key, values in graph.items():
+        node = int(key)
+        neighbours = cleaned.setdefault(node, {})
+        for value in values:
+            if value == "x":
+                continue
+            value = int(value)
+            if value != node:
+                neighbours[value] = True
+        if "x" in values and len(neighbours) == 1:
+            doubled.add(node)
+    #the graph is undirected, so every connection is made to appear under both keys
+    for node, neighbours in list(cleaned.items()):
+        for neighbour in neighbours:
+            cleaned.setdefault(neighbour, {})[node] = True
+    cleaned = {node: list(neighbours) for node, neighbours in cleaned.items()}
+    #the 'x' only counts while the component still has a single neighbour
+    doubled = {node for node in doubled if len(cleaned[node]) == 1}
+    return cleaned, doubled
+
+
+#decides which terminal (0 for terminal a, 1 for terminal b) of every component each of its wires is connected to.
+#The rules follow how circuits are drawn in CircuitMaker:
+#   - a component with two neighbours has one on each terminal
+#   - a component with three or more neighbours has a junction on one terminal. Two neighbours that are connected to
+#     each other form a loop through the component, so they must be on opposite terminals. Neighbours which are not
+#     constrained join the junction on terminal b
+#   - a component with one neighbour and an 'x' placeholder is connected across that neighbour (BOTH)
+@tracing.traced("graph.sides")
+def assign_sides(graph, doubled):
+    adjacency = {node: set(neighbours) for node, neighbours in graph.items()}
+    sides = {}
+    for node, neighbours in graph.items():
+        if node in doubled:
+            sides[(node, neighbours[0])] = BOTH
+            continue
+        #neighbours connected across this component are joined to both terminals, so they are not split
+        split = []
+        for neighbour in neighbours:
+            if neighbour in doubled:
+                sides[(node, neighbour)] = BOTH
+            else:
+                split.append(neighbour)
+
+        if len(split) <= 2:
+            for side, neighbour in enumerate(split):
+                sides[(node, neighbour)] = side
+            continue
+
+        #two-colours the neighbours with a breadth-first search over the connections between them
+        members = set(split)
+        colour = {}
+        for start in split:
+            if start in colour:
+                continue
+            #the first neighbour defines terminal a, every other unconstrained group starts on the junction terminal b
+            colour[start] = 0 if not colour else 1
+            queue = deque([start])
+            while queue:
+                current = queue.popleft()
+                #the smaller of the two sets is scanned, so a junction with thousands of components stays linear
+                if len(members) < len(adjacency[current]):
+                    connected = [other for other in members if other in adjacency[current]]
+                else:
+                    connected = adjacency[current]
+                for other in connected:
+                    if other in members and other not in colour:
+                        colour[other] = 1 - colour[current]
+                        queue.append(other)
+        for neighbour in split:
+            sides[(node, neighbour)] = colour[neighbour]
+    return sides
+
+
+#Netlist class purpose: electrical description of a circuit. Each component is a branch between node terminals[ID][0]
+#(terminal a, the positive terminal of a battery) and node terminals[ID][1] (terminal b).
+class Netlist:
+    def __init__(self, components, terminals, node_count):
+        self.components = components #dictionary of ID: (kind, value)
+        self.terminals = terminals #dictionary of ID: (node of terminal a, node of terminal b)
+        self.node_count = node_count
+
+    #builds the netlist from the graph dictionary made by WireGeneration and a dictionary of ID: (kind, value)
+    @classmethod
+    @tracing.traced("graph.netlist")
+    def from_graph(cls, graph, components):
+        graph, doubled = clean_graph(graph)
+        sides = assign_sides(graph, doubled)
+
+        #every terminal starts as its own node, then the wires merge terminals into shared nodes using a union-find
+        parent = {}
+
+        def find(terminal):
+            parent.setdefault(terminal, terminal)
+            root = terminal
+            while parent[root] != root:
+                root = parent[root]
+            #path compression keeps later lookups close to O(1)
+            while parent[terminal] != root:
+                parent[terminal], terminal = root, parent[terminal]
+            return root
+
+        def union(first, second):
+            root1, root2 = find(first), find(second)
+            if root1 != root2:
+                parent[root2] = root1
+
+        for node, neighbours in graph.items():
+            for neighbour in neighbours:
+                if neighbour < node:
+                    continue #each undirected connection is only wired once
+                side1 = sides[(node, neighbour)]
+                side2 = sides[(neighbour, node)]
+                if side1 == BOTH or side2 == BOTH:
+                    #connected across each other, so terminal a meets terminal a and terminal b meets terminal b
+                    union((node, 0), (neighbour, 0))
+                    union((node, 1), (neighbour, 1))
+                else:
+                    union((node, side1), (neighbour, side2))
+
+        #numbers the merged nodes from 0 in the order the components are listed
+        node_numbers = {}
+        terminals = {}
+        for ID in sorted(set(components) | set(graph)):
+            pair = []
+            for side in (0, 1):
+                root = find((ID, side))
+                if root not in node_numbers:
+                    node_numbers[root] = len(node_numbers)
+                pair.append(node_numbers[root])
+            terminals[ID] = tuple(pair)
+
+        components = {int(ID): (kind, value) for ID, (kind, value) in components.items()}
+        return cls(components, terminals, len(node_numbers))
+
+
+#totals of the sources of a result, shared by SolveResult and the results of sweeps and transient runs so they all agree.
+#Each works for one solution (node_voltages of shape (nodes,)) or for many (shape (points, nodes), with a branch current
+#array for every component), returning a number or an array with one value per point.
+
+#total power (W) delivered by the batteries and current sources, which is the power used by the rest of the circuit.
+#A source delivering power has current leaving its positive terminal a, which is a negative branch current
+def supply_power(result):
+    power = np.zeros(np.shape(result.node_voltages)[:-1])
+    for ID, (kind, value) in result.netlist.components.items():
+        if kind in SOURCE_KINDS and ID in result.netlist.terminals:
+            power = power - result.branch_voltage(ID) * result.branch_currents.get(ID, 0.0)
+    return power
+
+
+#total potential difference supplied by the sources. Sources joined end to end with nothing else at the joints are in
+#series, so their voltages add or cancel by their polarity, which is the potential difference between the two ends of
+#the chain. Chains which are not in series (e.g. batteries in parallel) are not added together, the largest is used
+def supply_voltage(result):
+    node_voltages = np.asarray(result.node_voltages)
+    voltages = [np.abs(node_voltages[..., start] - node_voltages[..., end]) for start, end in source_chains(result.netlist)]
+    if not voltages:
+        return np.zeros(node_voltages.shape[:-1])
+    return np.max(voltages, axis=0)
+
+
+#total current supplied by the sources, the current which delivers their total power at their total voltage
+def supply_current(result):
+    voltage = supply_voltage(result)
+    power = np.abs(supply_power(result)) * np.ones_like(voltage)
+    return np.divide(power, voltage, out=np.zeros_like(power), where=voltage != 0)
+
+
+#SolveResult class purpose: stores the solution of a circuit so that the caller (e.g. Simulate) only has to display it.
+#Branch currents are signed and flow from terminal a to terminal b through the component.
+class SolveResult:
+    def __init__(self, netlist, node_voltages, branch_currents):
+        self.netlist = netlist
+        self.node_voltages = node_voltages
+        self.branch_currents = branch_currents
+
+    #potential difference across a component, measured from terminal a to terminal b
+    def branch_voltage(self, ID):
+        node_a, node_b = self.netlist.terminals[ID]
+        return float(self.node_voltages[node_a] - self.node_voltages[node_b])
+
+    #power (W) dissipated by a component, e.g. to show how bright a lightbulb is
+    def power(self, ID):
+        return self.branch_voltage(ID) * self.branch_currents.get(ID, 0.0)
+
+    #returns the reading of every ammeter as a dictionary of ID: current (A)
+    def ammeter_readings(self):
+        return {ID: abs(self.branch_currents.get(ID, 0.0)) for ID, (kind, value) in self.netlist.components.items()
+                if kind == "ammeter"}
+
+    #voltmeters are stored as [voltmeter ID, component ID] pairs by WireGeneration. The reading is the potential
+    #difference across the component the voltmeter is connected to
+    def voltmeter_readings(self, voltmeters):
+        readings = {}
+        for voltmeter, component in voltmeters:
+            component = int(component)
+            if component in self.netlist.terminals:
+                readings[int(voltmeter)] = abs(self.branch_voltage(component))
+            else:
+                readings[int(voltmeter)] = 0.0
+        return readings
+
+    #total power (W) delivered by the batteries and current sources (see supply_power)
+    @property
+    def total_power(self):
+        return float(supply_power(self))
+
+    #total potential difference supplied by the sources (see supply_voltage)
+    @property
+    def total_voltage(self):
+        return float(supply_voltage(self))
+
+    #total current supplied by the sources (see supply_current)
+    @property
+    def total_current(self):
+        return float(supply_current(self))
+
+    #equivalent resistance seen by the batteries using R = V / I. An open circuit has no current, so 0 is returned
+    @property
+    def total_resistance(self):
+        if self.total_current == 0:
+            return 0
+        return self.total_voltage / self.total_current
+
+
+#Convergence class purpose: how the Newton-Raphson iterations of the last nonlinear solve went, to find out why a circuit
+#is slow to solve or does not converge
+class Convergence:
+    def __init__(self):
+        self.iterations = 0
+        self.factorisations = 0 #times the matrix was factorised again at a new operating point
+        self.damped = 0 #iterations whose step was shortened to keep a diode from jumping too far
+        self.changes = [] #largest change of any unknown at every iteration
+        self.converged = False
+
+    def __repr__(self):
+        return ("Convergence(" + ("converged" if self.converged else "not converged") + " after " +
+                str(self.iterations) + " iterations, " + str(self.factorisations) + " factorisations, " +
+                str(self.damped) + " damped)")
+
+
+#returns the two end nodes of every chain of sources joined end to end. Two sources are in series when they are the
+#only two components at a node. A loop made only of sources has no ends, so it is left out
+def source_chains(netlist):
+    sources = [ID for ID, (kind, value) in netlist.components.items() if kind in SOURCE_KINDS and ID in netlist.terminals]
+    at_node = {} #node: IDs of the components connected to it
+    for ID, (node_a, node_b) in netlist.terminals.items():
+        at_node.setdefault(node_a, []).append(ID)
+        at_node.setdefault(node_b, []).append(ID)
+    parent = {ID: ID for ID in sources}
+
+    def find(ID):
+        while parent[ID] != ID:
+            parent[ID] = parent[parent[ID]]
+            ID = parent[ID]
+        return ID
+
+    for node, IDs in at_node.items():
+        if len(IDs) == 2 and IDs[0] in parent and IDs[1] in parent:
+            parent[find(IDs[0])] = find(IDs[1])
+    ends = {} #chain: nodes which only one source of the chain is connected to
+    for ID in sources:
+        for node in netlist.terminals[ID]:
+            ends.setdefault(find(ID), set()).symmetric_difference_update({node}) #a joint between two sources cancels out
+    return [tuple(sorted(nodes)) for nodes in ends.values() if len(nodes) == 2]
+
+
+#Superposition class purpose: the part of every node voltage and branch current caused by each source on its own, with
+#every other battery replaced by a wire and every other current source by a gap. The parts add up to the full solution
+class Superposition:
+    def __init__(self, netlist, sources, node_voltages, branch_currents):
+        self.netlist = netlist
+        self.sources = sources #IDs of the sources, in the order of the rows
+        self.node_voltages = node_voltages #array of shape (sources, nodes)
+        self.branch_currents = branch_currents #dictionary of component ID: array with the current caused by every source
+
+    #potential difference across a component caused by every source, measured from terminal a to terminal b
+    def branch_voltage(self, ID):
+        node_a, node_b = self.netlist.terminals[ID]
+        return self.node_voltages[:, node_a] - self.node_voltages[:, node_b]
+
+    #returns the SolveResult of one source acting on its own
+    def contribution(self, source):
+        row = self.sources.index(source)
+        return SolveResult(self.netlist, self.node_voltages[row].copy(),
+                           {ID: float(currents[row]) for ID, currents in self.branch_currents.items()})
+
+    #returns the SolveResult of every source acting together, the sum of the contributions
+    def total(self):
+        return SolveResult(self.netlist, self.node_voltages.sum(axis=0),
+                           {ID: float(currents.sum()) for ID, currents in self.branch_currents.items()})
+
+
+#MNASolver class purpose: stamps the netlist into the MNA matrix, factorises it once and solves for every unknown.
+#The unknowns are the voltage of every node which is not a ground, followed by the current through every voltage source
+#(batteries and ideal conductors). Current sources only add to the right-hand side. One node of every separate part of
+#the circuit is used as the 0V ground.
+#With self_heating=True thermistors are heated by their own power, which makes them nonlinear.
+class MNASolver:
+    def __init__(self, netlist, self_heating=False):
+        self.netlist = netlist
+        self.self_heating = self_heating
+        self.resistors = [] #list of [ID, node a, node b, resistance]
+        self.sources = [] #list of [ID, node a, node b, voltage]
+        self.nonlinear = [] #list of [ID, node a, node b, kind, value, conductance the matrix is factorised with]
+        self.current_sources = [] #list of [ID, node a, node b, current]
+        self.resistor_entries = {} #resistor ID: its entry in self.resistors, so lookups do not scan the list
+        self.factorised = {} #resistor ID: resistance the matrix was factorised with
+        self.changed = {} #resistor ID: change in conductance since the matrix was factorised
+        self.responses = {} #resistor ID: (branch vector, solution of the factorised matrix for it)
+        for ID, (kind, value) in netlist.components.items():
+            node_a, node_b = netlist.terminals[ID]
+            self.add_branch(ID, kind, value, node_a, node_b)
+
+        self.ground = self.find_grounds()
+        #gives every non-ground node which has a branch connected a row in the matrix
+        self.node_index = {}
+        for branch in self.resistors + self.sources + self.nonlinear + self.current_sources:
+            for node in branch[1:3]:
+                if node not in self.ground and node not in self.node_index:
+                    self.node_index[node] = len(self.node_index)
+        self.size = len(self.node_index) + len(self.sources)
+        #position of every node in the solution vector. Ground nodes point to one extra entry on the end which is always 0
+        self.position = np.full(netlist.node_count, self.size, dtype=np.intp)
+        for node, index in self.node_index.items():
+            self.position[node] = index
+        self.operating_point = None #solution of the last nonlinear solve, where the next one starts from
+        self.convergence = None #Convergence of the last nonlinear solve
+        if self.nonlinear:
+            self.nonlinear_arrays()
+        self.lu = self.factorise()
+
+    #adds one component to the resistors or sources which are stamped into the matrix
+    def add_branch(self, ID, kind, value, node_a, node_b):
+        if kind in NONLINEAR_KINDS or (kind == "thermistor" and self.self_heating):
+            if kind == "thermistor" and float(value) <= 0:
+                raise CircuitError("Component " + str(ID) + " must have a positive resistance.")
+            voltage = nonlinear.INITIAL_VOLTAGES.get(kind, 0.0)
+            conductance = nonlinear.evaluate(kind, np.array([voltage]), np.array([float(value or 0)]))[1][0]
+            self.nonlinear.append([ID, node_a, node_b, kind, float(value or 0), float(conductance)])
+        elif kind in RESISTIVE_KINDS:
+            if float(value) <= 0:
+                raise CircuitError("Component " + str(ID) + " must have a positive resistance.")
+            self.resistors.append([ID, node_a, node_b, float(value)])
+            self.resistor_entries[ID] = self.resistors[-1]
+        elif kind == "current_source":
+            self.current_sources.append([ID, node_a, node_b, float(value)])
+        elif kind in SOURCE_KINDS:
+            self.sources.append([ID, node_a, node_b, float(value)])
+        elif kind == "switch" and not value:
+            return #an open switch does not conduct, so it is left out
+        elif kind in WIRE_KINDS or kind == "inductor":
+            self.sources.append([ID, node_a, node_b, 0.0])
+        #capacitors are left out as they do not conduct once charged
+
+    #finds the separate parts of the circuit with a union-find over the branches and picks one ground node in each.
+    #The current of a current source has to return to it through the other branches, so a current source which joins
+    #two parts that are not otherwise connected (e.g. one feeding a dead end) raises CircuitError
+    def find_grounds(self):
+        parent = {}
+
+        def find(node):
+            parent.setdefault(node, node)
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for branch in self.resistors + self.sources + self.nonlinear:
+            root1, root2 = find(branch[1]), find(branch[2])
+            if root1 != root2:
+                parent[max(root1, root2)] = min(root1, root2)
+        for ID, node_a, node_b, current in self.current_sources:
+            if find(node_a) != find(node_b):
+                raise CircuitError("Current source " + str(ID) + " has no return path for its current.")
+        return {node for node in parent if find(node) == node}
+
+    #stamps the conductances and voltage source incidences into a sparse matrix and returns its LU factorisation.
+    #It has the current resistances, so the changes waiting to be applied as low-rank updates are cleared
+    @tracing.traced("solve.factorise")
+    def factorise(self):
+        self.factorised = {resistor[0]: resistor[3] for resistor in self.resistors}
+        self.changed = {}
+        self.responses = {}
+        if self.size == 0:
+            return None
+        rows, cols, values = [], [], []
+
+        def stamp(row, col, value):
+            if row in self.node_index and col in self.node_index:
+                rows.append(self.node_index[row])
+                cols.append(self.node_index[col])
+                values.append(value)
+
+        conductances = [(node_a, node_b, 1 / resistance) for ID, node_a, node_b, resistance in self.resistors]
+        #nonlinear components are stamped as the conductance they were linearised with
+        conductances.extend((entry[1], entry[2], entry[5]) for entry in self.nonlinear)
+        for node_a, node_b, conductance in conductances:
+            stamp(node_a, node_a, conductance)
+            stamp(node_b, node_b, conductance)
+            stamp(node_a, node_b, -conductance)
+            stamp(node_b, node_a, -conductance)
+
+        offset = len(self.node_index)
+        for number, (ID, node_a, node_b, voltage) in enumerate(self.sources):
+            row = offset + number
+            for node, sign in ((node_a, 1.0), (node_b, -1.0)):
+                if node in self.node_index:
+                    rows.extend([self.node_index[node], row])
+                    cols.extend([row, self.node_index[node]])
+                    values.extend([sign, sign])
+
+        #duplicate entries are added together when converting to compressed sparse column format
+        matrix = csc_matrix((values, (rows, cols)), shape=(self.size, self.size))
+        try:
+            return splu(matrix)
+        except RuntimeError:
+            raise CircuitError("Circuit cannot be solved. A battery may be shorted or two meters may form a loop.")
+
+    #builds the right-hand side vector which holds the voltage of every battery and the current of every current source
+    def source_vector(self):
+        rhs = np.zeros(self.size)
+        offset = len(self.node_index)
+        for number, source in enumerate(self.sources):
+            rhs[offset + number] = source[3]
+        for ID, node_a, node_b, current in self.current_sources:
+            if node_a in self.node_index:
+                rhs[self.node_index[node_a]] += current
+            if node_b in self.node_index:
+                rhs[self.node_index[node_b]] -= current
+        return rhs
+
+    #solves for the part of the solution caused by each source on its own, all in one call with one right-hand side
+    #column for every source. sources is a list of battery and current source IDs, every source if it is not given.
+    #Returns a Superposition. Only a linear circuit is the sum of its sources, so lightbulbs and diodes raise CircuitError
+    @tracing.traced("solve.superposition")
+    def superposition(self, sources=None):
+        if self.nonlinear:
+            raise CircuitError("Superposition only applies to circuits without lightbulbs, diodes or self-heating thermistors.")
+        batteries = {source[0]: number for number, source in enumerate(self.sources)
+                     if self.netlist.components[source[0]][0] in SOURCE_KINDS}
+        currents = {source[0]: source for source in self.current_sources}
+        if sources is None:
+            sources = sorted(list(batteries) + list(currents))
+        sources = list(sources)
+        offset = len(self.node_index)
+        columns = np.zeros((self.size + 1, len(sources)))
+        for column, ID in enumerate(sources):
+            if ID in batteries:
+                columns[offset + batteries[ID], column] = self.sources[batteries[ID]][3]
+            elif ID in currents:
+                entry = currents[ID]
+                columns[self.position[entry[1]], column] += entry[3]
+                columns[self.position[entry[2]], column] -= entry[3]
+            else:
+                raise ValueError("Component " + str(ID) + " is not a battery or current source.")
+        solutions = np.zeros((self.size + 1, len(sources)))
+        if self.lu is not None and sources:
+            solutions[:self.size] = self.lu_solve(columns[:self.size])
+            if not np.all(np.isfinite(solutions)):
+                raise CircuitError("Circuit cannot be solved. A battery may be shorted or two meters may form a loop.")
+
+        node_voltages = solutions[self.position].T
+        branch_currents = {ID: np.zeros(len(sources)) for ID in self.netlist.components}
+        for number, source in enumerate(self.sources):
+            branch_currents[source[0]] = solutions[offset + number].copy()
+        if self.resistors:
+            node_a, node_b, resistance = (np.array(column) for column in list(zip(*self.resistors))[1:])
+            resistor_currents = (node_voltages[:, node_a] - node_voltages[:, node_b]) / resistance
+            for number, resistor in enumerate(self.resistors):
+                branch_currents[resistor[0]] = resistor_currents[:, number]
+        for column, ID in enumerate(sources):
+            if ID in currents:
+                branch_currents[ID][column] = -currents[ID][3]
+        return Superposition(self.netlist, sources, node_voltages, branch_currents)
+
+    #solves the factorised system and returns a SolveResult
+    def solve(self):
+        solution = None
+        if self.lu is not None:
+            if self.nonlinear:
+                #Newton's method needs the matrix with the current resistances
+                if self.changed:
+                    self.refactorise()
+                solution = self.newton(self.source_vector())
+            else:
+                solution = self.lu_solve(self.source_vector())
+        return self.result_from_solution(solution)
+
+    #solves the matrix with the current resistances for a right-hand side vector, or a matrix with one right-hand side
+    #in every column. Resistances changed since the matrix was factorised are applied with the Woodbury formula for
+    #A + U D U^T, where U holds the branch vectors of the changed resistors and D their changes in conductance:
+    #x = x0 - Z (I + D U^T Z)^-1 D U^T x0, with x0 = A^-1 b and Z = A^-1 U from the existing factorisation
+    def lu_solve(self, rhs):
+        solution = self.lu.solve(rhs)
+        if not self.changed:
+            return solution
+        changed = list(self.changed)
+        for ID in changed:
+            if ID not in self.responses:
+                vector = self.branch_vector(ID)
+                self.responses[ID] = (vector, self.lu.solve(vector))
+        vectors = np.column_stack([self.responses[ID][0] for ID in changed])
+        responses = np.column_stack([self.responses[ID][1] for ID in changed])
+        deltas = np.array([self.changed[ID] for ID in changed])
+        small = np.eye(len(changed)) + deltas[:, np.newaxis] * (vectors.T @ responses)
+        projected = vectors.T @ solution
+        scaled = deltas[:, np.newaxis] * projected if projected.ndim == 2 else deltas * projected
+        try:
+            correction = np.linalg.solve(small, scaled)
+        except np.linalg.LinAlgError:
+            raise CircuitError("Circuit cannot be solved. A battery may be shorted or two meters may form a loop.")
+        return solution - responses @ correction
+
+    #changes the resistance of a resistor, variable resistor or thermistor without factorising the matrix again. The
+    #change is applied by lu_solve, and the matrix is factorised again once more than MAX_UPDATES resistances have changed
+    def set_resistance(self, ID, resistance):
+        if float(resistance) <= 0:
+            raise CircuitError("Component " + str(ID) + " must have a positive resistance.")
+        self.resistor_entry(ID)[3] = float(resistance)
+        delta = 1 / float(resistance) - 1 / self.factorised[ID]
+        if delta == 0:
+            self.changed.pop(ID, None)
+        else:
+            self.changed[ID] = delta
+        if len(self.changed) > MAX_UPDATES:
+            self.refactorise()
+
+    #factorises the matrix again with the current resistances, clearing the low-rank updates
+    def refactorise(self):
+        self.lu = self.factorise()
+        tracing.count("solve.refactorisations")
+
+    #numpy arrays of the nonlinear components used by every Newton iteration: their kinds, values and the positions of
+    #their nodes in the solution vector
+    def nonlinear_arrays(self):
+        self.nonlinear_a = self.position[[entry[1] for entry in self.nonlinear]]
+        self.nonlinear_b = self.position[[entry[2] for entry in self.nonlinear]]
+        self.nonlinear_values = np.array([entry[4] for entry in self.nonlinear])
+        self.nonlinear_groups = {} #kind: indices of the nonlinear components of that kind
+        for number, entry in enumerate(self.nonlinear):
+            self.nonlinear_groups.setdefault(entry[3], []).append(number)
+
+    #currents and conductances of every nonlinear component for an array of their potential differences
+    def nonlinear_currents(self, voltages):
+        currents = np.zeros(len(self.nonlinear))
+        conductances = np.zeros(len(self.nonlinear))
+        for kind, group in self.nonlinear_groups.items():
+            currents[group], conductances[group] = nonlinear.evaluate(kind, voltages[group], self.nonlinear_values[group])
+        return currents, conductances
+
+    #solves a circuit with nonlinear components for the right-hand side rhs with damped Newton-Raphson iterations.
+    #Every nonlinear component is replaced by the conductance it is factorised with in parallel with a current source
+    #making up the difference to its real current, and the linear system is solved again until nothing changes.
+    #The factorisation (the Jacobian) is re-used while the iterations converge quickly, and the matrix is only
+    #factorised again at the newest operating point when they slow down, so a warm start usually needs no factorisation.
+    #Returns the solution vector and keeps a Convergence in self.convergence
+    @tracing.traced("solve.newton")
+    def newton(self, rhs):
+        convergence = Convergence()
+        self.convergence = convergence
+        rhs = np.append(rhs, 0.0)
+        solution = self.operating_point if self.operating_point is not None else np.zeros(self.size + 1)
+        previous = None
+        for iteration in range(MAX_ITERATIONS):
+            voltages = solution[self.nonlinear_a] - solution[self.nonlinear_b]
+            if iteration == 0 and self.operating_point is None:
+                #a cold start is linearised where every component is assumed to start, e.g. a diode at 0.6V
+                voltages = np.array([nonlinear.INITIAL_VOLTAGES.get(entry[3], 0.0) for entry in self.nonlinear])
+            currents, conductances = self.nonlinear_currents(voltages)
+            factorised = np.array([entry[5] for entry in self.nonlinear])
+            injected = currents - factorised * voltages
+            total = rhs - np.bincount(self.nonlinear_a, injected, minlength=self.size + 1) \
+                + np.bincount(self.nonlinear_b, injected, minlength=self.size + 1)
+            step = np.zeros(self.size + 1)
+            step[:self.size] = self.lu.solve(total[:self.size]) - solution[:self.size]
+            if not np.all(np.isfinite(step)):
+                break
+
+            #damping shortens the whole step so that no diode moves further than limit_change allows
+            changes = (solution + step)[self.nonlinear_a] - (solution + step)[self.nonlinear_b] - voltages
+            fraction = 1.0
+            for kind, group in self.nonlinear_groups.items():
+                limited = nonlinear.limit_change(kind, voltages[group], changes[group])
+                shortened = np.abs(limited) < np.abs(changes[group])
+                if np.any(shortened):
+                    fraction = min(fraction, float(np.min(limited[shortened] / changes[group][shortened])))
+            if fraction < 1.0:
+                convergence.damped += 1
+            solution = solution + fraction * step
+            change = float(np.max(np.abs(fraction * step))) if self.size else 0.0
+            convergence.iterations += 1
+            convergence.changes.append(change)
+            if fraction == 1.0 and change <= VOLTAGE_TOLERANCE + RELATIVE_TOLERANCE * float(np.max(np.abs(solution))):
+                convergence.converged = True
+                break
+
+            #a full Newton step from the newest operating point when the re-used factorisation converges too slowly
+            if fraction < 1.0 or (previous is not None and change > REUSE_RATIO * previous):
+                voltages = solution[self.nonlinear_a] - solution[self.nonlinear_b]
+                for entry, conductance in zip(self.nonlinear, self.nonlinear_currents(voltages)[1]):
+                    entry[5] = float(conductance)
+                self.lu = self.factorise()
+                convergence.factorisations += 1
+            previous = change
+
+        tracing.count("solve.newton_iterations", convergence.iterations)
+        if not convergence.converged:
+            self.operating_point = None
+            raise CircuitError("Circuit did not converge after " + str(convergence.iterations) + " iterations.")
+        self.operating_point = solution
+        return solution[:self.size]
+
+    #turns a solution vector of the MNA system into a SolveResult
+    @tracing.traced("solve.result")
+    def result_from_solution(self, solution):
+        node_voltages = np.zeros(self.netlist.node_count)
+        branch_currents = {ID: 0.0 for ID in self.netlist.components}
+        if solution is not None:
+            if not np.all(np.isfinite(solution)):
+                raise CircuitError("Circuit cannot be solved. A battery may be shorted or two meters may form a loop.")
+            for node, index in self.node_index.items():
+                node_voltages[node] = solution[index]
+            offset = len(self.node_index)
+            for number, source in enumerate(self.sources):
+                branch_currents[source[0]] = float(solution[offset + number])
+        #a current source drives its current out of terminal a, so its branch current is negative
+        for ID, node_a, node_b, current in self.current_sources:
+            branch_currents[ID] = -current
+        for ID, node_a, node_b, resistance in self.resistors:
+            branch_currents[ID] = float((node_voltages[node_a] - node_voltages[node_b]) / resistance)
+        if self.nonlinear:
+            voltages = np.array([node_voltages[entry[1]] - node_voltages[entry[2]] for entry in self.nonlinear])
+            for entry, current in zip(self.nonlinear, self.nonlinear_currents(voltages)[0]):
+                branch_currents[entry[0]] = float(current)
+        return SolveResult(self.netlist, node_voltages, branch_currents)
+
+    #returns the vector which connects a branch to its nodes in the matrix (+1 at node a, -1 at node b). Changing the
+    #conductance of that branch by g changes the matrix by g * vector * vector transposed, which is a rank-one update
+    def branch_vector(self, ID):
+        vector = np.zeros(self.size)
+        node_a, node_b = self.netlist.terminals[ID]
+        if node_a in self.node_index:
+            vector[self.node_index[node_a]] += 1
+        if node_b in self.node_index:
+            vector[self.node_index[node_b]] -= 1
+        return vector
+
+    #returns the current resistance of a resistor, variable resistor or thermistor
+    def resistance(self, ID):
+        return self.resistor_entry(ID)[3]
+
+    #returns the [ID, node a, node b, resistance] entry of a resistor, variable resistor or thermistor
+    def resistor_entry(self, ID):
+        if ID in self.resistor_entries:
+            return self.resistor_entries[ID]
+        raise ValueError("Component " + str(ID) + " is not a resistor, variable resistor or thermistor.")
+
+
+#convenience function to solve a circuit straight from the graph dictionary and the component values
+def solve_circuit(graph, components):
+    return MNASolver(Netlist.from_graph(graph, components)).solve()
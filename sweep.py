@@ -0,0 +1,124 @@
+#sweep.py purpose: headless parameter sweeps, e.g. how every current in a circuit changes with the temperature of a
+#thermistor or the value of a variable resistor.
+#The circuit is factorised once. Changing the resistance of one component only changes the MNA matrix by a rank-one
+#update, so the Sherman-Morrison formula gives the solution for every sweep point from two solves with the solver's
+#factorisation (see MNASolver.lu_solve), evaluated for the whole array of values at once with numpy.
+#Circuits with lightbulbs or diodes are not linear, so they are solved with Newton's method at every point instead,
+#each point starting from the solution of the one before.
+import numpy as np
+
+from components import thermistor_resistance
+from solver import Netlist, MNASolver, supply_current
+
+
+#SweepResult class purpose: holds the solution at every point of a sweep as numpy arrays with one row per point
+class SweepResult:
+    def __init__(self, netlist, values, node_voltages, branch_currents):
+        self.netlist = netlist
+        self.values = values #swept values (temperatures or resistances)
+        self.node_voltages = node_voltages #array of shape (points, nodes)
+        self.branch_currents = branch_currents #dictionary of component ID: array of currents from terminal a to terminal b
+
+    #potential difference across a component at every point, measured from terminal a to terminal b
+    def branch_voltage(self, ID):
+        node_a, node_b = self.netlist.terminals[ID]
+        return self.node_voltages[:, node_a] - self.node_voltages[:, node_b]
+
+    #total current supplied by the sources at every point, defined the same way as SolveResult.total_current
+    @property
+    def total_current(self):
+        return supply_current(self)
+
+    #returns the reading of every ammeter as a dictionary of ID: array of currents (A)
+    def ammeter_readings(self):
+        return {ID: np.abs(self.branch_currents[ID]) for ID, (kind, value) in self.netlist.components.items()
+                if kind == "ammeter"}
+
+    #returns the reading of every voltmeter as a dictionary of ID: array of potential differences (V)
+    def voltmeter_readings(self, voltmeters):
+        readings = {}
+        for voltmeter, component in voltmeters:
+            if int(component) in self.netlist.terminals:
+                readings[int(voltmeter)] = np.abs(self.branch_voltage(int(component)))
+            else:
+                readings[int(voltmeter)] = np.zeros(len(self.values))
+        return readings
+
+
+#solves the circuit for every resistance in resistances (Ω) given to one resistor, variable resistor or thermistor.
+#solver is an MNASolver which has already factorised the circuit, so nothing is rebuilt
+def sweep_resistance(solver, ID, resistances):
+    resistances = np.asarray(resistances, dtype=float)
+    if np.any(resistances <= 0):
+        raise ValueError("Resistances in a sweep must be positive.")
+    if solver.nonlinear:
+        return sweep_nonlinear(solver, ID, resistances)
+    base = solver.resistance(ID)
+    points = len(resistances)
+
+    node_voltages = np.zeros((points, solver.netlist.node_count))
+    branch_currents = {component: np.zeros(points) for component in solver.netlist.components}
+    if solver.lu is not None:
+        #x0 solves the original circuit and z is the response to the swept branch, both from the one factorisation
+        vector = solver.branch_vector(ID)
+        x0 = solver.lu_solve(solver.source_vector())
+        z = solver.lu_solve(vector)
+        #change in conductance at every point and the Sherman-Morrison correction for it
+        delta = 1 / resistances - 1 / base
+        scale = delta * (vector @ x0) / (1 + delta * (vector @ z))
+        solutions = x0[np.newaxis, :] - scale[:, np.newaxis] * z[np.newaxis, :]
+
+        nodes = list(solver.node_index)
+        node_voltages[:, nodes] = solutions[:, [solver.node_index[node] for node in nodes]]
+        offset = len(solver.node_index)
+        for number, source in enumerate(solver.sources):
+            branch_currents[source[0]] = solutions[:, offset + number]
+
+    #a current source drives its current out of terminal a, so its branch current is negative
+    for component, node_a, node_b, current in solver.current_sources:
+        branch_currents[component] = np.full(points, -current)
+    for component, node_a, node_b, resistance in solver.resistors:
+        if component == ID:
+            resistance = resistances
+        branch_currents[component] = (node_voltages[:, node_a] - node_voltages[:, node_b]) / resistance
+    return SweepResult(solver.netlist, resistances, node_voltages, branch_currents)
+
+
+#sweeps a circuit with nonlinear components by solving it again for every resistance. The solver is left with its
+#original resistance
+def sweep_nonlinear(solver, ID, resistances):
+    entry = solver.resistor_entry(ID) #raises ValueError if ID is not a resistor
+    base = entry[3]
+    points = len(resistances)
+    node_voltages = np.zeros((points, solver.netlist.node_count))
+    branch_currents = {component: np.zeros(points) for component in solver.netlist.components}
+    try:
+        for point, resistance in enumerate(resistances):
+            entry[3] = float(resistance)
+            solver.lu = solver.factorise()
+            result = solver.solve()
+            node_voltages[point] = result.node_voltages
+            for component, current in result.branch_currents.items():
+                branch_currents[component][point] = current
+    finally:
+        entry[3] = base
+        solver.lu = solver.factorise()
+    return SweepResult(solver.netlist, resistances, node_voltages, branch_currents)
+
+
+#solves the circuit for every temperature in temperatures (°C) of a thermistor, converting them all at once with the
+#Steinhart-Hart equation. The result's values are the temperatures
+def sweep_thermistor(solver, ID, temperatures):
+    temperatures = np.asarray(temperatures, dtype=float)
+    result = sweep_resistance(solver, ID, thermistor_resistance(temperatures))
+    result.values = temperatures
+    return result
+
+
+#convenience function to sweep a component straight from the graph dictionary and the component values.
+#kind is "temperature" for thermistor temperatures or "resistance" for resistances
+def sweep_circuit(graph, components, ID, values, kind="resistance"):
+    solver = MNASolver(Netlist.from_graph(graph, components))
+    if kind == "temperature":
+        return sweep_thermistor(solver, ID, values)
+    return sweep_resistance(solver, ID, values)
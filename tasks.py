@@ -0,0 +1,122 @@
+#tasks.py purpose: runs slow work such as reading files, parsing circuits and database access on a worker thread so the
+#tkinter window never freezes, e.g. when circuits are kept on a network drive.
+#Only the worker thread does the slow work. The tkinter thread checks on it every POLL_INTERVAL ms with after(), shows its
+#progress and runs the final step (e.g. drawing the loaded circuit), as tkinter must only be used from its own thread.
+#A progress window with a cancel button appears if the work takes longer than SHOW_DELAY ms.
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import Toplevel, Label, Button, messagebox
+from tkinter import ttk
+
+POLL_INTERVAL = 30 #milliseconds between checks on the worker thread
+SHOW_DELAY = 250 #milliseconds before the progress window is shown, so quick work does not flash a window
+CHUNK_SIZE = 64 * 1024 #bytes read at a time by read_file
+
+#worker threads shared by every task
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="circuitsim")
+
+
+#raised inside the work of a task once it has been cancelled
+class Cancelled(Exception):
+    pass
+
+
+#Task class purpose: runs work(task) on a worker thread, then on_done(result) on the tkinter thread.
+#work reports how far it has got with task.progress(), which also stops it with Cancelled once the task is cancelled
+class Task:
+    def __init__(self, widget, title, work, on_done, on_error=None):
+        self.widget = widget #any tkinter widget, used to schedule the checks
+        self.title = title
+        self.on_done = on_done
+        self.on_error = on_error
+        self.updates = queue.Queue() #(fraction done, message) reported by the worker
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.window = None
+        self.started = time.monotonic()
+        self.future = _executor.submit(work, self)
+        self.widget.after(POLL_INTERVAL, self.poll)
+
+    #called by the work on the worker thread. fraction is between 0 and 1
+    def progress(self, fraction, message=""):
+        if self.cancelled.is_set():
+            raise Cancelled()
+        self.updates.put((fraction, message))
+
+    #stops the task. The work stops at its next progress report and its result is never used
+    def cancel(self):
+        self.cancelled.set()
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+
+    #runs on the tkinter thread until the work has finished
+    def poll(self):
+        latest = None
+        while True:
+            try:
+                latest = self.updates.get_nowait()
+            except queue.Empty:
+                break
+        if not self.future.done():
+            if self.window is None and not self.cancelled.is_set() and time.monotonic() - self.started > SHOW_DELAY / 1000:
+                self.window = ProgressWindow(self.title, self.cancel)
+            if self.window is not None and latest is not None:
+                self.window.show(*latest)
+            self.widget.after(POLL_INTERVAL, self.poll)
+            return
+
+        self.finished = True
+        if self.window is not None:
+            self.window.destroy()
+        if self.cancelled.is_set():
+            return
+        error = self.future.exception()
+        if error is None:
+            self.on_done(self.future.result())
+        elif isinstance(error, Cancelled):
+            return
+        elif self.on_error is not None:
+            self.on_error(error)
+        else:
+            messagebox.showerror(self.title + " failed", str(error))
+
+
+#ProgressWindow class purpose: small toplevel window with a progress bar and a cancel button
+class ProgressWindow(Toplevel):
+    def __init__(self, title, on_cancel):
+        super().__init__()
+        self.title(title)
+        self["bg"] = "#1A2421"
+        self.resizable(False, False)
+        self.protocol("WM_DELETE_WINDOW", on_cancel)
+        self.message_label = Label(self, text=title + "...", font=('Rockwell', 10, 'bold'), fg='white', bg="#1A2421")
+        self.message_label.pack(padx=10, pady=5)
+        self.bar = ttk.Progressbar(self, length=250, mode="determinate", maximum=100)
+        self.bar.pack(padx=10, pady=5)
+        Button(self, text="Cancel", font=('Rockwell', 10, 'bold'), fg='white', bg='#7d2c37', command=on_cancel).pack(pady=5)
+
+    def show(self, fraction, message):
+        self.bar["value"] = 100 * fraction
+        if message:
+            self.message_label.config(text=message)
+
+
+#reads a whole file as bytes in chunks on the worker thread, reporting progress between start and end (fractions of the task)
+def read_file(filename, task, start=0.0, end=1.0):
+    with open(filename, "rb") as readfile:
+        readfile.seek(0, 2)
+        size = readfile.tell() or 1
+        readfile.seek(0)
+        chunks = []
+        done = 0
+        while True:
+            chunk = readfile.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            done += len(chunk)
+            task.progress(start + (end - start) * done / size, "Reading " + filename)
+    return b"".join(chunks)
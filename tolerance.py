@@ -0,0 +1,294 @@
+#tolerance.py purpose: Monte Carlo tolerance analysis, showing how much the meter readings of a circuit can vary when its
+#resistors and batteries are real parts within a tolerance (e.g. 5% resistors) instead of their exact values.
+#Every sample draws a random value for each resistor and battery and solves the circuit again. Samples are solved in
+#batches of CHUNK_SIZE: the MNA matrices of a whole batch are stamped at once with one sparse product and solved
+#together with numpy's batched dense solver. Runs of PARALLEL_SAMPLES or more are split across a pool of worker
+#processes, each with its own independent random stream so results are the same for the same seed and number of workers.
+#For every ammeter and voltmeter the mean, standard deviation, percentiles and a histogram are reported.
+#
+#usage: python tolerance.py FILE [-n SAMPLES] [--tolerance 0.05] [--distribution normal|uniform] [--seed N] [-o OUT.json]
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from solver import MNASolver, CircuitError
+import tracing
+
+DISTRIBUTIONS = ("normal", "uniform")
+#tolerance given to every component of a kind unless another one is chosen, as a fraction of its value
+DEFAULT_TOLERANCES = {"resistor": 0.05, "varesistor": 0.05, "thermistor": 0.05, "battery": 0.02}
+#a normal distribution has this many standard deviations inside its tolerance. Values outside it are clipped, as parts
+#outside their tolerance are rejected by the manufacturer
+SIGMAS = 3.0
+CHUNK_SIZE = 2000 #samples solved together in one batched solve
+PARALLEL_SAMPLES = 20000 #runs with at least this many samples are split across worker processes
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+HISTOGRAM_BINS = 20
+
+
+#MeterStatistics class purpose: summary of the readings of one meter over every sample
+class MeterStatistics:
+    def __init__(self, readings):
+        self.mean = float(np.mean(readings))
+        self.std = float(np.std(readings))
+        self.percentiles = {percentile: float(value) for percentile, value in
+                            zip(PERCENTILES, np.percentile(readings, PERCENTILES))}
+        counts, edges = np.histogram(readings, bins=HISTOGRAM_BINS)
+        self.histogram = (counts, edges) #number of samples in every bin, and the HISTOGRAM_BINS + 1 bin edges
+
+    def to_dict(self):
+        return {"mean": self.mean, "std": self.std,
+                "percentiles": {str(percentile): value for percentile, value in self.percentiles.items()},
+                "histogram": {"counts": self.histogram[0].tolist(), "edges": self.histogram[1].tolist()}}
+
+
+#ToleranceResult class purpose: the meter readings of every sample, as arrays with one entry per sample
+class ToleranceResult:
+    def __init__(self, samples, tolerances, ammeters, voltmeters):
+        self.samples = samples
+        self.tolerances = tolerances #dictionary of component ID: (distribution, tolerance) which was used
+        self.ammeters = ammeters #dictionary of ammeter ID: array of currents (A)
+        self.voltmeters = voltmeters #dictionary of voltmeter ID: array of potential differences (V)
+
+    #returns {"ammeters": {ID: MeterStatistics}, "voltmeters": {ID: MeterStatistics}}
+    def statistics(self):
+        return {"ammeters": {ID: MeterStatistics(readings) for ID, readings in self.ammeters.items()},
+                "voltmeters": {ID: MeterStatistics(readings) for ID, readings in self.voltmeters.items()}}
+
+    def to_dict(self):
+        return {
+            "samples": self.samples,
+            "tolerances": {str(ID): list(tolerance) for ID, tolerance in self.tolerances.items()},
+            **{meters: {str(ID): summary.to_dict() for ID, summary in statistics.items()}
+               for meters, statistics in self.statistics().items()},
+        }
+
+
+#returns the distribution and tolerance of every component which varies, as {ID: (distribution, tolerance)}.
+#Every resistor, variable resistor, thermistor and battery gets the tolerance of its kind from DEFAULT_TOLERANCES,
+#or tolerance if it is given. overrides sets {ID: (distribution, tolerance)} for single components
+def tolerances_for(netlist, tolerance=None, distribution="normal", overrides=None):
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError("Unknown distribution " + repr(distribution) + ".")
+    tolerances = {}
+    for ID, (kind, value) in netlist.components.items():
+        if kind in DEFAULT_TOLERANCES and ID in netlist.terminals:
+            tolerances[ID] = (distribution, DEFAULT_TOLERANCES[kind] if tolerance is None else float(tolerance))
+    tolerances.update(overrides or {})
+    for ID, (kind, fraction) in tolerances.items():
+        if kind not in DISTRIBUTIONS:
+            raise ValueError("Unknown distribution " + repr(kind) + " for component " + str(ID) + ".")
+        if not 0 <= fraction < 1:
+            raise ValueError("The tolerance of component " + str(ID) + " must be at least 0 and less than 1.")
+    return tolerances
+
+
+#draws count random values for every component in tolerances. Returns {ID: array of values}
+def sample_values(netlist, tolerances, count, generator):
+    values = {}
+    for ID, (distribution, tolerance) in sorted(tolerances.items()):
+        nominal = float(netlist.components[ID][1])
+        if distribution == "uniform":
+            spread = generator.uniform(-1.0, 1.0, count)
+        else:
+            spread = np.clip(generator.standard_normal(count) / SIGMAS, -1.0, 1.0)
+        values[ID] = nominal * (1 + tolerance * spread)
+    return values
+
+
+#BatchSolver class purpose: stamps and solves the MNA matrices of many samples of one circuit at once
+class BatchSolver:
+    def __init__(self, netlist, voltmeters=()):
+        self.solver = MNASolver(netlist)
+        self.netlist = netlist
+        self.voltmeters = [(int(voltmeter), int(component)) for voltmeter, component in voltmeters]
+        solver = self.solver
+        size = solver.size
+        self.size = size
+
+        #every resistor adds its conductance to four entries of the flattened matrix, so the matrices of a whole batch are
+        #the batch's conductances multiplied by the sparse (resistors x entries) matrix self.stamps
+        rows, cols, signs = [], [], []
+        for number, (ID, node_a, node_b, resistance) in enumerate(solver.resistors):
+            for row, col, sign in ((node_a, node_a, 1.0), (node_b, node_b, 1.0), (node_a, node_b, -1.0), (node_b, node_a, -1.0)):
+                if row in solver.node_index and col in solver.node_index:
+                    rows.append(number)
+                    cols.append(solver.node_index[row] * size + solver.node_index[col])
+                    signs.append(sign)
+        self.stamps = csr_matrix((signs, (rows, cols)), shape=(len(solver.resistors), size * size))
+        #the voltage source incidences are the same for every sample
+        self.constant = np.zeros((size, size))
+        offset = len(solver.node_index)
+        for number, (ID, node_a, node_b, voltage) in enumerate(solver.sources):
+            for node, sign in ((node_a, 1.0), (node_b, -1.0)):
+                if node in solver.node_index:
+                    self.constant[solver.node_index[node], offset + number] += sign
+                    self.constant[offset + number, solver.node_index[node]] += sign
+
+    #solves count samples. values is {ID: array of count values} for the components which vary, the others keep their
+    #value. Returns the solution vectors as an array of shape (count, size + 1), with a 0 for the ground on the end
+    def solve(self, values, count):
+        solver = self.solver
+        conductances = np.empty((count, len(solver.resistors)))
+        for number, (ID, node_a, node_b, resistance) in enumerate(solver.resistors):
+            conductances[:, number] = 1 / values[ID] if ID in values else 1 / resistance
+        matrices = (self.stamps.T @ conductances.T).T.reshape(count, self.size, self.size) + self.constant
+        rhs = np.zeros((count, self.size))
+        offset = len(solver.node_index)
+        for number, (ID, node_a, node_b, voltage) in enumerate(solver.sources):
+            rhs[:, offset + number] = values[ID] if ID in values else voltage
+        for ID, node_a, node_b, current in solver.current_sources:
+            if node_a in solver.node_index:
+                rhs[:, solver.node_index[node_a]] += current
+            if node_b in solver.node_index:
+                rhs[:, solver.node_index[node_b]] -= current
+        solutions = np.zeros((count, self.size + 1))
+        try:
+            solutions[:, :self.size] = np.linalg.solve(matrices, rhs[:, :, np.newaxis])[:, :, 0]
+        except np.linalg.LinAlgError:
+            raise CircuitError("Circuit cannot be solved. A battery may be shorted or two meters may form a loop.")
+        return solutions
+
+    #returns the readings of every ammeter and voltmeter for count samples as ({ID: currents}, {ID: voltages})
+    def readings(self, values, count):
+        solver = self.solver
+        if solver.nonlinear:
+            solutions = self.solve_nonlinear(values, count)
+        else:
+            solutions = self.solve(values, count)
+        ammeters = {}
+        offset = len(solver.node_index)
+        for number, source in enumerate(solver.sources):
+            if self.netlist.components[source[0]][0] == "ammeter":
+                ammeters[source[0]] = np.abs(solutions[:, offset + number])
+        for ID, (kind, value) in self.netlist.components.items():
+            if kind == "ammeter" and ID not in ammeters:
+                ammeters[ID] = np.zeros(count) #an ammeter in an open part of the circuit
+        voltmeters = {}
+        for voltmeter, component in self.voltmeters:
+            if component in self.netlist.terminals:
+                node_a, node_b = self.netlist.terminals[component]
+                voltmeters[voltmeter] = np.abs(solutions[:, solver.position[node_a]] - solutions[:, solver.position[node_b]])
+            else:
+                voltmeters[voltmeter] = np.zeros(count)
+        return ammeters, voltmeters
+
+    #circuits with lightbulbs or diodes have to be solved one sample at a time with Newton's method
+    def solve_nonlinear(self, values, count):
+        solver = self.solver
+        entries = {entry[0]: entry for entry in solver.resistors + solver.sources}
+        nominal = {ID: entries[ID][3] for ID in values}
+        solutions = np.zeros((count, self.size + 1))
+        try:
+            for sample in range(count):
+                for ID in values:
+                    entries[ID][3] = float(values[ID][sample])
+                solver.lu = solver.factorise()
+                solver.solve()
+                solutions[sample] = solver.operating_point
+        finally:
+            for ID, value in nominal.items():
+                entries[ID][3] = value
+        return solutions
+
+
+#solves count samples of a circuit with the random stream seeded by seed, in batches of CHUNK_SIZE.
+#Runs in the worker processes, so everything it needs is passed to it
+def run_samples(netlist, voltmeters, tolerances, count, seed):
+    batch = BatchSolver(netlist, voltmeters)
+    generator = np.random.default_rng(seed)
+    ammeters, voltmeters = {}, {}
+    for start in range(0, count, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, count - start)
+        chunk_ammeters, chunk_voltmeters = batch.readings(sample_values(netlist, tolerances, size, generator), size)
+        for readings, chunk in ((ammeters, chunk_ammeters), (voltmeters, chunk_voltmeters)):
+            for ID, values in chunk.items():
+                readings.setdefault(ID, []).append(values)
+    return ({ID: np.concatenate(parts) for ID, parts in ammeters.items()},
+            {ID: np.concatenate(parts) for ID, parts in voltmeters.items()})
+
+
+#runs a Monte Carlo tolerance analysis of a solver.Netlist and returns a ToleranceResult.
+#voltmeters are [voltmeter ID, component ID] pairs, as made by WireGeneration. tolerances is {ID: (distribution,
+#tolerance)} from tolerances_for(), the defaults if it is not given. Runs of PARALLEL_SAMPLES or more samples use
+#workers processes (one per CPU if it is not given). progress is called with the fraction done, if it is given
+@tracing.traced("tolerance.analysis")
+def tolerance_analysis(netlist, voltmeters=(), samples=10000, tolerances=None, seed=None, workers=None, progress=None):
+    if samples < 1:
+        raise ValueError("At least one sample is needed.")
+    if tolerances is None:
+        tolerances = tolerances_for(netlist)
+    voltmeters = [(int(voltmeter), int(component)) for voltmeter, component in voltmeters]
+    workers = workers or os.cpu_count() or 1
+    #every part of the run has its own random stream spawned from the seed, so the same seed gives the same result
+    parts = workers * 4 if samples >= PARALLEL_SAMPLES and workers > 1 else max(1, -(-samples // (CHUNK_SIZE * 8)))
+    counts = [samples // parts + (1 if number < samples % parts else 0) for number in range(parts)]
+    seeds = np.random.SeedSequence(seed).spawn(parts)
+
+    results = [None] * parts
+    if parts > 1 and samples >= PARALLEL_SAMPLES and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_samples, netlist, voltmeters, tolerances, count, part_seed): number
+                       for number, (count, part_seed) in enumerate(zip(counts, seeds))}
+            for done, future in enumerate(as_completed(futures)):
+                results[futures[future]] = future.result()
+                if progress is not None:
+                    progress((done + 1) / parts)
+    else:
+        for number, (count, part_seed) in enumerate(zip(counts, seeds)):
+            results[number] = run_samples(netlist, voltmeters, tolerances, count, part_seed)
+            if progress is not None:
+                progress((number + 1) / parts)
+
+    ammeters = {ID: np.concatenate([result[0][ID] for result in results]) for ID in results[0][0]}
+    voltmeter_readings = {ID: np.concatenate([result[1][ID] for result in results]) for ID in results[0][1]}
+    return ToleranceResult(samples, tolerances, ammeters, voltmeter_readings)
+
+
+#prints a table with the mean, standard deviation and 5th to 95th percentile of every meter
+def print_summary(result, outfile=sys.stdout):
+    print("meter".ljust(12), "mean".rjust(12), "std".rjust(12), "5%".rjust(12), "95%".rjust(12), file=outfile)
+    for meters, unit in (("ammeters", "A"), ("voltmeters", "V")):
+        for ID, summary in result.statistics()[meters].items():
+            print((meters[0].upper() + str(ID) + " (" + unit + ")").ljust(12), *(format(value, ".6g").rjust(12) for value in
+                  (summary.mean, summary.std, summary.percentiles[5], summary.percentiles[95])), file=outfile)
+
+
+def main(argv=None):
+    from circuitfile import CircuitFileError
+    from circuitsim import load_circuit
+    from solver import Netlist
+    parser = argparse.ArgumentParser(description="Monte Carlo tolerance analysis of a saved circuit.")
+    parser.add_argument("path", help="circuit JSON or .csim file")
+    parser.add_argument("-n", "--samples", type=int, default=10000)
+    parser.add_argument("-t", "--tolerance", type=float, help="tolerance of every resistor and battery, e.g. 0.05 for 5%%"
+                                                             " (default: 5%% resistors, 2%% batteries)")
+    parser.add_argument("-d", "--distribution", choices=DISTRIBUTIONS, default="normal")
+    parser.add_argument("-s", "--seed", type=int, help="seed of the random numbers, to repeat a run")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-o", "--output", help="JSON file to write the statistics and histograms to")
+    args = parser.parse_args(argv)
+
+    try:
+        graph, store, voltmeters = load_circuit(args.path)
+        netlist = Netlist.from_graph(graph, store.solver_components())
+        tolerances = tolerances_for(netlist, args.tolerance, args.distribution)
+        result = tolerance_analysis(netlist, voltmeters, args.samples, tolerances, args.seed, args.workers)
+    except (OSError, ValueError, KeyError, TypeError, CircuitError, CircuitFileError) as error:
+        print("Circuit cannot be analysed:", type(error).__name__ + ": " + str(error), file=sys.stderr)
+        return 1
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(result.to_dict(), outfile, indent=2)
+            outfile.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
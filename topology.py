@@ -0,0 +1,282 @@
+#topology.py purpose: headless analysis of the shape of a circuit, used by Simulate to name the circuit type and to find
+#components in series and parallel branches.
+#It works on the electrical netlist made by solver.Netlist, where every component is an edge between two nodes.
+#Every method is iterative and runs in linear time, so long series chains cannot reach Python's recursion limit:
+#   - a fundamental cycle basis is found from a breadth-first spanning forest
+#   - the part of the circuit across the battery is broken down into series and parallel groups by repeatedly merging
+#     two components which meet at a node with nothing else connected (series) and components which share both
+#     nodes (parallel)
+from collections import deque
+
+import tracing
+from solver import Netlist, SOURCE_KINDS
+
+
+#Topology class purpose: holds the multigraph of a netlist and answers questions about its structure
+class Topology:
+    def __init__(self, netlist):
+        self.netlist = netlist
+        #edges is a dictionary of component ID: (node a, node b), incident maps every node to the IDs connected to it
+        self.edges = {}
+        self.incident = {}
+        for ID, (node_a, node_b) in netlist.terminals.items():
+            if ID not in netlist.components:
+                continue
+            self.edges[ID] = (node_a, node_b)
+            self.incident.setdefault(node_a, []).append(ID)
+            if node_b != node_a:
+                self.incident.setdefault(node_b, []).append(ID)
+
+        #the first battery is the port which the rest of the circuit is analysed across
+        sources = sorted(ID for ID, (kind, value) in netlist.components.items() if kind in SOURCE_KINDS)
+        self.source = sources[0] if sources else None
+
+        #decomposition tree and the components which are not part of it. These are worked out once when first needed
+        self._tree = None
+        self._dead = None
+        self._decomposed = False
+
+    #builds the topology straight from the graph dictionary made by WireGeneration
+    @classmethod
+    def from_graph(cls, graph, components):
+        return cls(Netlist.from_graph(graph, components))
+
+    #number of independent cycles (cyclomatic number): edges - nodes + connected parts
+    def cycle_rank(self):
+        seen = set()
+        parts = 0
+        for start in self.incident:
+            if start in seen:
+                continue
+            parts += 1
+            seen.add(start)
+            queue = deque([start])
+            while queue:
+                node = queue.popleft()
+                for ID in self.incident[node]:
+                    for other in self.edges[ID]:
+                        if other not in seen:
+                            seen.add(other)
+                            queue.append(other)
+        return len(self.edges) - len(self.incident) + parts
+
+    #returns a fundamental cycle basis as a list of sorted lists of component IDs.
+    #A breadth-first spanning forest is built, then every edge which is not in the forest closes exactly one cycle.
+    @tracing.traced("topology.cycles")
+    def cycle_basis(self):
+        parent = {} #node: (parent node, ID of the edge to the parent)
+        depth = {}
+        tree_edges = set()
+        for start in self.incident:
+            if start in depth:
+                continue
+            depth[start] = 0
+            parent[start] = (None, None)
+            queue = deque([start])
+            while queue:
+                node = queue.popleft()
+                for ID in self.incident[node]:
+                    node_a, node_b = self.edges[ID]
+                    other = node_b if node_a == node else node_a
+                    if other not in depth:
+                        depth[other] = depth[node] + 1
+                        parent[other] = (node, ID)
+                        tree_edges.add(ID)
+                        queue.append(other)
+
+        cycles = []
+        for ID, (node_a, node_b) in self.edges.items():
+            if ID in tree_edges:
+                continue
+            cycle = [ID]
+            #climbs from both ends of the edge until the paths meet
+            while node_a != node_b:
+                if depth[node_a] >= depth[node_b]:
+                    node_a, edge = parent[node_a]
+                else:
+                    node_b, edge = parent[node_b]
+                cycle.append(edge)
+            cycles.append(sorted(cycle))
+        return cycles
+
+    #breaks the circuit across the battery down into a tree of series ("S") and parallel ("P") groups.
+    #Leaves of the tree are component IDs, groups are tuples of ("S" or "P", [children]).
+    #Components which cannot carry current (dangling, shorted or not connected to the battery) are stored in self._dead.
+    #If the circuit is not series-parallel (e.g. a bridge), the tree is None.
+    @tracing.traced("topology.decompose")
+    def decompose(self):
+        if self._decomposed:
+            return self._tree
+        self._decomposed = True
+        self._dead = set()
+        if self.source is None:
+            self._dead = set(self.edges)
+            return None
+        port = self.edges[self.source]
+
+        #only the components connected to the battery take part, every other component is disconnected
+        reachable = set(port)
+        queue = deque(port)
+        while queue:
+            node = queue.popleft()
+            for ID in self.incident.get(node, []):
+                for other in self.edges[ID]:
+                    if other not in reachable:
+                        reachable.add(other)
+                        queue.append(other)
+
+        #working multigraph which is reduced in place. groups holds the tree of every remaining edge
+        ends = {}
+        groups = {}
+        adjacent = {} #node: set of edge keys
+        pairs = {} #(smaller node, larger node): edge key, used to find parallel edges in O(1)
+        next_key = [0]
+
+        def add_edge(node_a, node_b, group):
+            pair = (min(node_a, node_b), max(node_a, node_b))
+            if pair in pairs:
+                #shares both nodes with an existing edge, so the two are in parallel
+                key = pairs[pair]
+                groups[key] = merge("P", groups[key], group)
+                return
+            key = next_key[0]
+            next_key[0] += 1
+            ends[key] = (node_a, node_b)
+            groups[key] = group
+            pairs[pair] = key
+            adjacent.setdefault(node_a, set()).add(key)
+            adjacent.setdefault(node_b, set()).add(key)
+
+        def remove_edge(key):
+            node_a, node_b = ends.pop(key)
+            del pairs[(min(node_a, node_b), max(node_a, node_b))]
+            adjacent[node_a].discard(key)
+            adjacent[node_b].discard(key)
+            return node_a, node_b, groups.pop(key)
+
+        for ID, (node_a, node_b) in self.edges.items():
+            if ID == self.source:
+                continue
+            if node_a not in reachable or node_a == node_b:
+                self._dead.add(ID) #not connected to the battery, or both terminals on the same node
+                continue
+            add_edge(node_a, node_b, ID)
+
+        queue = deque(node for node in adjacent if node not in port)
+        while queue:
+            node = queue.popleft()
+            keys = adjacent.get(node)
+            if node in port or not keys or len(keys) > 2:
+                continue
+            if len(keys) == 1:
+                #dead end: nothing can flow through a component with one terminal left unconnected
+                node_a, node_b, group = remove_edge(next(iter(keys)))
+                self._dead.update(leaves(group))
+                queue.append(node_b if node_a == node else node_a)
+                continue
+            #exactly two edges meet here, so they are in series and can be joined into one
+            key1, key2 = keys
+            first = remove_edge(key1)
+            second = remove_edge(key2)
+            other1 = first[1] if first[0] == node else first[0]
+            other2 = second[1] if second[0] == node else second[0]
+            if other1 == other2:
+                #both ends meet again, forming a loop hanging off the circuit which carries no current
+                self._dead.update(leaves(first[2]))
+                self._dead.update(leaves(second[2]))
+                queue.append(other1)
+                continue
+            add_edge(other1, other2, merge("S", first[2], second[2]))
+            queue.extend((other1, other2))
+
+        remaining = list(ends)
+        if not remaining:
+            self._dead.add(self.source) #nothing is left across the battery, so it cannot drive any current
+        elif len(remaining) == 1 and set(ends[remaining[0]]) == set(port):
+            self._tree = groups[remaining[0]]
+        return self._tree
+
+    #components that cannot carry current because they are not in a closed loop with the battery
+    def dead_components(self):
+        self.decompose()
+        return sorted(self._dead)
+
+    #names the circuit type in the same way as the rest of the app
+    @tracing.traced("topology.classify")
+    def classify(self):
+        tree = self.decompose()
+        if self.source is None:
+            return "No power source detected."
+        if self._dead:
+            return "Disconnected component detected."
+        if tree is None:
+            return "Bridge (not series-parallel)"
+        if not isinstance(tree, tuple):
+            return "Series"
+        kind, children = tree
+        if kind == "S" and all(not isinstance(child, tuple) for child in children):
+            return "Series"
+        if kind == "P" and all(not isinstance(child, tuple) or is_plain_series(child) for child in children):
+            return "Parallel"
+        return "Series-Parallel"
+
+    #returns the IDs of the components in series with the battery, so they carry the total current
+    @tracing.traced("topology.series")
+    def series_components(self):
+        tree = self.decompose()
+        if tree is None:
+            return []
+        if not isinstance(tree, tuple):
+            return [tree]
+        kind, children = tree
+        if kind == "S":
+            return [child for child in children if not isinstance(child, tuple)]
+        return []
+
+    #returns every parallel branch as a list of component IDs. Each branch of every parallel group is included
+    @tracing.traced("topology.parallel")
+    def parallel_branches(self):
+        branches = []
+        tree = self.decompose()
+        stack = [tree] if isinstance(tree, tuple) else []
+        while stack:
+            kind, children = stack.pop()
+            for child in children:
+                if kind == "P":
+                    branches.append(sorted(leaves(child)))
+                if isinstance(child, tuple):
+                    stack.append(child)
+        return branches
+
+
+#joins two groups, flattening nested groups of the same kind so that e.g. S(S(a, b), c) becomes S(a, b, c).
+#The larger child list is extended in place so that a long chain is built in linear time.
+def merge(kind, first, second):
+    lists = []
+    for group in (first, second):
+        if isinstance(group, tuple) and group[0] == kind:
+            lists.append(group[1])
+        else:
+            lists.append([group])
+    if len(lists[1]) > len(lists[0]):
+        lists.reverse()
+    lists[0].extend(lists[1])
+    return (kind, lists[0])
+
+
+#returns every component ID inside a group
+def leaves(group):
+    found = []
+    stack = [group]
+    while stack:
+        group = stack.pop()
+        if isinstance(group, tuple):
+            stack.extend(group[1])
+        else:
+            found.append(group)
+    return found
+
+
+#checks whether a group is a plain chain of components in series
+def is_plain_series(group):
+    return group[0] == "S" and all(not isinstance(child, tuple) for child in group[1])
@@ -0,0 +1,182 @@
+#tracing.py purpose: optional timing of every stage of a simulation, to find where the time goes when a circuit is slow
+#to simulate. Stages are timed as named spans, e.g.
+#       with tracing.span("topology.classify"):
+#           ...
+#and counters and one-off events can be recorded with tracing.count() and tracing.event().
+#Tracing is off unless the CIRCUITSIM_TRACE environment variable is set. When it is off, span() returns one shared object
+#which does nothing, so the spans left in the code cost one function call each.
+#When the program exits, the trace is written in the Chrome trace format, which can be opened in chrome://tracing or
+#https://ui.perfetto.dev. CIRCUITSIM_TRACE can be the file name to write to, or 1 to write to TRACE_FILE.
+#   CIRCUITSIM_TRACE=trace.json python main.py
+#   python tracing.py trace.json         (prints the total time of every span)
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+ENVIRONMENT_VARIABLE = "CIRCUITSIM_TRACE"
+TRACE_FILE = "circuitsim_trace.json"
+
+enabled = False
+trace_file = None
+_events = []
+_counters = {}
+_lock = threading.Lock()
+_start = time.perf_counter()
+
+
+#microseconds since the module was imported, the time unit of the Chrome trace format
+def now():
+    return (time.perf_counter() - _start) * 1000000
+
+
+#Span class purpose: times the code inside a with block and records it as one complete event
+class Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.begin = 0.0
+
+    def __enter__(self):
+        self.begin = now()
+        return self
+
+    #adds more information to the span once it is known, e.g. how many components were solved
+    def set(self, **args):
+        self.args.update(args)
+
+    def __exit__(self, error_type, error, traceback):
+        end = now()
+        event = {"name": self.name, "cat": self.name.split(".")[0], "ph": "X", "ts": self.begin, "dur": end - self.begin,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if error_type is not None:
+            self.args["error"] = error_type.__name__
+        if self.args:
+            event["args"] = self.args
+        _events.append(event)
+        return False
+
+
+#NullSpan class purpose: span used while tracing is off, which does nothing
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def set(self, **args):
+        pass
+
+    def __exit__(self, error_type, error, traceback):
+        return False
+
+
+_null_span = NullSpan()
+
+
+#returns a span to time a with block. args are shown with the span in the trace viewer
+def span(name, **args):
+    if not enabled:
+        return _null_span
+    return Span(name, args)
+
+
+#decorator which times every call of a function as a span
+def traced(name):
+    def decorate(function):
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+    return decorate
+
+
+#adds amount to a counter, which is drawn as a graph over time in the trace viewer
+def count(name, amount=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+        value = _counters[name]
+    _events.append({"name": name, "ph": "C", "ts": now(), "pid": os.getpid(), "args": {"value": value}})
+
+
+#records something which happened at one moment, with details, e.g. the graph of a simulated circuit
+def event(name, **args):
+    if not enabled:
+        return
+    _events.append({"name": name, "cat": name.split(".")[0], "ph": "i", "s": "t", "ts": now(), "pid": os.getpid(),
+                    "tid": threading.get_ident(), "args": args})
+
+
+#turns tracing on. The trace is written to filename when the program exits, if it is given
+def enable(filename=None):
+    global enabled, trace_file
+    enabled = True
+    trace_file = filename
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+#forgets every recorded event and counter
+def clear():
+    with _lock:
+        del _events[:]
+        _counters.clear()
+
+
+#returns the recorded events in the Chrome trace format
+def trace():
+    return {"traceEvents": list(_events), "displayTimeUnit": "ms", "otherData": {"counters": dict(_counters)}}
+
+
+#writes the recorded events to a Chrome trace file
+def export(filename):
+    data = json.dumps(trace(), default=str)
+    with open(filename, "w") as savefile:
+        savefile.write(data)
+
+
+#returns {span name: (number of spans, total ms, longest ms)} for the spans of a trace, longest total first
+def summary(events):
+    totals = {}
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        number, total, longest = totals.get(event["name"], (0, 0.0, 0.0))
+        totals[event["name"]] = (number + 1, total + event["dur"] / 1000, max(longest, event["dur"] / 1000))
+    return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+
+def _export_at_exit():
+    if enabled and trace_file and _events:
+        try:
+            export(trace_file)
+        except OSError as error:
+            print("Trace could not be written:", error, file=sys.stderr)
+
+
+_setting = os.environ.get(ENVIRONMENT_VARIABLE, "")
+if _setting and _setting.lower() not in ("0", "false", "no", "off"):
+    enable(TRACE_FILE if _setting.lower() in ("1", "true", "yes", "on") else _setting)
+atexit.register(_export_at_exit)
+
+
+#usage: python tracing.py TRACE_FILE
+#prints the number of calls, total time and longest time of every span in a trace file
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python tracing.py TRACE_FILE", file=sys.stderr)
+        sys.exit(2)
+    with open(sys.argv[1], "r") as loadfile:
+        events = json.load(loadfile)["traceEvents"]
+    print("span".ljust(30), "calls".rjust(7), "total ms".rjust(12), "longest ms".rjust(12))
+    for name, (number, total, longest) in summary(events).items():
+        print(name.ljust(30), str(number).rjust(7), format(total, ".3f").rjust(12), format(longest, ".3f").rjust(12))
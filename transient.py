@@ -0,0 +1,321 @@
+#transient.py purpose: headless time-domain simulation of circuits with capacitors and inductors, showing how every
+#voltage and current changes after the batteries are connected at time 0 instead of only the final steady state.
+#Each capacitor and inductor is replaced at every time step by its companion model: a resistance in parallel with a
+#current source which holds the charge or current from the previous step. The companion resistances only depend on
+#the step size, so the MNA matrix is factorised once for each step size and every step is two sparse triangular solves
+#plus a few numpy operations. Lightbulbs and diodes are solved with Newton's method at every step, starting from the
+#step before.
+#   - trapezoidal (default): second order accurate
+#   - euler (backward Euler): first order, but never rings after a sudden change
+#With adaptive=True the step size is halved when the local error estimated from the last few steps is too large and
+#doubled when it is small, so the few step sizes used each keep their own factorisation.
+#
+#usage: python transient.py FILE --duration SECONDS [--step SECONDS] [--adaptive] [--method trapezoidal|euler] [-o OUT]
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+import nonlinear
+from solver import MNASolver, CircuitError, STORAGE_KINDS, supply_current
+import tracing
+
+METHODS = ("trapezoidal", "euler")
+STEPS = 1000 #default number of steps when no step size is given
+RELATIVE_TOLERANCE = 1e-3 #local error allowed in a capacitor voltage or inductor current, relative to its size
+ABSOLUTE_TOLERANCE = 1e-6 #local error allowed in volts or amps for values close to 0
+MAX_FACTORISATIONS = 16 #factorisations kept for different step sizes
+INITIAL_STEP = 1e-9 #fraction of the duration used to find the currents and voltages the instant the circuit is connected
+FIRST_STEP = 1 / 1024 #adaptive runs start with this fraction of the longest step, until the error can be estimated
+
+
+#TransientResult class purpose: holds the solution at every time as numpy arrays with one row per time
+class TransientResult:
+    def __init__(self, netlist, times, node_voltages, branch_currents):
+        self.netlist = netlist
+        self.times = times #array of times (s)
+        self.node_voltages = node_voltages #array of shape (times, nodes)
+        self.branch_currents = branch_currents #dictionary of component ID: array of currents from terminal a to terminal b
+
+    #potential difference across a component at every time, measured from terminal a to terminal b
+    def branch_voltage(self, ID):
+        node_a, node_b = self.netlist.terminals[ID]
+        return self.node_voltages[:, node_a] - self.node_voltages[:, node_b]
+
+    #total current supplied by the sources at every time, defined the same way as SolveResult.total_current
+    @property
+    def total_current(self):
+        return supply_current(self)
+
+    #returns the reading of every ammeter as a dictionary of ID: array of currents (A)
+    def ammeter_readings(self):
+        return {ID: np.abs(self.branch_currents[ID]) for ID, (kind, value) in self.netlist.components.items()
+                if kind == "ammeter"}
+
+    #returns the reading of every voltmeter as a dictionary of ID: array of potential differences (V)
+    def voltmeter_readings(self, voltmeters):
+        readings = {}
+        for voltmeter, component in voltmeters:
+            component = int(component)
+            if component in self.netlist.terminals:
+                readings[int(voltmeter)] = np.abs(self.branch_voltage(component))
+            else:
+                readings[int(voltmeter)] = np.zeros(len(self.times))
+        return readings
+
+
+#TransientSolver class purpose: MNA solver in which every capacitor and inductor is a companion model for one step size
+class TransientSolver(MNASolver):
+    def __init__(self, netlist, step, method="trapezoidal"):
+        if method not in METHODS:
+            raise ValueError("Unknown integration method " + repr(method) + ".")
+        self.method = method
+        self.step = float(step)
+        self.storage = [] #list of [ID, node a, node b, kind, farads or henries, index in self.resistors]
+        super().__init__(netlist)
+        #(step, method): (factorisation, conductances of the nonlinear components it was factorised with)
+        self.factorisations = {(self.step, self.method): (self.lu, self.linearised())}
+
+        self.storage_a = self.position[[entry[1] for entry in self.storage]] if self.storage else np.zeros(0, np.intp)
+        self.storage_b = self.position[[entry[2] for entry in self.storage]] if self.storage else np.zeros(0, np.intp)
+        self.capacitor = np.array([entry[3] == "capacitor" for entry in self.storage], dtype=bool)
+        self.conductance = self.conductances()
+
+    #capacitors and inductors are stamped as the resistance of their companion model, other components as in DC
+    def add_branch(self, ID, kind, value, node_a, node_b):
+        if kind not in STORAGE_KINDS:
+            return super().add_branch(ID, kind, value, node_a, node_b)
+        if float(value) <= 0:
+            raise CircuitError("Component " + str(ID) + " must have a positive " +
+                               ("capacitance." if kind == "capacitor" else "inductance."))
+        self.storage.append([ID, node_a, node_b, kind, float(value), len(self.resistors)])
+        self.resistors.append([ID, node_a, node_b, 1 / companion_conductance(kind, float(value), self.step, self.method)])
+        self.resistor_entries[ID] = self.resistors[-1]
+
+    #conductance of every companion model for the current step size, as an array
+    def conductances(self):
+        return np.array([companion_conductance(entry[3], entry[4], self.step, self.method) for entry in self.storage],
+                        dtype=float)
+
+    #changes the step size, re-using the factorisation of that step size if it has been used before
+    def set_step(self, step, method=None):
+        step = float(step)
+        method = method or self.method
+        if step == self.step and method == self.method:
+            return
+        self.step = step
+        self.method = method
+        for ID, node_a, node_b, kind, value, index in self.storage:
+            self.resistors[index][3] = 1 / companion_conductance(kind, value, step, method)
+        self.conductance = self.conductances()
+        if (step, method) in self.factorisations:
+            self.lu, conductances = self.factorisations[(step, method)]
+            for entry, conductance in zip(self.nonlinear, conductances):
+                entry[5] = conductance
+        else:
+            self.lu = self.factorise()
+            if len(self.factorisations) >= MAX_FACTORISATIONS:
+                self.factorisations.pop(next(iter(self.factorisations)))
+            self.factorisations[(step, method)] = (self.lu, self.linearised())
+
+    #conductances the nonlinear components are factorised with
+    def linearised(self):
+        return [entry[5] for entry in self.nonlinear]
+
+    #takes one step from the capacitor voltages and inductor currents (voltage, current) of the last step.
+    #Returns the solution vector with a 0 on the end for the ground, and the new (voltage, current) of every capacitor
+    #and inductor
+    def advance(self, rhs, voltage, current):
+        conductance = self.conductance
+        #each companion model is a conductance in parallel with a source of history current into terminal a
+        if self.method == "trapezoidal":
+            history = np.where(self.capacitor, conductance * voltage + current, -(conductance * voltage + current))
+        else:
+            history = np.where(self.capacitor, conductance * voltage, -current)
+        injected = rhs + np.bincount(self.storage_a, history, minlength=self.size + 1) \
+            - np.bincount(self.storage_b, history, minlength=self.size + 1)
+        solution = np.zeros(self.size + 1)
+        if self.size and self.nonlinear:
+            #Newton's method starting from the last step. It factorises the matrix again if it converges too slowly,
+            #and that factorisation is kept for the rest of the steps of this size
+            solution[:self.size] = self.newton(injected[:self.size])
+            if self.convergence.factorisations:
+                self.factorisations[(self.step, self.method)] = (self.lu, self.linearised())
+        elif self.size:
+            solution[:self.size] = self.lu.solve(injected[:self.size])
+        new_voltage = solution[self.storage_a] - solution[self.storage_b]
+        return solution, new_voltage, conductance * new_voltage - history
+
+    #turns the solution vectors of every step into a TransientResult
+    def result(self, times, solutions, storage_currents):
+        solutions = np.asarray(solutions)
+        node_voltages = solutions[:, self.position]
+        branch_currents = {ID: np.zeros(len(times)) for ID in self.netlist.components}
+        storage_ids = {entry[0] for entry in self.storage}
+        for ID, node_a, node_b, resistance in self.resistors:
+            if ID not in storage_ids:
+                branch_currents[ID] = (node_voltages[:, node_a] - node_voltages[:, node_b]) / resistance
+        offset = len(self.node_index)
+        for number, source in enumerate(self.sources):
+            branch_currents[source[0]] = solutions[:, offset + number].copy()
+        for ID, node_a, node_b, current in self.current_sources:
+            branch_currents[ID] = np.full(len(times), -current)
+        for entry in self.nonlinear:
+            voltages = node_voltages[:, entry[1]] - node_voltages[:, entry[2]]
+            branch_currents[entry[0]] = nonlinear.evaluate(entry[3], voltages, np.full(len(voltages), entry[4]))[0]
+        storage_currents = np.asarray(storage_currents)
+        for number, entry in enumerate(self.storage):
+            branch_currents[entry[0]] = storage_currents[:, number].copy()
+        return TransientResult(self.netlist, np.asarray(times, dtype=float), node_voltages, branch_currents)
+
+
+#conductance of the companion model of a capacitor or inductor for one step
+def companion_conductance(kind, value, step, method):
+    scale = 2.0 if method == "trapezoidal" else 1.0
+    if kind == "capacitor":
+        return scale * value / step
+    return step / (scale * value)
+
+
+#simulates a solver.Netlist from time 0 to duration and returns a TransientResult.
+#Capacitors start uncharged and inductors without current, unless initial gives {ID: volts or amps} for them.
+#With adaptive=False every step is step long. With adaptive=True step is the longest step allowed
+@tracing.traced("transient.simulate")
+def simulate_transient(netlist, duration, step=None, method="trapezoidal", adaptive=False, initial=None,
+                       relative_tolerance=RELATIVE_TOLERANCE, absolute_tolerance=ABSOLUTE_TOLERANCE):
+    duration = float(duration)
+    if duration <= 0:
+        raise ValueError("The duration must be positive.")
+    step = float(step) if step else duration / STEPS
+    if step <= 0:
+        raise ValueError("The step size must be positive.")
+
+    #the first point is found with one very short backward Euler step, which gives the currents and voltages the
+    #instant the batteries are connected without changing any capacitor voltage or inductor current
+    solver = TransientSolver(netlist, duration * INITIAL_STEP, "euler")
+    initial = initial or {}
+    voltage = np.zeros(len(solver.storage))
+    current = np.zeros(len(solver.storage))
+    for number, entry in enumerate(solver.storage):
+        if entry[3] == "capacitor":
+            voltage[number] = float(initial.get(entry[0], 0.0))
+        else:
+            current[number] = float(initial.get(entry[0], 0.0))
+    rhs = np.append(solver.source_vector(), 0.0)
+    solution, start_voltage, start_current = solver.advance(rhs, voltage, current)
+    #the state variables keep their starting values, the other quantity of each comes from the solve
+    voltage = np.where(solver.capacitor, voltage, start_voltage)
+    current = np.where(solver.capacitor, start_current, current)
+    solver.set_step(step, method)
+
+    times = [0.0]
+    solutions = [solution]
+    storage_currents = [current]
+    if not adaptive:
+        steps = max(int(round(duration / step)), 1)
+        solver.set_step(duration / steps, method)
+        for number in range(1, steps + 1):
+            solution, voltage, current = solver.advance(rhs, voltage, current)
+            times.append(number * solver.step)
+            solutions.append(solution)
+            storage_currents.append(current)
+        return solver.result(times, solutions, storage_currents)
+
+    #adaptive steps. The local error is estimated from divided differences of the capacitor voltages and inductor
+    #currents over the last accepted steps
+    order = 2 if method == "trapezoidal" else 1
+    maximum = step
+    minimum = duration * INITIAL_STEP
+    solver.set_step(max(step * FIRST_STEP, minimum), method)
+    states = [np.where(solver.capacitor, voltage, current)]
+    time = 0.0
+    while time < duration * (1 - 1e-12):
+        size = min(solver.step, duration - time)
+        solver.set_step(size, method)
+        new_solution, new_voltage, new_current = solver.advance(rhs, voltage, current)
+        state = np.where(solver.capacitor, new_voltage, new_current)
+        if len(states) > order:
+            ratio = local_error(times[-order - 1:] + [time + size], states[-order - 1:] + [state], order,
+                                relative_tolerance, absolute_tolerance)
+            if ratio > 1 and size > minimum:
+                solver.set_step(max(size / 2, minimum), method)
+                continue
+        time += size
+        voltage, current = new_voltage, new_current
+        times.append(time)
+        solutions.append(new_solution)
+        storage_currents.append(new_current)
+        states.append(state)
+        if len(states) > order + 1:
+            del states[0]
+            if ratio < 0.5 ** (order + 1) and size == solver.step:
+                solver.set_step(min(size * 2, maximum), method)
+    return solver.result(times, solutions, storage_currents)
+
+
+#ratio of the estimated local error of the newest step to the error allowed, for a method of the given order.
+#The (order + 1)th derivative is estimated with divided differences over the last order + 2 points
+def local_error(times, states, order, relative_tolerance, absolute_tolerance):
+    differences = list(states)
+    for level in range(1, order + 2):
+        differences = [(differences[number + 1] - differences[number]) / (times[number + level] - times[number])
+                       for number in range(len(differences) - 1)]
+    derivative = np.abs(differences[0]) * np.prod(range(1, order + 2))
+    step = times[-1] - times[-2]
+    #local truncation error constants: step^2 / 2 for backward Euler and step^3 / 12 for trapezoidal
+    error = derivative * (step ** 2 / 2 if order == 1 else step ** 3 / 12)
+    allowed = relative_tolerance * np.maximum(np.abs(states[-1]), np.abs(states[-2])) + absolute_tolerance
+    return float(np.max(error / allowed)) if len(error) else 0.0
+
+
+#writes a TransientResult as CSV with one row per time: the time, then the current and potential difference of every component
+def write_csv(result, outfile):
+    IDs = sorted(result.branch_currents)
+    writer = csv.writer(outfile)
+    writer.writerow(["time"] + ["I" + str(ID) for ID in IDs] + ["V" + str(ID) for ID in IDs])
+    columns = [result.times] + [result.branch_currents[ID] for ID in IDs] + [result.branch_voltage(ID) for ID in IDs]
+    for row in np.column_stack(columns):
+        writer.writerow([repr(float(value)) for value in row])
+
+
+#writes a TransientResult as a numpy .npz file with the times, node voltages and one current array per component
+def write_npz(result, filename):
+    arrays = {"times": result.times, "node_voltages": result.node_voltages}
+    for ID, currents in result.branch_currents.items():
+        arrays["I" + str(ID)] = currents
+    np.savez_compressed(filename, **arrays)
+
+
+def main(argv=None):
+    from circuitfile import CircuitFileError
+    from circuitsim import load_circuit
+    from solver import Netlist
+    parser = argparse.ArgumentParser(description="Simulate how a saved circuit with capacitors and inductors changes over time.")
+    parser.add_argument("path", help="circuit JSON or .csim file")
+    parser.add_argument("-d", "--duration", type=float, required=True, help="seconds to simulate")
+    parser.add_argument("-s", "--step", type=float, help="step size in seconds, the longest step if adaptive")
+    parser.add_argument("-m", "--method", choices=METHODS, default="trapezoidal")
+    parser.add_argument("-a", "--adaptive", action="store_true", help="change the step size to keep the error small")
+    parser.add_argument("-o", "--output", help=".npz or .csv file to write the results to (default: CSV on standard output)")
+    args = parser.parse_args(argv)
+
+    try:
+        graph, store, voltmeters = load_circuit(args.path)
+        netlist = Netlist.from_graph(graph, store.solver_components())
+        result = simulate_transient(netlist, args.duration, args.step, args.method, args.adaptive)
+    except (OSError, ValueError, KeyError, TypeError, CircuitError, CircuitFileError) as error:
+        print("Circuit cannot be simulated:", type(error).__name__ + ": " + str(error), file=sys.stderr)
+        return 1
+    if args.output and args.output.endswith(".npz"):
+        write_npz(result, args.output)
+    elif args.output:
+        with open(args.output, "w", newline="") as outfile:
+            write_csv(result, outfile)
+    else:
+        write_csv(result, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#wires.py purpose: model of the wires drawn on the canvas. Every connection made with WireGeneration is a Wire: an edge
+#of the circuit graph (or the connection of a voltmeter) and the canvas lines drawn for it.
+#WireMap looks wires up in O(1) by number, by graph edge (either way round), by component and by canvas line, so a
+#connection can be highlighted, deleted or routed again without searching the canvas, and the lines of a branch can be
+#found from its solved current.
+#Wires are saved with a circuit as dictionaries (see WireMap.to_list). Their lines are saved as positions in the list of
+#saved widgets, as canvas item IDs are different every time a circuit is loaded. Circuits saved before wires were saved
+#have their wires made again from the graph dictionary and voltmeters (see WireMap.from_graph).
+
+
+#Wire class purpose: one connection between two components and its canvas lines
+class Wire:
+    def __init__(self, number, source, target, voltmeter=False):
+        self.number = number
+        self.source = source #component ID at the start of the wire. For a voltmeter this is the voltmeter
+        self.target = target #component ID at the end of the wire
+        self.voltmeter = voltmeter
+        self.lines = [] #canvas line IDs in order from the source to the target
+
+    #returns the component at the other end of the wire
+    def other(self, ID):
+        return self.target if ID == self.source else self.source
+
+    #returns the lines in order starting from the end at component ID
+    def lines_from(self, ID):
+        return self.lines if ID == self.source else self.lines[::-1]
+
+    #returns the graph edge the wire stands for, the same whichever way round it was connected
+    def edge(self):
+        return edge_key(self.source, self.target)
+
+    def __repr__(self):
+        return "Wire(" + str(self.number) + ", " + str(self.source) + " -> " + str(self.target) + ")"
+
+
+#returns the key of the edge between two components, with the smaller ID first
+def edge_key(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+#WireMap class purpose: every wire on the canvas, with O(1) lookups by number, edge, component and canvas line
+class WireMap:
+    def __init__(self):
+        self.wires = {} #wire number: Wire, in the order the wires were made
+        self.edges = {} #edge key: list of the wires joining the two components
+        self.components = {} #component ID: list of the wires with an end at it
+        self.line_wires = {} #canvas line ID: Wire it is part of
+        self.last_number = 0
+
+    def __len__(self):
+        return len(self.wires)
+
+    def __iter__(self):
+        return iter(list(self.wires.values()))
+
+    def __contains__(self, number):
+        return number in self.wires
+
+    #adds a wire between two components and returns it. Its lines are added with set_lines once they are drawn
+    def add(self, source, target, voltmeter=False):
+        self.last_number += 1
+        wire = Wire(self.last_number, source, target, voltmeter)
+        self.wires[wire.number] = wire
+        self.edges.setdefault(wire.edge(), []).append(wire)
+        self.components.setdefault(source, []).append(wire)
+        self.components.setdefault(target, []).append(wire)
+        return wire
+
+    #replaces the lines of a wire, e.g. after it has been routed again
+    def set_lines(self, wire, lines):
+        for line in wire.lines:
+            self.line_wires.pop(line, None)
+        wire.lines = list(lines)
+        for line in wire.lines:
+            self.line_wires[line] = wire
+
+    #removes a wire and returns it. Its lines are left for the caller to delete from the canvas
+    def remove(self, number):
+        wire = self.wires.pop(number)
+        edge = wire.edge()
+        self.edges[edge].remove(wire)
+        if not self.edges[edge]:
+            del self.edges[edge]
+        for ID in (wire.source, wire.target):
+            wires = self.components.get(ID, [])
+            if wire in wires:
+                wires.remove(wire)
+            if not wires:
+                self.components.pop(ID, None)
+        for line in wire.lines:
+            self.line_wires.pop(line, None)
+        return wire
+
+    def get(self, number):
+        return self.wires.get(number)
+
+    #returns the wires joining two components, in either direction
+    def between(self, a, b):
+        return list(self.edges.get(edge_key(a, b), ()))
+
+    #returns the wires with an end at a component
+    def of_component(self, ID):
+        return list(self.components.get(ID, ()))
+
+    #returns the wire a canvas line is part of, or None
+    def from_line(self, line):
+        return self.line_wires.get(line)
+
+    #returns the lines of every wire except those of voltmeters, in the order the wires were made. This is the line_ids
+    #list of the canvasdata.json schema
+    def line_ids(self):
+        return [line for wire in self.wires.values() if not wire.voltmeter for line in wire.lines]
+
+    def clear(self):
+        self.wires.clear()
+        self.edges.clear()
+        self.components.clear()
+        self.line_wires.clear()
+
+    #returns every wire as a dictionary for saving. positions maps canvas line IDs to their position in the saved widgets
+    def to_list(self, positions):
+        return [{"source": wire.source, "target": wire.target, "voltmeter": wire.voltmeter,
+                 "lines": [positions[line] for line in wire.lines if line in positions]} for wire in self.wires.values()]
+
+    #adds a wire for every edge of a graph dictionary and every [voltmeter, component] connection, for circuits saved
+    #before wires were saved. The graph only has one edge between two components, so each gets one wire. Returns the
+    #wires, which have no lines until they are routed
+    def from_graph(self, graph, voltmeters):
+        added = []
+        for key, neighbours in graph.items():
+            for neighbour in neighbours:
+                if neighbour == "x":
+                    continue #placeholder for a component connected across its neighbour, not a wire
+                source, target = edge_key(int(key), int(neighbour))
+                if not self.between(source, target):
+                    added.append(self.add(source, target))
+        for voltmeter, component in voltmeters:
+            added.append(self.add(int(voltmeter), int(component), True))
+        return added
+
+    #adds the wires of a saved circuit. items lists the canvas item drawn for every saved widget, in the same order
+    def load(self, saved, items):
+        loaded = []
+        for data in saved:
+            wire = self.add(int(data["source"]), int(data["target"]), bool(data.get("voltmeter", False)))
+            self.set_lines(wire, [items[position] for position in data["lines"]
+                                  if 0 <= position < len(items) and items[position] is not None])
+            loaded.append(wire)
+        return loaded